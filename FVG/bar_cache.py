@@ -0,0 +1,118 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Iterable, List, Set
+
+TS_FIELD = '__ts'
+
+def partition_dir(cache_dir: str, ticker: str, interval: str, auto_adjust: bool = False) -> str:
+    """
+    Directory holding the day partitions for one ticker/interval, separately for adjusted
+    and unadjusted prices.
+    """
+    return os.path.join(cache_dir, ticker, interval, 'adjusted' if auto_adjust else 'raw')
+
+def cached_days(cache_dir: str, ticker: str, interval: str, auto_adjust: bool = False) -> Set[date]:
+    """
+    Return the days already stored for ticker/interval (including days that had no bars).
+    """
+    path = partition_dir(cache_dir, ticker, interval, auto_adjust)
+    if not os.path.isdir(path):
+        return set()
+    return {date.fromisoformat(name[:-4]) for name in os.listdir(path) if name.endswith('.npy')}
+
+def load_cached_bars(cache_dir: str, ticker: str, interval: str, days: Iterable[date],
+                     auto_adjust: bool = False) -> pd.DataFrame:
+    """
+    Load the stored bars for the given days as one DataFrame sorted by time.
+    Partitions are memory-mapped and concatenated once.
+    """
+    path = partition_dir(cache_dir, ticker, interval, auto_adjust)
+    parts = [np.load(os.path.join(path, f"{d.isoformat()}.npy"), mmap_mode='r') for d in sorted(days)]
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame()
+    records = np.concatenate([p.astype(parts[-1].dtype, copy=False) for p in parts])
+    index = pd.DatetimeIndex(records[TS_FIELD].view('datetime64[ns]'))
+    tz = _read_meta(path).get('tz')
+    if tz is not None:
+        index = index.tz_localize('UTC').tz_convert(tz)
+    columns = [name for name in records.dtype.names if name != TS_FIELD]
+    return pd.DataFrame({name: records[name] for name in columns}, index=index)
+
+def store_bars(cache_dir: str, ticker: str, interval: str, df: pd.DataFrame, days: Iterable[date],
+               auto_adjust: bool = False):
+    """
+    Write one partition per day in `days` with that day's rows from df (by date in the
+    index's own timezone). Days without rows are stored empty so they count as covered;
+    callers only pass such days when they know there was no trading (see covered_days).
+    """
+    days = list(days)
+    path = partition_dir(cache_dir, ticker, interval, auto_adjust)
+    os.makedirs(path, exist_ok=True)
+    if not df.empty:
+        _write_meta(path, {'tz': str(df.index.tz) if df.index.tz is not None else None})
+        bar_days = df.index.normalize().date
+    for d in days:
+        day_df = df[bar_days == d] if not df.empty else df
+        _save_partition(os.path.join(path, f"{d.isoformat()}.npy"), _to_records(day_df))
+    logging.info(f"Cached {ticker} {interval} bars for {len(days)} day(s) in {path}")
+
+def covered_days(df: pd.DataFrame, days: Iterable[date]) -> List[date]:
+    """
+    The days of a successful fetch of `days` that may be cached: those with bars in df, and
+    those without that are known non-trading days, i.e. weekends, or weekdays before the
+    last day df has bars for (holidays inside a range Yahoo answered). A weekday with no
+    bars after them may be a throttled or incomplete answer and is left to be refetched.
+    """
+    bar_days = set() if df.empty else set(df.index.normalize().date)
+    last = max(bar_days) if bar_days else None
+    return [d for d in days if d in bar_days or d.weekday() >= 5 or (last is not None and d < last)]
+
+def flatten_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop the ticker level yfinance adds to single-ticker downloads.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    return df
+
+def _to_records(df: pd.DataFrame) -> np.ndarray:
+    columns = [] if df.empty else list(df.columns)
+    dtype = [(TS_FIELD, np.int64)] + [(str(c), df[c].dtype) for c in columns]
+    records = np.empty(len(df), dtype=dtype)
+    if len(df):
+        records[TS_FIELD] = df.index.as_unit('ns').asi8
+        for c in columns:
+            records[str(c)] = df[c].to_numpy()
+    return records
+
+def _save_partition(path: str, records: np.ndarray):
+    # Written under a temporary name and renamed into place, so an interrupted write
+    # never leaves a truncated partition that cached_days would count as covered.
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _read_meta(path: str) -> dict:
+    meta_path = os.path.join(path, '_meta.json')
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path) as f:
+        return json.load(f)
+
+def _write_meta(path: str, meta: dict):
+    tmp = os.path.join(path, '_meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, '_meta.json'))
@@ -0,0 +1,227 @@
+import io
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import functools
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+from resample_data import resample_data, resample_cascade, SUPPORTED_TIMEFRAMES
+from detect_fvg import detect_fvg, check_fvg_filled, analyze_fvgs
+from visualize_fvg import plot_fvgs, plot_fvg_duration_histogram, plot_fvg_frequency_timeseries
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+STAGES = (
+    'resample_data', 'resample_cascade', 'detect_fvg', 'check_fvg_filled', 'analyze_fvgs',
+    'plot_fvgs', 'plot_fvg_duration_histogram', 'plot_fvg_frequency_timeseries', 'cli_main',
+)
+CHECK_FILLED_SAMPLE = 10
+CLI_TIMEFRAMES = ['1h', '15min']
+
+def synthetic_bars(
+    n: int,
+    seed: int = 0,
+    gap_rate: float = 0.01,
+    fill_prob: float = 0.5,
+    tz: Optional[str] = None,
+    start: str = '2024-01-02 09:30',
+    noise: float = 0.02,
+    jump: float = 1.0
+) -> pd.DataFrame:
+    """
+    Seeded 1-minute OHLCV bars with a controllable number of FVGs.
+
+    Price is noise around a level that steps up by `jump` at about gap_rate * n random bars,
+    each step leaving one bullish gap. With probability fill_prob a step is later retraced by a
+    slide slow enough not to create gaps of its own, which fills it. Wicks are wide enough that
+    the noise alone almost never gaps. When steps are dense a later step can keep a retrace
+    from reaching its gap, so the realized fill rate is then somewhat below fill_prob.
+    """
+    rng = np.random.default_rng(seed)
+    slide_bars, fill_within, margin = 200, 20, 0.2 * jump
+    planted = np.flatnonzero(rng.random(n) < gap_rate)
+    planted = planted[planted >= 2]
+    steps = np.zeros(n)
+    steps[planted] = jump
+    retraced = planted[rng.random(len(planted)) < fill_prob]
+    at = retraced + 2 + rng.integers(0, fill_within, len(retraced))
+    # Slope changes: slide down past the gap, climb back above the step, settle on it.
+    slope = np.zeros(n + 2 * slide_bars + fill_within + 2)
+    np.add.at(slope, at, -(jump + margin) / slide_bars)
+    np.add.at(slope, at + slide_bars, (jump + 2 * margin) / slide_bars)
+    np.add.at(slope, at + 2 * slide_bars, -margin / slide_bars)
+    level = np.cumsum(steps + np.cumsum(slope)[:n])
+    close = 100 + level + rng.normal(0, noise, n)
+    open_ = np.concatenate([close[:1], close[:-1]])
+    high = np.maximum(open_, close) + noise * (2 + np.abs(rng.normal(0, 1, n)))
+    low = np.minimum(open_, close) - noise * (2 + np.abs(rng.normal(0, 1, n)))
+    index = pd.date_range(start, periods=n, freq='min', tz=tz)
+    return pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close,
+                         'Volume': rng.integers(100, 10_000, n)}, index=index)
+
+def measure(fn: Callable, repeat: int = 3) -> Dict:
+    """
+    Best wall time of `repeat` calls, plus the tracemalloc peak of one more call
+    (kept separate because tracing slows the code down).
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'seconds': best, 'peak_mb': peak / 2**20}
+
+def run_benchmarks(
+    sizes: List[int],
+    stages: List[str] = STAGES,
+    repeat: int = 3,
+    seed: int = 0,
+    gap_rate: float = 0.01,
+    fill_prob: float = 0.5
+) -> Dict:
+    """
+    Time and memory-profile each stage on synthetic bars of every size.
+    Returns {'meta': ..., 'results': [{'stage', 'bars', 'seconds', 'peak_mb', ...}]}.
+    """
+    results = []
+    for n in sizes:
+        bars = synthetic_bars(n, seed=seed, gap_rate=gap_rate, fill_prob=fill_prob)
+        fvg_df = detect_fvg(bars)
+        with tempfile.TemporaryDirectory(prefix='fvg_bench_') as workdir:
+            jobs = _stage_jobs(bars, fvg_df, workdir)
+            for stage in stages:
+                fn, items = jobs[stage]
+                record = {'stage': stage, 'bars': n, 'fvgs': len(fvg_df), 'items': items}
+                record.update(measure(fn, repeat=repeat))
+                print(f"{stage:>30} {n:>10} bars  {record['seconds']:.4f}s  {record['peak_mb']:.1f} MB")
+                results.append(record)
+    meta = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'seed': seed,
+        'gap_rate': gap_rate,
+        'fill_prob': fill_prob,
+    }
+    return {'meta': meta, 'results': results}
+
+def _stage_jobs(bars: pd.DataFrame, fvg_df: pd.DataFrame, workdir: str) -> Dict[str, tuple]:
+    hourly = resample_data(bars, '1h')
+    # The per-gap scan is O(bars) per gap, so only a few gaps are timed on long inputs.
+    sample = fvg_df.head(max(1, min(CHECK_FILLED_SAMPLE, 100_000 // max(len(bars), 1))))
+    positions = bars.index.get_indexer(pd.DatetimeIndex(sample['Timestamp'])) if len(sample) else []
+
+    def check_sample():
+        for pos, row in zip(positions, sample.itertuples()):
+            check_fvg_filled(bars, pos, row.Gap_Low, row.Gap_High, bullish=row.Type == 'Bullish')
+
+    return {
+        'resample_data': (lambda: resample_data(bars, '1h'), 1),
+        'resample_cascade': (lambda: resample_cascade(bars, list(SUPPORTED_TIMEFRAMES)), len(SUPPORTED_TIMEFRAMES)),
+        'detect_fvg': (lambda: detect_fvg(bars), len(bars)),
+        'check_fvg_filled': (check_sample, len(sample)),
+        'analyze_fvgs': (lambda: analyze_fvgs(fvg_df), len(fvg_df)),
+        'plot_fvgs': (lambda: plot_fvgs(hourly, detect_fvg(hourly), '1h', os.path.join(workdir, 'plot.png')), 1),
+        'plot_fvg_duration_histogram':
+            (lambda: plot_fvg_duration_histogram(fvg_df, os.path.join(workdir, 'hist.png')), 1),
+        'plot_fvg_frequency_timeseries':
+            (lambda: plot_fvg_frequency_timeseries(fvg_df.copy(), os.path.join(workdir, 'freq.png')), 1),
+        'cli_main': (lambda: run_cli(bars, CLI_TIMEFRAMES, workdir), len(CLI_TIMEFRAMES)),
+    }
+
+def run_cli(bars: pd.DataFrame, timeframes: List[str], workdir: str):
+    """
+    Run cli.main end to end in workdir, downloading through a fetch stub that returns bars
+    and with no pause between chunks, so only the pipeline itself is timed.
+    """
+    import cli
+    end = date.today()
+    argv = ['cli.py', '--ticker', 'SYN', '--start', (end - timedelta(days=5)).isoformat(),
+            '--end', end.isoformat(), '--timeframes', *timeframes]
+    saved = sys.argv, os.getcwd(), cli.download_data
+    cli.download_data = functools.partial(cli.download_data, pause=0, fetch=lambda *args: bars.copy())
+    sys.argv = argv
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cli.main()
+    finally:
+        sys.argv, cwd, cli.download_data = saved
+        os.chdir(cwd)
+
+def compare_to_baseline(
+    current: Dict,
+    baseline: Dict,
+    tolerance: float = 1.5,
+    min_seconds: float = 0.02,
+    min_mb: float = 1.0
+) -> List[str]:
+    """
+    Return one message per (stage, bars) that got slower or hungrier than the baseline by more
+    than `tolerance` times. Differences below min_seconds / min_mb are treated as noise.
+    Baselines are only meaningful on the machine that recorded them.
+    """
+    reference = {(r['stage'], r['bars']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        base = reference.get((r['stage'], r['bars']))
+        if base is None:
+            continue
+        if r['seconds'] > base['seconds'] * tolerance and r['seconds'] - base['seconds'] > min_seconds:
+            regressions.append(f"{r['stage']} @ {r['bars']} bars: {r['seconds']:.4f}s vs baseline {base['seconds']:.4f}s")
+        if r['peak_mb'] > base['peak_mb'] * tolerance and r['peak_mb'] - base['peak_mb'] > min_mb:
+            regressions.append(f"{r['stage']} @ {r['bars']} bars: {r['peak_mb']:.1f} MB vs baseline {base['peak_mb']:.1f} MB")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the FVG pipeline on synthetic bars.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Bar counts (e.g. 1000 1000000)')
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--gap-rate', type=float, default=0.01, help='Share of bars that open a gap')
+    parser.add_argument('--fill-prob', type=float, default=0.5, help='Probability that a gap gets filled')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='Compare against this results file; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=1.5)
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline instead')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+
+    current = run_benchmarks(args.sizes, args.stages, args.repeat, args.seed, args.gap_rate, args.fill_prob)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=4)
+    print(f"Saved benchmark results to {args.output}")
+    if args.baseline is None:
+        return 0
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=4)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(current, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Iterable, Iterator, Optional
+from resample_data import resample_data
+from stream_fvg import StreamingFVGDetector
+from fvg_store import FVGStore, NAT, TYPE_CODES
+from fvg_stats import FVGStats
+
+def read_bars_chunked(path: str, window: int, tz: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream an OHLCV CSV (timestamp index in the first column) from disk in windows of `window` rows.
+    Timestamps written with UTC offsets are parsed as UTC (offsets change across DST, so a
+    window could otherwise come back with a different fixed offset than its neighbours) and
+    converted to `tz` if given.
+    """
+    for chunk in pd.read_csv(path, index_col=0, chunksize=window):
+        chunk.index = _parse_index(chunk.index, tz)
+        yield chunk
+
+def load_bars(path: str, tz: Optional[str] = None) -> pd.DataFrame:
+    """
+    Load a whole OHLCV CSV with the same timestamp handling as read_bars_chunked.
+    """
+    df = pd.read_csv(path, index_col=0)
+    df.index = _parse_index(df.index, tz)
+    return df
+
+def _parse_index(index: pd.Index, tz: Optional[str]) -> pd.DatetimeIndex:
+    has_offset = index.astype(str).str.contains(r'[+-]\d\d:\d\d$|Z$', regex=True).any()
+    parsed = pd.to_datetime(index, utc=bool(has_offset))
+    return parsed.tz_convert(tz) if tz is not None and parsed.tz is not None else parsed
+
+def resample_chunks(chunks: Iterable[pd.DataFrame], timeframe: str) -> Iterator[pd.DataFrame]:
+    """
+    Resample a stream of time-ordered bar chunks to `timeframe`.
+    The rows of the last, possibly incomplete, bin are carried into the next chunk,
+    so the concatenated output equals resample_data over the whole history. Bins stay anchored
+    to midnight of the first day, as they are for a single resample of the whole history.
+    """
+    carry = None
+    origin = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if origin is None:
+            origin = chunk.index[0].normalize()
+        if carry is not None:
+            chunk = pd.concat([carry, chunk])
+        resampled = resample_data(chunk, timeframe, origin=origin)
+        last_bin = resampled.index[-1]
+        carry = chunk[chunk.index >= last_bin]
+        if len(resampled) > 1:
+            yield resampled.iloc[:-1]
+    if carry is not None:
+        yield resample_data(carry, timeframe, origin=origin)
+
+def detect_fvg_chunked(
+    chunks: Iterable[pd.DataFrame],
+    output_path: str,
+    write_rows: int = 100_000,
+    output_format: str = 'csv',
+    stats: Optional[FVGStats] = None
+) -> int:
+    """
+    Detect FVGs over a stream of bar chunks and write them to output_path, as CSV identical
+    to save_fvgs_to_csv(detect_fvg(whole_frame)), or with output_format='store' as an FVGStore.
+
+    Only the two trailing bars and the open gaps are carried between chunks. Gap records are
+    appended to an FVGStore as they are created and fill times are patched in place by
+    sequence number, so peak memory depends on the chunk size and the open-gap count,
+    not on the length of the history. Returns the number of FVGs written.
+    With stats (empty FVGStats), it is filled by FVGStats.summarize_store from the store
+    before any spill is removed, keeping a fixed-size summary rather than per-gap arrays.
+    """
+    if output_format not in ('csv', 'store'):
+        raise ValueError(f"Unsupported output format: {output_format}")
+    detector = StreamingFVGDetector(keep_history=False)
+    with tempfile.TemporaryDirectory(prefix='fvg_spill_') as spill_dir:
+        store_path = output_path if output_format == 'store' else spill_dir
+        store = None
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if store is None:
+                store = FVGStore.create(store_path, chunk.index.tz)
+            _store_events(detector.update(chunk), store)
+        if store is None:
+            store = FVGStore.create(store_path)
+        if stats is not None:
+            stats.summarize_store(store, write_rows)
+        if output_format == 'csv':
+            store.to_csv(output_path, write_rows)
+    total = detector.gaps_seen
+    logging.info(f"Wrote {total} FVGs to {output_path} in chunked mode.")
+    return total
+
+def _store_events(events: list, store: FVGStore):
+    created = [e for e in events if e['Event'] == 'created']
+    if created:
+        n = len(created)
+        store.append({
+            'timestamp': _to_ns([e['Timestamp'] for e in created]),
+            'type': np.array([TYPE_CODES[e['Type']] for e in created], dtype=np.int8),
+            'gap_low': np.array([e['Gap_Low'] for e in created], dtype=np.float64),
+            'gap_high': np.array([e['Gap_High'] for e in created], dtype=np.float64),
+            'filled': np.zeros(n, dtype=bool),
+            'fill_time': np.full(n, NAT, dtype=np.int64),
+            'bar': np.array([e['Bar'] for e in created], dtype=np.int64),
+            'fill_bar': np.full(n, -1, dtype=np.int64),
+        })
+    fills = [e for e in events if e['Event'] == 'filled']
+    if fills:
+        store.set_fills(np.array([e['Seq'] for e in fills], dtype=np.int64),
+                        _to_ns([e['Fill_Time'] for e in fills]),
+                        np.array([e['Bar'] for e in fills], dtype=np.int64))
+
+def _to_ns(timestamps: list) -> np.ndarray:
+    return np.array([ts.value for ts in timestamps], dtype=np.int64)
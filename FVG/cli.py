@@ -1,12 +1,28 @@
 import argparse
 import os
 import pandas as pd
+from typing import Iterable, Optional
 from download_data import download_data
-from resample_data import resample_data, SUPPORTED_TIMEFRAMES
-from detect_fvg import detect_fvg, analyze_fvgs
-from visualize_fvg import plot_fvgs, plot_fvg_duration_histogram, plot_fvg_frequency_timeseries
+from resample_data import resample_data, resample_cascade, SUPPORTED_TIMEFRAMES
+from detect_fvg import detect_fvg, detect_fvg_columns
+from fvg_stats import FVGStats
+from fvg_store import FVGStore
+from event_study import event_study, summarize_event_study
+from confluence import save_confluence
 from utils import ensure_output_dir, setup_logging
 from results import save_insights_to_file
+from chunked_fvg import read_bars_chunked, resample_chunks, detect_fvg_chunked, load_bars
+from universe import read_ticker_file, run_universe
+from metrics import Metrics, span
+from result_cache import (DEFAULT_MAX_BYTES, ResultCache, cached_resample_cascade, cached_detect_fvg, cached_detect_fvg_columns,
+                          cached_fvg_stats, cached_render)
+
+STAGES = (
+    'download', 'load_input', 'resample', 'detect', 'save_csv', 'plot_fvgs', 'plot_duration_histogram',
+    'plot_frequency_timeseries', 'analyze', 'save_insights', 'detect_chunked', 'save_store', 'event_study', 'confluence',
+)
+OUTPUT_FORMATS = ('csv', 'store')
+OUTPUTS = ('fvgs', 'plots', 'insights')
 
 def save_fvgs_to_csv(fvg_df: pd.DataFrame, ticker: str, timeframe: str, output_dir: str):
     """
@@ -17,45 +33,282 @@ def save_fvgs_to_csv(fvg_df: pd.DataFrame, ticker: str, timeframe: str, output_d
     fvg_df.to_csv(path, index=False)
     print(f"Saved FVGs to {path}")
 
+def fvg_store_path(ticker: str, timeframe: str, output_dir: str) -> str:
+    """
+    Directory of the FVGStore written for ticker and timeframe with --format store.
+    """
+    return os.path.join(output_dir, f"{ticker}_{timeframe}_fvgs")
+
+def process_timeframe(
+    df: pd.DataFrame,
+    ticker: str,
+    tf: str,
+    output_dir: str,
+    resampled: Optional[pd.DataFrame] = None,
+    metrics: Optional[Metrics] = None,
+    output_format: str = 'csv',
+    horizons: Optional[list] = None,
+    outputs: Iterable[str] = OUTPUTS,
+    cache: Optional[ResultCache] = None
+) -> Optional[FVGStats]:
+    """
+    Resample df to tf, detect FVGs, and write the CSV, plots and insights for one timeframe.
+    Pass resampled to reuse bars that were already resampled to tf.
+    With output_format='store' the FVGs are written as an FVGStore instead of a CSV, and the
+    plots and insights are computed from its memory-mapped columns.
+    With horizons (bar counts), forward-return event study aggregates are added to the insights.
+    outputs selects what is written: the FVGs, the plots and/or the insights. matplotlib is
+    only imported when plots are asked for.
+    With cache, resampling, detection, analysis and plots reuse results computed earlier from
+    the same bars, parameters and code (see result_cache).
+    With metrics, each step is recorded as a span labelled with ticker and timeframe.
+    Returns the FVG statistics (mergeable across jobs), or None if there was no data after resampling.
+    """
+    labels = {'ticker': ticker, 'timeframe': tf}
+    if resampled is None:
+        with span(metrics, 'resample', **labels) as record:
+            resampled = resample_data(df, tf) if cache is None else cached_resample_cascade(cache, df, [tf])[tf]
+            record['rows'] = len(resampled)
+    if resampled.empty:
+        print(f"No data after resampling to {tf}. Skipping.")
+        return None
+    outputs = _check_outputs(outputs)
+    # The store is the in-memory form of --format store only once it is written.
+    use_store = output_format == 'store' and 'fvgs' in outputs
+    if use_store:
+        with span(metrics, 'detect', **labels) as record:
+            cols = detect_fvg_columns(resampled) if cache is None else cached_detect_fvg_columns(cache, resampled)
+            record['rows'], record['fvgs'] = len(resampled), len(cols['timestamp'])
+        with span(metrics, 'save_store', **labels):
+            path = fvg_store_path(ticker, tf, output_dir)
+            fvg_df = FVGStore.create(path, resampled.index.tz).append(cols)
+            print(f"Saved FVGs to {path}")
+    else:
+        with span(metrics, 'detect', **labels) as record:
+            fvg_df = detect_fvg(resampled) if cache is None else cached_detect_fvg(cache, resampled)
+            record['rows'], record['fvgs'] = len(resampled), len(fvg_df)
+        if 'fvgs' in outputs:
+            with span(metrics, 'save_csv', **labels):
+                save_fvgs_to_csv(fvg_df, ticker, tf, output_dir)
+    if 'plots' in outputs:
+        plot_path = os.path.join(output_dir, f"{ticker}_{tf}_fvg_plot.png")
+        with span(metrics, 'plot_fvgs', **labels):
+            _render(cache, 'plot_fvgs', plot_path, resampled, fvg_df, tf)
+        # New: plot FVG duration histogram
+        duration_hist_path = os.path.join(output_dir, f"{ticker}_{tf}_fvg_duration_hist.png")
+        with span(metrics, 'plot_duration_histogram', **labels):
+            _render(cache, 'plot_fvg_duration_histogram', duration_hist_path, fvg_df)
+        # New: plot FVG frequency timeseries
+        freq_timeseries_path = os.path.join(output_dir, f"{ticker}_{tf}_fvg_frequency_timeseries.png")
+        with span(metrics, 'plot_frequency_timeseries', **labels):
+            _render(cache, 'plot_fvg_frequency_timeseries', freq_timeseries_path, fvg_df)
+    with span(metrics, 'analyze', **labels) as record:
+        if cache is not None:
+            stats = cached_fvg_stats(cache, fvg_df)
+        else:
+            stats = FVGStats.from_store(fvg_df) if use_store else FVGStats.from_frame(fvg_df)
+        insights = stats.to_insights()
+        record['fvgs'] = stats.total
+    if 'insights' not in outputs:
+        return stats
+    if horizons:
+        with span(metrics, 'event_study', **labels) as record:
+            insights.update(summarize_event_study(event_study(resampled, horizons)))
+            record['rows'], record['fvgs'] = len(resampled), stats.total
+    print(f"Insights for {tf}: {insights}")
+    with span(metrics, 'save_insights', **labels):
+        save_insights_to_file(insights, ticker, tf, output_dir)
+    return stats
+
+def run_chunked(
+    input_path: str,
+    chunk_size: int,
+    ticker: str,
+    timeframes: list,
+    output_dir: str,
+    metrics: Optional[Metrics] = None,
+    output_format: str = 'csv',
+    outputs: Iterable[str] = OUTPUTS
+):
+    """
+    Out-of-core variant of main: stream bars from input_path in windows of chunk_size bars
+    for each timeframe, so memory does not grow with the length of the history.
+    The FVG outputs match an in-memory run; the price chart is skipped since it needs every bar.
+    Insights and the duration histogram come from a fixed-size summary of the FVGs
+    (FVGStats.summarize_store: percentiles exact, means summed per block); the frequency plot
+    reads back only their timestamps. The FVG file is always written.
+    """
+    outputs = _check_outputs(outputs)
+    for tf in timeframes:
+        if tf not in SUPPORTED_TIMEFRAMES:
+            print(f"Skipping unsupported timeframe: {tf}")
+            continue
+        labels = {'ticker': ticker, 'timeframe': tf}
+        if output_format == 'store':
+            path = fvg_store_path(ticker, tf, output_dir)
+        else:
+            path = os.path.join(output_dir, f"{ticker}_{tf}_fvgs.csv")
+        stats = FVGStats()
+        with span(metrics, 'detect_chunked', **labels) as record:
+            bars = resample_chunks(read_bars_chunked(input_path, chunk_size), tf)
+            count = detect_fvg_chunked(bars, path, write_rows=chunk_size, output_format=output_format, stats=stats)
+            record['fvgs'] = count
+        print(f"Saved FVGs to {path}")
+        if 'plots' in outputs:
+            from visualize_fvg import plot_fvg_duration_histogram, plot_fvg_frequency_timeseries
+            duration_hist_path = os.path.join(output_dir, f"{ticker}_{tf}_fvg_duration_hist.png")
+            with span(metrics, 'plot_duration_histogram', **labels):
+                plot_fvg_duration_histogram(stats, duration_hist_path)
+            # The store's timestamps are memory-mapped; from a CSV only that column is parsed.
+            if output_format == 'store':
+                timestamps = FVGStore(path)
+            else:
+                timestamps = pd.read_csv(path, usecols=['Timestamp']) if count else pd.DataFrame()
+            freq_timeseries_path = os.path.join(output_dir, f"{ticker}_{tf}_fvg_frequency_timeseries.png")
+            with span(metrics, 'plot_frequency_timeseries', **labels):
+                plot_fvg_frequency_timeseries(timestamps, freq_timeseries_path)
+        if 'insights' not in outputs:
+            continue
+        with span(metrics, 'analyze', **labels) as record:
+            insights = stats.to_insights()
+            record['fvgs'] = stats.total
+        print(f"Insights for {tf}: {insights}")
+        with span(metrics, 'save_insights', **labels):
+            save_insights_to_file(insights, ticker, tf, output_dir)
+
+def _render(cache: Optional[ResultCache], name: str, output_path: str, *inputs):
+    # visualize_fvg (and matplotlib with it) is only imported once a plot is drawn.
+    import visualize_fvg
+    render = getattr(visualize_fvg, name)
+    if cache is None:
+        render(*inputs, output_path)
+        return
+    frames = [i for i in inputs if isinstance(i, (pd.DataFrame, FVGStore))]
+    cached_render(cache, render, output_path, frames, *inputs[len(frames):])
+
+def _check_outputs(outputs: Iterable[str]) -> set:
+    outputs = set(outputs)
+    unknown = outputs - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown outputs {sorted(unknown)}, expected some of {OUTPUTS}")
+    return outputs
+
 def main():
     setup_logging()
     parser = argparse.ArgumentParser(description="Detect and visualize Fair Value Gaps (FVGs) across timeframes.")
-    parser.add_argument('--ticker', required=True, help='Stock ticker symbol')
-    parser.add_argument('--start', required=True, help='Start date (YYYY-MM-DD)')
-    parser.add_argument('--end', required=True, help='End date (YYYY-MM-DD)')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--ticker', help='Stock ticker symbol')
+    target.add_argument('--universe', help='File with one ticker per line; runs every (ticker, timeframe) job on a process pool')
+    parser.add_argument('--start', help='Start date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='End date (YYYY-MM-DD)')
     parser.add_argument('--timeframes', nargs='+', required=True, help='List of timeframes (e.g. 1D 12h 1h 15min)')
+    parser.add_argument('--input', help='Read 1-minute bars from this CSV instead of downloading them')
+    parser.add_argument('--chunk-size', type=int, help='Stream --input from disk in windows of this many bars')
+    parser.add_argument('--cache-dir', help='Keep downloaded bars in this local bar store and only fetch missing days')
+    parser.add_argument('--fetch-workers', type=int, default=1, help='Download chunks concurrently with this many threads')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes for --universe')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help='Write FVGs as CSV, or as an FVGStore: a directory of raw typed column files '
+                             'plus _meta.json, memory-mapped by FVGStore (not .npy files)')
+    parser.add_argument('--outputs', nargs='+', choices=OUTPUTS, default=list(OUTPUTS),
+                        help='What to write per timeframe; without plots matplotlib is never imported')
+    parser.add_argument('--horizons', type=int, nargs='+',
+                        help='Add forward returns, excursions and gap-reach rates this many bars after each FVG to the insights')
+    parser.add_argument('--confluence', action='store_true',
+                        help='Write {ticker}_confluence.csv with the FVGs of different timeframes that overlap while alive')
+    parser.add_argument('--max-ways', type=int, help='Largest set of timeframes to combine with --confluence (default: all)')
+    parser.add_argument('--result-cache', help='Reuse resampled bars, FVGs, insights and plots computed earlier '
+                                               'from the same bars, parameters and code, kept in this directory')
+    parser.add_argument('--result-cache-bytes', type=int, default=DEFAULT_MAX_BYTES,
+                        help='Evict least recently used --result-cache entries beyond this many bytes')
+    parser.add_argument('--metrics', help='Write per-stage timings to this file (.json for JSON, else Prometheus text)')
+    parser.add_argument('--profile', choices=STAGES, help='Dump cProfile and tracemalloc output for every run of this stage')
     args = parser.parse_args()
+    if args.input is None and (args.start is None or args.end is None):
+        parser.error('--start and --end are required unless --input is given')
+    if args.chunk_size is not None and args.input is None:
+        parser.error('--chunk-size requires --input')
+    if args.chunk_size is not None and args.horizons:
+        parser.error('--horizons needs every bar in memory and cannot be combined with --chunk-size')
+    if args.chunk_size is not None and args.result_cache:
+        parser.error('--result-cache hashes every bar in memory and cannot be combined with --chunk-size')
+    if args.confluence and 'fvgs' not in args.outputs:
+        parser.error('--confluence reads the FVG files back and needs fvgs in --outputs')
+    if args.universe and args.input:
+        parser.error('--universe downloads each ticker and cannot be combined with --input')
 
     output_dir = 'fvgs_output'
     ensure_output_dir(output_dir)
 
-    df = download_data(args.ticker, args.start, args.end)
+    metrics = Metrics(args.profile, output_dir) if args.metrics or args.profile else None
+    try:
+        run(args, output_dir, metrics)
+    finally:
+        if metrics is not None and args.metrics:
+            metrics.export(args.metrics)
+
+def run(args: argparse.Namespace, output_dir: str, metrics: Optional[Metrics] = None):
+    """
+    Run the mode selected by the parsed command line arguments.
+    """
+    cache = ResultCache(args.result_cache, args.result_cache_bytes) if args.result_cache else None
+    if args.universe:
+        tickers = read_ticker_file(args.universe)
+
+        def download(ticker):
+            with span(metrics, 'download', ticker=ticker) as record:
+                df = download_data(ticker, args.start, args.end, cache_dir=args.cache_dir,
+                                   max_workers=args.fetch_workers, metrics=metrics)
+                record['rows'] = len(df)
+            return df
+
+        run_universe(tickers, args.timeframes, output_dir, download, args.workers, args.format, args.horizons,
+                     args.confluence, args.max_ways, args.outputs, cache, metrics)
+        return
+
+    if args.chunk_size is not None:
+        run_chunked(args.input, args.chunk_size, args.ticker, args.timeframes, output_dir, metrics, args.format,
+                    args.outputs)
+        run_confluence(args, output_dir, metrics)
+        return
+
+    if args.input:
+        with span(metrics, 'load_input', ticker=args.ticker) as record:
+            df = load_bars(args.input)
+            record['rows'] = len(df)
+    else:
+        with span(metrics, 'download', ticker=args.ticker) as record:
+            df = download_data(args.ticker, args.start, args.end, cache_dir=args.cache_dir,
+                               max_workers=args.fetch_workers, metrics=metrics)
+            record['rows'] = len(df)
     if df.empty:
         print("No data downloaded. Exiting.")
         return
     df.index = pd.to_datetime(df.index)
 
+    # Build coarser timeframes from finer ones instead of from the raw bars each time.
+    with span(metrics, 'resample', ticker=args.ticker) as record:
+        timeframes = [tf for tf in args.timeframes if tf in SUPPORTED_TIMEFRAMES]
+        cascade = resample_cascade(df, timeframes) if cache is None else cached_resample_cascade(cache, df, timeframes)
+        record['rows'] = len(df)
     for tf in args.timeframes:
         if tf not in SUPPORTED_TIMEFRAMES:
             print(f"Skipping unsupported timeframe: {tf}")
             continue
-        resampled = resample_data(df, tf)
-        if resampled.empty:
-            print(f"No data after resampling to {tf}. Skipping.")
-            continue
-        fvg_df = detect_fvg(resampled)
-        save_fvgs_to_csv(fvg_df, args.ticker, tf, output_dir)
-        plot_path = os.path.join(output_dir, f"{args.ticker}_{tf}_fvg_plot.png")
-        plot_fvgs(resampled, fvg_df, tf, plot_path)
-        # New: plot FVG duration histogram
-        duration_hist_path = os.path.join(output_dir, f"{args.ticker}_{tf}_fvg_duration_hist.png")
-        plot_fvg_duration_histogram(fvg_df, duration_hist_path)
-        # New: plot FVG frequency timeseries
-        freq_timeseries_path = os.path.join(output_dir, f"{args.ticker}_{tf}_fvg_frequency_timeseries.png")
-        plot_fvg_frequency_timeseries(fvg_df, freq_timeseries_path)
-        insights = analyze_fvgs(fvg_df)
-        print(f"Insights for {tf}: {insights}")
-        save_insights_to_file(insights, args.ticker, tf, output_dir)
+        process_timeframe(df, args.ticker, tf, output_dir, resampled=cascade[tf], metrics=metrics,
+                          output_format=args.format, horizons=args.horizons, outputs=args.outputs, cache=cache)
+    run_confluence(args, output_dir, metrics)
+
+def run_confluence(args: argparse.Namespace, output_dir: str, metrics: Optional[Metrics] = None):
+    """
+    With --confluence, join the timeframe outputs just written for args.ticker.
+    """
+    if not args.confluence:
+        return
+    timeframes = [tf for tf in args.timeframes if tf in SUPPORTED_TIMEFRAMES]
+    with span(metrics, 'confluence', ticker=args.ticker) as record:
+        record['rows'] = save_confluence(args.ticker, timeframes, output_dir, args.max_ways)
+    print(f"Saved {record['rows']} FVG confluences for {args.ticker}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,57 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter: at most `rate` acquisitions per second on average,
+    with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable = time.monotonic, sleep: Callable = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a token is available, then take it.
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+def jittered_backoff(pause: float, attempt: int) -> float:
+    """
+    Exponential backoff with jitter: pause * 2**(attempt-1), scaled by a random factor in [0.5, 1.5).
+    """
+    return pause * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+def fetch_chunks_concurrently(
+    chunks: List[tuple],
+    fetch_one: Callable,
+    max_workers: int,
+    limiter: Optional[TokenBucket] = None
+) -> List:
+    """
+    Run fetch_one(idx, start, end, limiter) for every (start, end) chunk on a bounded thread pool.
+    Results come back in chunk order regardless of completion order.
+    """
+    logging.info(f"  Fetching {len(chunks)} chunk(s) with {max_workers} worker(s).")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(fetch_one, idx, s, e, limiter) for idx, (s, e) in enumerate(chunks, start=1)]
+        return [f.result() for f in futures]
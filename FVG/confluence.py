@@ -0,0 +1,254 @@
+import os
+import bisect
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Union
+from fvg_store import FVGStore, NAT, TYPE_CODES, is_fvg_store
+from resample_data import SUPPORTED_TIMEFRAMES, TIMEFRAME_NANOS
+from fvg_stats import _utc_nanos
+
+CONFLUENCE_COLUMNS = ['Ways', 'Timeframes', 'Gap_Rows', 'Types', 'Aligned', 'Start', 'End', 'Lifetime',
+                      'Open', 'Overlap_Low', 'Overlap_High', 'Overlap_Size']
+
+class _ActivePrices:
+    """
+    The gaps alive at the current sweep time, indexed by price. A gap [low, high) sits in the
+    O(log n) canonical nodes of a segment tree over the compressed price coordinates, so
+    stab(p) reports the gaps containing p in O(log n + k); a sorted list of (low, id) reports
+    the gaps whose low lies strictly inside a range.
+    """
+
+    def __init__(self, n_coords: int):
+        self.size = 1
+        while self.size < max(n_coords, 1):
+            self.size *= 2
+        self.nodes = [None] * (2 * self.size)
+        self.lows = []
+
+    def _canonical(self, lo: int, hi: int):
+        lo, hi = lo + self.size, hi + self.size
+        while lo < hi:
+            if lo & 1:
+                yield lo
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                yield hi
+            lo >>= 1
+            hi >>= 1
+
+    def add(self, gap: int, low: float, lo: int, hi: int):
+        for node in self._canonical(lo, hi):
+            if self.nodes[node] is None:
+                self.nodes[node] = set()
+            self.nodes[node].add(gap)
+        bisect.insort(self.lows, (low, gap))
+
+    def remove(self, gap: int, low: float, lo: int, hi: int):
+        for node in self._canonical(lo, hi):
+            self.nodes[node].discard(gap)
+        del self.lows[bisect.bisect_left(self.lows, (low, gap))]
+
+    def overlapping(self, low: float, high: float, lo: int) -> List[int]:
+        """
+        Active gaps [l, h) with l < high and h > low: those containing low, plus those
+        starting strictly inside (low, high). The two sets are disjoint.
+        """
+        found = []
+        node = lo + self.size
+        while node:
+            if self.nodes[node]:
+                found.extend(self.nodes[node])
+            node >>= 1
+        start = bisect.bisect_right(self.lows, (low, np.inf))
+        stop = bisect.bisect_left(self.lows, (high, -np.inf))
+        found.extend(gap for _, gap in self.lows[start:stop])
+        return found
+
+def find_confluence(
+    fvgs: Dict[str, Union[pd.DataFrame, FVGStore]],
+    as_of=None,
+    min_ways: int = 2,
+    max_ways: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Find FVGs from different timeframes whose price ranges overlap while they are all alive.
+
+    fvgs maps a timeframe in SUPPORTED_TIMEFRAMES to its detect_fvg frame (or FVGStore).
+    A gap is alive from the close of its creation bar to the close of the bar that fills it,
+    or to as_of if it is never filled (default: the latest time in the inputs). Price ranges
+    must overlap by more than a point; gaps from the same timeframe are never combined.
+
+    Returns one row per set of min_ways..max_ways gaps (one per timeframe, coarsest first)
+    with a common overlap: the pairwise overlaps are the Ways == 2 rows. Start/End/Lifetime
+    describe when all of them were alive together, Overlap_Low/High/Size the shared price
+    range, Open whether none of them was filled, Aligned whether they point the same way.
+    Gap_Rows are row positions in each timeframe's input.
+
+    One sweep over creation and fill times keeps the alive gaps in a price index (_ActivePrices).
+    Each gap is reported with the alive gaps it overlaps when it is created, so every set is
+    found once, from its youngest member: O((n + m) log n + k) for pairs. Larger sets are
+    grown from those candidates, narrowing the shared range as they go.
+    """
+    order = [tf for tf in SUPPORTED_TIMEFRAMES if tf in fvgs]
+    unknown = set(fvgs) - set(order)
+    if unknown:
+        raise ValueError(f"Unsupported timeframes: {sorted(unknown)}")
+    parts = [(tf, _gap_arrays(fvgs[tf], tf)) for tf in order]
+    parts = [(tf, arrays) for tf, arrays in parts if len(arrays['start'])]
+    tz = next((fvgs[tf].tz if isinstance(fvgs[tf], FVGStore) else _frame_tz(fvgs[tf]) for tf, _ in parts), None)
+    if not parts:
+        return pd.DataFrame(columns=CONFLUENCE_COLUMNS)
+    tf_rank = np.concatenate([np.full(len(a['start']), k) for k, (_, a) in enumerate(parts)])
+    row = np.concatenate([np.arange(len(a['start'])) for _, a in parts])
+    start = np.concatenate([a['start'] for _, a in parts])
+    filled_end = np.concatenate([a['end'] for _, a in parts])
+    low = np.concatenate([a['low'] for _, a in parts])
+    high = np.concatenate([a['high'] for _, a in parts])
+    bullish = np.concatenate([a['bullish'] for _, a in parts])
+    is_open = filled_end == NAT
+    if as_of is None:
+        as_of_ns = int(max(start.max(), filled_end.max()))
+    else:
+        as_of_ns = _utc_nanos(pd.Series([as_of]))[0]
+    end = np.where(is_open, as_of_ns, filled_end)
+    max_ways = len(parts) if max_ways is None else max_ways
+
+    coords = np.unique(np.concatenate([low, high]))
+    lo_idx = np.searchsorted(coords, low)
+    hi_idx = np.searchsorted(coords, high)
+    # Fills before creations at the same instant: alive intervals are half-open, and gaps
+    # created at as_of are never alive.
+    ids = np.flatnonzero(end > start)
+    times = np.concatenate([end[ids], start[ids]])
+    kinds = np.concatenate([np.zeros(len(ids), dtype=np.int8), np.ones(len(ids), dtype=np.int8)])
+    gaps = np.concatenate([ids, ids])
+    events = np.lexsort((gaps, kinds, times))
+
+    active = _ActivePrices(len(coords))
+    lows, highs = low.tolist(), high.tolist()
+    ranks, lo_list, hi_list = tf_rank.tolist(), lo_idx.tolist(), hi_idx.tolist()
+    found = []
+    for g, kind in zip(gaps[events].tolist(), kinds[events].tolist()):
+        if kind == 0:
+            active.remove(g, lows[g], lo_list[g], hi_list[g])
+            continue
+        if max_ways >= 2:
+            others = [b for b in active.overlapping(lows[g], highs[g], lo_list[g]) if ranks[b] != ranks[g]]
+            if others:
+                _grow(g, others, ranks, lows, highs, min_ways, max_ways, found)
+        active.add(g, lows[g], lo_list[g], hi_list[g])
+    logging.info(f"Found {len(found)} FVG confluences across {len(parts)} timeframes")
+    return _confluence_frame(found, parts, tf_rank, row, start, end, bullish, is_open, tz)
+
+def _grow(g: int, others: List[int], ranks: list, lows: list, highs: list, min_ways: int, max_ways: int,
+          found: list):
+    # Sets containing g and at most one gap per other timeframe, whose price ranges share an overlap.
+    by_rank = {}
+    for b in others:
+        by_rank.setdefault(ranks[b], []).append(b)
+    groups = [sorted(by_rank[r]) for r in sorted(by_rank)]
+
+    def extend(k: int, members: list, low: float, high: float):
+        for j in range(k, len(groups)):
+            for b in groups[j]:
+                new_low, new_high = max(low, lows[b]), min(high, highs[b])
+                if new_low >= new_high:
+                    continue
+                grown = members + [b]
+                if len(grown) >= min_ways:
+                    found.append((grown, new_low, new_high))
+                if len(grown) < max_ways:
+                    extend(j + 1, grown, new_low, new_high)
+
+    extend(0, [g], lows[g], highs[g])
+
+def _confluence_frame(found: list, parts: list, tf_rank: np.ndarray, row: np.ndarray, start: np.ndarray,
+                      end: np.ndarray, bullish: np.ndarray, is_open: np.ndarray, tz) -> pd.DataFrame:
+    if not found:
+        return pd.DataFrame(columns=CONFLUENCE_COLUMNS)
+    names = [tf for tf, _ in parts]
+    records = []
+    for members, low, high in found:
+        members = sorted(members, key=lambda m: tf_rank[m])
+        types = ['Bullish' if bullish[m] else 'Bearish' for m in members]
+        records.append({
+            'Ways': len(members),
+            'Timeframes': '|'.join(names[tf_rank[m]] for m in members),
+            'Gap_Rows': '|'.join(str(row[m]) for m in members),
+            'Types': '|'.join(types),
+            'Aligned': len(set(types)) == 1,
+            'Start': max(start[m] for m in members),
+            'End': min(end[m] for m in members),
+            'Open': bool(all(is_open[m] for m in members)),
+            'Overlap_Low': low,
+            'Overlap_High': high,
+        })
+    frame = pd.DataFrame(records)
+    for column in ('Start', 'End'):
+        stamps = pd.DatetimeIndex(frame[column].to_numpy(dtype=np.int64).view('datetime64[ns]'))
+        frame[column] = stamps.tz_localize('UTC').tz_convert(tz) if tz is not None else stamps
+    frame['Lifetime'] = frame['End'] - frame['Start']
+    frame['Overlap_Size'] = frame['Overlap_High'] - frame['Overlap_Low']
+    return frame.sort_values(['Start', 'Ways'], kind='stable').reset_index(drop=True)[CONFLUENCE_COLUMNS]
+
+def _gap_arrays(fvgs: Union[pd.DataFrame, FVGStore], timeframe: str) -> Dict[str, np.ndarray]:
+    # Alive interval in UTC epoch ns: [creation bar close, fill bar close), NAT end while unfilled.
+    bar = TIMEFRAME_NANOS[timeframe]
+    if isinstance(fvgs, FVGStore):
+        cols = fvgs.columns()
+        filled = np.asarray(cols['filled'])
+        return {
+            'start': np.asarray(cols['timestamp']) + bar,
+            'end': np.where(filled, np.asarray(cols['fill_time']) + bar, NAT),
+            'low': np.asarray(cols['gap_low'], dtype=np.float64),
+            'high': np.asarray(cols['gap_high'], dtype=np.float64),
+            'bullish': np.asarray(cols['type']) == TYPE_CODES['Bullish'],
+        }
+    if fvgs.empty:
+        empty = np.empty(0, dtype=np.int64)
+        return {'start': empty, 'end': empty, 'low': empty * 1.0, 'high': empty * 1.0, 'bullish': empty.astype(bool)}
+    filled = fvgs['Filled'].to_numpy(dtype=bool)
+    end = np.full(len(fvgs), NAT, dtype=np.int64)
+    if filled.any():
+        end[filled] = _utc_nanos(fvgs['Fill_Time'][filled]) + bar
+    return {
+        'start': _utc_nanos(fvgs['Timestamp']) + bar,
+        'end': end,
+        'low': fvgs['Gap_Low'].to_numpy(dtype=np.float64),
+        'high': fvgs['Gap_High'].to_numpy(dtype=np.float64),
+        'bullish': (fvgs['Type'] == 'Bullish').to_numpy(),
+    }
+
+def _frame_tz(fvg_df: pd.DataFrame):
+    # detect_fvg frames keep their tz; frames read back from CSV hold strings, shown in UTC.
+    stamps = fvg_df['Timestamp']
+    return stamps.dt.tz if isinstance(stamps.dtype, pd.DatetimeTZDtype) else None
+
+def load_fvg_outputs(ticker: str, timeframes: Iterable[str], output_dir: str) -> Dict[str, Union[pd.DataFrame, FVGStore]]:
+    """
+    The FVG results cli wrote for ticker: an FVGStore directory ({ticker}_{tf}_fvgs) where
+    there is one, else the CSV. Timeframes without output are left out.
+    """
+    fvgs = {}
+    for tf in timeframes:
+        base = os.path.join(output_dir, f"{ticker}_{tf}_fvgs")
+        if is_fvg_store(base):
+            fvgs[tf] = FVGStore(base)
+        elif os.path.exists(base + '.csv'):
+            fvg_df = pd.read_csv(base + '.csv')
+            # A run without gaps writes an empty frame, which reads back without the columns.
+            fvgs[tf] = fvg_df if 'Timestamp' in fvg_df.columns else pd.DataFrame()
+    return fvgs
+
+def save_confluence(ticker: str, timeframes: Iterable[str], output_dir: str, max_ways: Optional[int] = None) -> int:
+    """
+    Find the confluences between a ticker's timeframe outputs and write them to
+    {ticker}_confluence.csv in output_dir. Returns the number of rows written.
+    """
+    confluence = find_confluence(load_fvg_outputs(ticker, timeframes, output_dir), max_ways=max_ways)
+    path = os.path.join(output_dir, f"{ticker}_confluence.csv")
+    confluence.to_csv(path, index=False)
+    logging.info(f"Saved {len(confluence)} FVG confluences to {path}")
+    return len(confluence)
@@ -1,11 +1,86 @@
+import numpy as np
 import pandas as pd
 import logging
 from typing import Optional
+from fill_resolution import resolve_fills
+from fvg_stats import FVGStats
+from fvg_store import fvg_columns
 
 def detect_fvg(df: pd.DataFrame) -> pd.DataFrame:
     """
     Detect all historical bullish and bearish FVGs in the OHLCV DataFrame.
     Returns a DataFrame with columns: ['Timestamp', 'Type', 'Gap_Low', 'Gap_High', 'Filled', 'Fill_Time']
+
+    High/Low are pulled out once as NumPy arrays and gaps are found with
+    shifted-array comparisons; the output matches detect_fvg_reference.
+    """
+    if len(df) < 3:
+        return pd.DataFrame()
+    high = df['High'].to_numpy()
+    low = df['Low'].to_numpy()
+    bars, bullish, gap_low, gap_high = find_gaps(high, low)
+    fill_idx = resolve_fills(high, low, bars, gap_low, gap_high, bullish)
+    return build_fvg_frame(df.index, bars, bullish, gap_low, gap_high, fill_idx)
+
+def detect_fvg_columns(df: pd.DataFrame) -> dict:
+    """
+    Same detection as detect_fvg, returned as typed columns (see fvg_store.COLUMNS)
+    instead of a DataFrame of strings and Timestamp objects.
+    """
+    if len(df) < 3:
+        empty = np.empty(0, dtype=np.int64)
+        return fvg_columns(pd.DatetimeIndex([]), empty, empty.astype(bool), empty, empty, empty)
+    high = df['High'].to_numpy()
+    low = df['Low'].to_numpy()
+    bars, bullish, gap_low, gap_high = find_gaps(high, low)
+    fill_idx = resolve_fills(high, low, bars, gap_low, gap_high, bullish)
+    return fvg_columns(df.index, bars, bullish, gap_low, gap_high, fill_idx)
+
+def find_gaps(high: np.ndarray, low: np.ndarray) -> tuple:
+    """
+    Find every FVG in the High/Low arrays with shifted-array comparisons.
+    Returns (bars, bullish, gap_low, gap_high): creation bar positions in ascending order,
+    a bullish mask and the gap bounds.
+    """
+    # Bar i forms a gap with bar i-2; at most one gap per bar on sane data,
+    # bullish listed before bearish if both ever trigger.
+    bull_bars = np.flatnonzero(high[:-2] < low[2:]) + 2
+    bear_bars = np.flatnonzero(low[:-2] > high[2:]) + 2
+    bars = np.concatenate([bull_bars, bear_bars])
+    bullish = np.concatenate([np.ones(len(bull_bars), dtype=bool), np.zeros(len(bear_bars), dtype=bool)])
+    order = np.argsort(bars, kind='stable')
+    bars, bullish = bars[order], bullish[order]
+    gap_low = np.where(bullish, high[bars - 2], high[bars])
+    gap_high = np.where(bullish, low[bars], low[bars - 2])
+    return bars, bullish, gap_low, gap_high
+
+def build_fvg_frame(index: pd.Index, bars: np.ndarray, bullish: np.ndarray, gap_low: np.ndarray,
+                    gap_high: np.ndarray, fill_idx: np.ndarray) -> pd.DataFrame:
+    """
+    Assemble the FVG DataFrame column by column from per-gap arrays.
+    bars/fill_idx are positions into index (fill_idx is -1 for unfilled gaps).
+    Dtypes match what detect_fvg_reference builds from its list of dicts.
+    """
+    if len(bars) == 0:
+        return pd.DataFrame()
+    filled = fill_idx >= 0
+    if filled.any():
+        fill_time = index.take(np.where(filled, fill_idx, 0)).where(filled)
+    else:
+        fill_time = [None] * len(bars)
+    return pd.DataFrame({
+        'Timestamp': index.take(bars),
+        'Type': np.where(bullish, 'Bullish', 'Bearish').astype(object),
+        'Gap_Low': gap_low,
+        'Gap_High': gap_high,
+        'Filled': filled,
+        'Fill_Time': fill_time,
+    })
+
+def detect_fvg_reference(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reference row-by-row implementation of detect_fvg.
+    Kept for equivalence tests against the array-based engine.
     """
     results = []
     for i in range(2, len(df)):
@@ -56,6 +131,16 @@ def analyze_fvgs(fvg_df: pd.DataFrame) -> dict:
     """
     Generate summary insights from the FVG DataFrame.
     Returns a dictionary of stats.
+
+    Computed in one pass by FVGStats, which leaves fvg_df untouched and adds gap-size and
+    time-to-fill percentiles to the keys of analyze_fvgs_reference.
+    """
+    return FVGStats.from_frame(fvg_df).to_insights()
+
+def analyze_fvgs_reference(fvg_df: pd.DataFrame) -> dict:
+    """
+    Reference implementation of analyze_fvgs, kept for equivalence tests.
+    Note that it adds a Gap_Size column to fvg_df.
     """
     if fvg_df.empty:
         return {'total_fvgs': 0}
@@ -1,9 +1,12 @@
 import yfinance as yf
 import pandas as pd
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import time
-from typing import List
+from typing import Callable, List, Optional
+from bar_cache import cached_days, covered_days, load_cached_bars, store_bars, flatten_columns
+from concurrent_fetch import TokenBucket, jittered_backoff, fetch_chunks_concurrently
+from metrics import Metrics, span
 
 MAX_LOOKBACK_DAYS = 30   # Yahoo only serves 1m data for the last 30 days
 MAX_CHUNK_DAYS    = 7    # and at most 7 days per request
@@ -15,6 +18,89 @@ def chunk_date_range(start: datetime, end: datetime, delta: timedelta) -> List[t
         yield current, next_end
         current = next_end
 
+def yf_fetch(ticker: str, start: datetime, end: datetime, interval: str, auto_adjust: bool) -> pd.DataFrame:
+    """
+    Fetch one chunk of bars from Yahoo Finance.
+    """
+    return yf.download(
+        tickers=ticker,
+        start=start.strftime("%Y-%m-%d"),
+        end=end.strftime("%Y-%m-%d"),
+        interval=interval,
+        auto_adjust=auto_adjust,
+        progress=False
+    )
+
+def fetch_chunks(
+    ticker: str,
+    ranges: List[tuple],
+    interval: str,
+    retries: int,
+    pause: float,
+    auto_adjust: bool,
+    fetch: Callable = yf_fetch,
+    max_workers: int = 1,
+    rate_limit: Optional[float] = None,
+    metrics: Optional[Metrics] = None
+) -> List[tuple]:
+    """
+    Fetch each (start, end) range in MAX_CHUNK_DAYS chunks.
+    Returns a list of (start, end, df) per chunk in order; df is None if the chunk failed.
+    With max_workers > 1, chunks are fetched on a thread pool behind a shared token bucket
+    (rate_limit requests per second, default 1/pause) and retried with jittered backoff.
+    With metrics, requests, rate-limit waits and sleeps are recorded as separate spans.
+    """
+    chunk_delta = timedelta(days=MAX_CHUNK_DAYS)
+    chunks = [c for r_start, r_end in ranges for c in chunk_date_range(r_start, r_end, chunk_delta)]
+    if max_workers > 1:
+        rate = rate_limit or (1.0 / pause if pause > 0 else None)
+        limiter = TokenBucket(rate, capacity=max_workers) if rate else None
+        def fetch_one(idx, s, e, limiter):
+            df = _fetch_chunk(ticker, idx, s, e, interval, retries, auto_adjust, fetch,
+                              lambda attempt: jittered_backoff(pause, attempt), limiter, metrics)
+            return s, e, df
+        return fetch_chunks_concurrently(chunks, fetch_one, max_workers, limiter)
+    results = []
+    for idx, (s, e) in enumerate(chunks, start=1):
+        df = _fetch_chunk(ticker, idx, s, e, interval, retries, auto_adjust, fetch,
+                          lambda attempt: pause * attempt, metrics=metrics)
+        results.append((s, e, df))
+        with span(metrics, 'download_pause', ticker=ticker):
+            time.sleep(pause)
+    return results
+
+def _fetch_chunk(ticker, idx, s, e, interval, retries, auto_adjust, fetch, backoff, limiter=None, metrics=None):
+    """
+    Fetch one chunk with retries. Returns the bars, an empty frame if the request succeeded
+    without data, or None if every attempt failed or Yahoo reported the prices missing.
+    """
+    logging.info(f"  Chunk {idx}: {s.date()} → {e.date()}")
+    for attempt in range(1, retries+1):
+        if limiter is not None:
+            with span(metrics, 'download_rate_limit', ticker=ticker):
+                limiter.acquire()
+        try:
+            with span(metrics, 'download_request', ticker=ticker) as record:
+                df = fetch(ticker, s, e, interval, auto_adjust)
+                record['rows'] = len(df)
+            if df.empty:
+                logging.warning(f"    → No data returned for chunk {idx}.")
+                return pd.DataFrame()
+            return df.dropna()
+        except Exception as ex:
+            msg = str(ex)
+            if "YFPricesMissingError" in msg or "no price data found" in msg:
+                # Not retried, but not an answer either: the caller must not cache it as empty.
+                logging.error(f"    → Permanent error (no data): {msg}")
+                return None
+            logging.error(f"    → Chunk {idx}, attempt {attempt} failed: {msg}")
+            if attempt < retries:
+                with span(metrics, 'download_backoff', ticker=ticker):
+                    time.sleep(backoff(attempt))
+            else:
+                logging.error(f"    → Giving up on chunk {idx}.")
+    return None
+
 def download_data(
     ticker: str,
     start: str,
@@ -22,15 +108,32 @@ def download_data(
     interval: str = '1m',
     retries: int = 3,
     pause: float = 1.0,
-    auto_adjust: bool = False
+    auto_adjust: bool = False,
+    cache_dir: Optional[str] = None,
+    fetch: Optional[Callable] = None,
+    max_workers: int = 1,
+    rate_limit: Optional[float] = None,
+    metrics: Optional[Metrics] = None
 ) -> pd.DataFrame:
+    """
+    Download bars for ticker between start and end in MAX_CHUNK_DAYS chunks.
+    With cache_dir, completed days are kept in a local day-partitioned bar store
+    (see bar_cache); only days missing from it are fetched, and cached days older than
+    MAX_LOOKBACK_DAYS are still served. fetch replaces yf_fetch (e.g. with a stub in tests).
+    max_workers/rate_limit enable concurrent chunk fetching (see fetch_chunks).
+    metrics, if given, records the time spent in requests, rate limiting and sleeps.
+    """
     logging.info(f"Requested {ticker}: {start} → {end} @ {interval}")
+    fetch = fetch or yf_fetch
 
     now = datetime.utcnow()
     start_dt = datetime.fromisoformat(start)
     end_dt   = datetime.fromisoformat(end)
 
     earliest = now - timedelta(days=MAX_LOOKBACK_DAYS)
+    if cache_dir is not None:
+        return _download_cached(ticker, start_dt, end_dt, earliest, interval, retries, pause,
+                                auto_adjust, cache_dir, fetch, max_workers, rate_limit, metrics)
     if start_dt < earliest:
         logging.warning(
             f"Start {start_dt.date()} is older than {MAX_LOOKBACK_DAYS} days; "
@@ -42,37 +145,9 @@ def download_data(
         logging.error("After clipping, start ≥ end → no data to download.")
         return pd.DataFrame()
 
-    frames = []
-    chunk_delta = timedelta(days=MAX_CHUNK_DAYS)
-
-    for idx, (s, e) in enumerate(chunk_date_range(start_dt, end_dt, chunk_delta), start=1):
-        logging.info(f"  Chunk {idx}: {s.date()} → {e.date()}")
-        for attempt in range(1, retries+1):
-            try:
-                df = yf.download(
-                    tickers=ticker,
-                    start=s.strftime("%Y-%m-%d"),
-                    end=e.strftime("%Y-%m-%d"),
-                    interval=interval,
-                    auto_adjust=auto_adjust,
-                    progress=False
-                )
-                if df.empty:
-                    logging.warning(f"    → No data returned for chunk {idx}.")
-                else:
-                    frames.append(df.dropna())
-                break
-            except Exception as ex:
-                msg = str(ex)
-                if "YFPricesMissingError" in msg or "no price data found" in msg:
-                    logging.error(f"    → Permanent error (no data): {msg}")
-                    break
-                logging.error(f"    → Chunk {idx}, attempt {attempt} failed: {msg}")
-                if attempt < retries:
-                    time.sleep(pause * attempt)
-                else:
-                    logging.error(f"    → Giving up on chunk {idx}.")
-        time.sleep(pause)
+    chunks = fetch_chunks(ticker, [(start_dt, end_dt)], interval, retries, pause, auto_adjust, fetch,
+                          max_workers, rate_limit, metrics)
+    frames = [df for _, _, df in chunks if df is not None and not df.empty]
 
     if not frames:
         logging.warning("No data downloaded for any chunk.")
@@ -84,6 +159,65 @@ def download_data(
     logging.info(f"Successfully downloaded {len(df_all)} rows.")
     return df_all
 
+def _download_cached(ticker, start_dt, end_dt, earliest, interval, retries, pause, auto_adjust, cache_dir, fetch,
+                     max_workers, rate_limit, metrics=None):
+    requested = [d.date() for d in pd.date_range(start_dt.date(), end_dt.date(), freq='D', inclusive='left')]
+    have = cached_days(cache_dir, ticker, interval, auto_adjust)
+    missing = [d for d in requested if d not in have]
+    too_old = [d for d in missing if d < earliest.date()]
+    if too_old:
+        logging.warning(
+            f"{len(too_old)} day(s) from {too_old[0]} are neither cached nor within "
+            f"{MAX_LOOKBACK_DAYS} days; they cannot be fetched."
+        )
+    to_fetch = [d for d in missing if d >= earliest.date()]
+    logging.info(f"  Cache: {len(requested) - len(missing)} day(s) cached, {len(to_fetch)} to fetch.")
+
+    frames = []
+    with span(metrics, 'cache_load', ticker=ticker) as record:
+        cached = load_cached_bars(cache_dir, ticker, interval, [d for d in requested if d in have], auto_adjust)
+        record['rows'] = len(cached)
+    if not cached.empty:
+        frames.append(cached)
+    today = datetime.utcnow().date()
+    fetched = fetch_chunks(ticker, _day_ranges(to_fetch), interval, retries, pause, auto_adjust, fetch,
+                           max_workers, rate_limit, metrics)
+    for s, e, df in fetched:
+        if df is None:
+            continue
+        df = flatten_columns(df)
+        # Only completed days are cached; today's bars are refetched on the next run, and so
+        # are weekdays without bars that covered_days cannot tell from a throttled answer.
+        done = [d.date() for d in pd.date_range(s.date(), e.date(), freq='D', inclusive='left') if d.date() < today]
+        with span(metrics, 'cache_store', ticker=ticker) as record:
+            store_bars(cache_dir, ticker, interval, df, covered_days(df, done), auto_adjust)
+            record['rows'] = len(df)
+        if not df.empty:
+            frames.append(df)
+
+    if not frames:
+        logging.warning("No data in cache or downloaded for any chunk.")
+        return pd.DataFrame()
+
+    df_all = pd.concat(frames)
+    df_all = df_all[~df_all.index.duplicated(keep='first')]
+    df_all.sort_index(inplace=True)
+    logging.info(f"Loaded {len(df_all)} rows ({len(cached)} from cache).")
+    return df_all
+
+def _day_ranges(days: List[date]) -> List[tuple]:
+    """
+    Group sorted days into contiguous [start, end) datetime ranges.
+    """
+    ranges = []
+    for d in days:
+        day_start = datetime.combine(d, datetime.min.time())
+        if ranges and ranges[-1][1] == day_start:
+            ranges[-1] = (ranges[-1][0], day_start + timedelta(days=1))
+        else:
+            ranges.append((day_start, day_start + timedelta(days=1)))
+    return ranges
+
 if __name__ == "__main__":
     import sys
     logging.basicConfig(
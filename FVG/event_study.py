@@ -0,0 +1,129 @@
+import logging
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, Optional
+from detect_fvg import find_gaps
+
+DEFAULT_HORIZONS = (1, 5, 10, 20)
+
+def event_study(
+    df: pd.DataFrame,
+    horizons: Iterable[int] = DEFAULT_HORIZONS,
+    fvg_df: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Price behaviour after every FVG in the OHLC DataFrame df, over each horizon h (in bars).
+
+    The entry is the Close of the gap's creation bar and the window is the h bars after it.
+    Per gap and horizon:
+      return_{h}:  forward return to the window's last Close,
+      mfe_{h}:     maximum favorable excursion (best High for bullish, best Low for bearish),
+      mae_{h}:     maximum adverse excursion, as a positive fraction of the entry,
+      reached_{h}: whether price came back to the gap's near edge within the window.
+    Returns and excursions are signed in the gap's direction, so a bearish gap followed by a
+    falling price has a positive return. Horizons that run past the last bar are NaN / <NA>.
+
+    Gaps are those of detect_fvg(df), or the rows of fvg_df (e.g. a filtered subset). Window
+    extremes for every start bar are precomputed once per horizon by doubling, so the cost is
+    O(n log max(horizons)) plus O(1) per gap and horizon, with no per-gap slicing.
+    """
+    horizons = sorted(set(int(h) for h in horizons))
+    if not horizons or horizons[0] < 1:
+        raise ValueError(f"Horizons must be positive bar counts, got {horizons}")
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    if fvg_df is not None and not fvg_df.empty:
+        bars = df.index.get_indexer(pd.DatetimeIndex(fvg_df['Timestamp']))
+        if (bars < 0).any():
+            raise ValueError("fvg_df has timestamps that are not bars of df")
+        bullish = (fvg_df['Type'] == 'Bullish').to_numpy()
+        gap_low = fvg_df['Gap_Low'].to_numpy(dtype=np.float64)
+        gap_high = fvg_df['Gap_High'].to_numpy(dtype=np.float64)
+    elif fvg_df is None and len(df) >= 3:
+        bars, bullish, gap_low, gap_high = find_gaps(high, low)
+    else:
+        bars = np.empty(0, dtype=np.int64)
+        bullish, gap_low, gap_high = np.empty(0, dtype=bool), np.empty(0), np.empty(0)
+
+    n = len(df)
+    entry = close[bars]
+    sign = np.where(bullish, 1.0, -1.0)
+    window_high = window_extremes(high, horizons, np.maximum)
+    window_low = window_extremes(low, horizons, np.minimum)
+    events = {
+        'Timestamp': df.index.take(bars),
+        'Type': np.where(bullish, 'Bullish', 'Bearish').astype(object),
+        'Gap_Low': gap_low,
+        'Gap_High': gap_high,
+        'Entry': entry,
+    }
+    for h in horizons:
+        valid = bars + h < n
+        hi = _gather(window_high[h], bars + 1, valid)
+        lo = _gather(window_low[h], bars + 1, valid)
+        last = _gather(close, bars + h, valid)
+        events[f'return_{h}'] = sign * (last / entry - 1)
+        events[f'mfe_{h}'] = np.where(bullish, hi / entry - 1, 1 - lo / entry)
+        events[f'mae_{h}'] = np.where(bullish, 1 - lo / entry, hi / entry - 1)
+        reached = pd.array(np.where(bullish, lo <= gap_high, hi >= gap_low), dtype='boolean')
+        reached[~valid] = pd.NA
+        events[f'reached_{h}'] = reached
+    logging.info(f"Event study of {len(bars)} FVGs over horizons {horizons}")
+    return pd.DataFrame(events)
+
+def window_extremes(values: np.ndarray, horizons: Iterable[int], reduce: Callable) -> Dict[int, np.ndarray]:
+    """
+    For each horizon h, reduce (np.maximum or np.minimum) over every window of h values:
+    result[h][i] = reduce of values[i:i + h], for i in 0..len(values) - h.
+    Windows of 2**k values are built by doubling and any h is covered by two overlapping
+    ones, so all horizons together cost O(n log max(horizons)).
+    """
+    n = len(values)
+    levels = [np.asarray(values)]  # levels[k][i] = reduce of values[i:i + 2**k]
+    result = {}
+    for h in sorted(set(horizons)):
+        if h > n:
+            result[h] = np.empty(0, dtype=levels[0].dtype)
+            continue
+        k = h.bit_length() - 1
+        while len(levels) <= k:
+            step = 1 << (len(levels) - 1)
+            prev = levels[-1]
+            levels.append(reduce(prev[:-step], prev[step:]))
+        level, width = levels[k], 1 << k
+        result[h] = reduce(level[:n - h + 1], level[h - width:n - width + 1])
+    return result
+
+def _gather(values: np.ndarray, positions: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    out = np.full(len(positions), np.nan)
+    out[valid] = values[positions[valid]]
+    return out
+
+def summarize_event_study(events: pd.DataFrame, horizons: Optional[Iterable[int]] = None) -> Dict:
+    """
+    Aggregate event_study output into a flat dict of plain numbers, overall and per type,
+    ready for results.save_insights_to_file or to merge into analyze_fvgs insights.
+    Keys are {prefix}{stat}_{h}b with prefix '', 'bullish_' or 'bearish_'; only gaps whose
+    window fits in the data count (events_{h}b).
+    """
+    if horizons is None:
+        horizons = sorted(int(c.split('_')[1]) for c in events.columns if c.startswith('return_'))
+    bullish = (events['Type'] == 'Bullish').to_numpy() if len(events) else np.empty(0, dtype=bool)
+    summary = {}
+    for h in horizons:
+        returns = events[f'return_{h}'].to_numpy(dtype=np.float64)
+        mfe = events[f'mfe_{h}'].to_numpy(dtype=np.float64)
+        mae = events[f'mae_{h}'].to_numpy(dtype=np.float64)
+        reached = events[f'reached_{h}'].to_numpy(dtype=np.float64, na_value=np.nan)
+        for prefix, sel in (('', np.ones(len(events), dtype=bool)), ('bullish_', bullish), ('bearish_', ~bullish)):
+            sel = sel & ~np.isnan(returns)
+            count = int(sel.sum())
+            summary[f'{prefix}events_{h}b'] = count
+            summary[f'{prefix}avg_return_{h}b'] = float(returns[sel].mean()) if count else None
+            summary[f'{prefix}median_return_{h}b'] = float(np.median(returns[sel])) if count else None
+            summary[f'{prefix}win_rate_{h}b'] = float((returns[sel] > 0).mean()) if count else None
+            summary[f'{prefix}avg_mfe_{h}b'] = float(mfe[sel].mean()) if count else None
+            summary[f'{prefix}avg_mae_{h}b'] = float(mae[sel].mean()) if count else None
+            summary[f'{prefix}reach_prob_{h}b'] = float(reached[sel].mean()) if count else None
+    return summary
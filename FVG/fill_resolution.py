@@ -0,0 +1,73 @@
+import numpy as np
+
+def build_min_tree(values: np.ndarray) -> np.ndarray:
+    """
+    Build an array-backed segment tree of range minima over values.
+    Leaves live at [size, size + len(values)); padding and NaN leaves are +inf
+    so they never satisfy a `<= level` query.
+    """
+    n = len(values)
+    size = 1
+    while size < max(n, 1):
+        size *= 2
+    tree = np.full(2 * size, np.inf)
+    leaves = np.asarray(values, dtype=float)
+    tree[size:size + n] = np.where(np.isnan(leaves), np.inf, leaves)
+    for lo in (size >> k for k in range(1, size.bit_length())):
+        tree[lo:2 * lo] = np.minimum(tree[2 * lo:4 * lo:2], tree[2 * lo + 1:4 * lo:2])
+    return tree
+
+def first_at_or_below(tree: np.ndarray, start: np.ndarray, level: np.ndarray) -> np.ndarray:
+    """
+    For each query k return the smallest j >= start[k] whose value is <= level[k],
+    or -1 if there is none. All queries descend the tree together, so a batch of
+    q queries over n values costs O(n + q log n).
+    """
+    size = len(tree) // 2
+    start = np.asarray(start, dtype=np.int64)
+    level = np.asarray(level, dtype=float)
+    result = np.full(len(start), -1, dtype=np.int64)
+    # Walk right from the leaf at `start` until a subtree holds a match.
+    pos = start + size
+    k = np.flatnonzero(start < size)
+    found = []
+    while len(k):
+        hit = tree[pos[k]] <= level[k]
+        found.append(k[hit])
+        k = k[~hit]
+        nxt = pos[k] + 1
+        nxt = nxt // (nxt & -nxt)  # climb while we were a right child, then step right
+        pos[k] = nxt
+        k = k[nxt != 1]  # nxt == 1 means we walked off the right edge
+    found = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+    # Descend from each matching subtree to its leftmost matching leaf.
+    k = found[pos[found] < size]
+    while len(k):
+        left = 2 * pos[k]
+        pos[k] = np.where(tree[left] <= level[k], left, left + 1)
+        k = k[pos[k] < size]
+    result[found] = pos[found] - size
+    return result
+
+def resolve_fills(high: np.ndarray, low: np.ndarray, bars: np.ndarray, gap_low: np.ndarray,
+                  gap_high: np.ndarray, bullish: np.ndarray) -> np.ndarray:
+    """
+    Return, for each gap, the position of the first bar after its creation bar that fills it,
+    or -1 if it is never filled.
+    Bullish gaps fill on the first Low <= Gap_Low, bearish gaps on the first High >= Gap_High
+    (same rule as check_fvg_filled), answered for the whole batch in O((n + q) log n).
+    """
+    bars = np.asarray(bars, dtype=np.int64)
+    bullish = np.asarray(bullish, dtype=bool)
+    fill_idx = np.full(len(bars), -1, dtype=np.int64)
+    if len(bars) == 0:
+        return fill_idx
+    bull = np.flatnonzero(bullish)
+    if len(bull):
+        fill_idx[bull] = first_at_or_below(build_min_tree(low), bars[bull] + 1, gap_low[bull])
+    bear = np.flatnonzero(~bullish)
+    if len(bear):
+        # High >= x  <=>  -High <= -x
+        neg_high = -np.asarray(high, dtype=float)
+        fill_idx[bear] = first_at_or_below(build_min_tree(neg_high), bars[bear] + 1, -np.asarray(gap_high, dtype=float)[bear])
+    return fill_idx
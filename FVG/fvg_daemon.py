@@ -0,0 +1,280 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional
+from rpc import RPCClient, make_server
+
+# Only the standard library and rpc are imported at module level, so the client side of
+# this module starts in milliseconds; pandas and the FVG pipeline load when a daemon starts.
+
+DEFAULT_ADDRESS = '127.0.0.1:8766'
+DEFAULT_CACHE_BYTES = 1 << 30
+
+def frame_nbytes(frame) -> int:
+    """
+    Memory held by a DataFrame, index and object columns included.
+    """
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its values (sizeof(value) bytes).
+    A value larger than max_bytes on its own is not kept.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, sizeof: Callable = frame_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        nbytes = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def stats(self) -> Dict:
+        return {'entries': len(self._entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+class FVGDaemon:
+    """
+    Runs cli jobs in a long-lived process: the pipeline is imported once, and downloaded
+    (or loaded) bars and their resampled timeframes stay in an LRU cache bounded by
+    cache_bytes, so repeated jobs on the same ticker and range skip straight to detection.
+    Downloads whose range reaches today are not cached, as today's bars are still incomplete.
+    Jobs run one at a time (matplotlib is not thread safe); stats() does not wait for them.
+    With result_cache (a result_cache.ResultCache), detection, analysis and plots are also
+    reused across daemon restarts.
+    """
+
+    def __init__(self, output_dir: str = 'fvgs_output', cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 cache_dir: Optional[str] = None, download: Optional[Callable] = None, result_cache=None):
+        import cli  # warm the pipeline imports; matplotlib waits for the first plot
+        self.output_dir = output_dir
+        self.cache_dir = cache_dir
+        self.result_cache = result_cache
+        self.cache = LRUCache(cache_bytes)
+        self._download = download
+        self._job_lock = threading.Lock()
+        self.jobs = 0
+
+    def run(
+        self,
+        ticker: str,
+        timeframes: List[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        input_path: Optional[str] = None,
+        outputs: Optional[List[str]] = None,
+        output_format: str = 'csv',
+        horizons: Optional[List[int]] = None,
+        fetch_workers: int = 1
+    ) -> Dict:
+        """
+        Process ticker's bars between start and end (or the 1-minute bars CSV input_path)
+        for each timeframe, like a cli run writing outputs to output_dir. Returns per-timeframe
+        insights ({'status': 'empty'} or {'status': 'skipped'} where there are none) and
+        whether the bars came from the cache.
+        """
+        from cli import OUTPUTS, process_timeframe
+        from resample_data import resample_cascade, SUPPORTED_TIMEFRAMES
+        from utils import ensure_output_dir
+        outputs = list(OUTPUTS) if outputs is None else outputs
+        started = time.perf_counter()
+        with self._job_lock:
+            self.jobs += 1
+            ensure_output_dir(self.output_dir)
+            key = self._bars_key(ticker, start, end, input_path)
+            supported = [tf for tf in timeframes if tf in SUPPORTED_TIMEFRAMES]
+            resampled = {tf: self.cache.get(key + (tf,)) if key else None for tf in supported}
+            missing = [tf for tf in supported if resampled[tf] is None]
+            df = self.cache.get(key) if key and missing else None
+            cached = not missing or df is not None
+            if missing:
+                if df is None:
+                    df = self._load(ticker, start, end, input_path, fetch_workers)
+                    if key:
+                        self.cache.put(key, df)
+                if not df.empty:
+                    for tf, bars in resample_cascade(df, missing).items():
+                        resampled[tf] = bars
+                        if key:
+                            self.cache.put(key + (tf,), bars)
+            results = {}
+            for tf in timeframes:
+                if tf not in supported:
+                    results[tf] = {'status': 'skipped'}
+                    continue
+                if resampled[tf] is None:
+                    results[tf] = {'status': 'empty'}
+                    continue
+                stats = process_timeframe(df, ticker, tf, self.output_dir, resampled=resampled[tf],
+                                          output_format=output_format, horizons=horizons, outputs=outputs,
+                                          cache=self.result_cache)
+                results[tf] = {'status': 'empty'} if stats is None else {'status': 'ok', 'insights': stats.to_insights()}
+        return {'ticker': ticker, 'timeframes': results, 'cached_bars': cached,
+                'seconds': time.perf_counter() - started}
+
+    def stats(self) -> Dict:
+        return {'jobs': self.jobs, 'cache': self.cache.stats(), 'pid': os.getpid(),
+                'matplotlib_loaded': 'matplotlib' in sys.modules}
+
+    def clear(self) -> Dict:
+        self.cache.clear()
+        return self.stats()
+
+    def _bars_key(self, ticker: str, start, end, input_path) -> Optional[tuple]:
+        """
+        Cache key of a job's bars, or None if they must not be cached.
+        """
+        if input_path is not None:
+            # A rewritten input file gets a new key instead of serving stale bars.
+            info = os.stat(input_path)
+            return ('input', os.path.abspath(input_path), info.st_mtime_ns, info.st_size)
+        if end is None or datetime.fromisoformat(end).date() >= datetime.utcnow().date():
+            # Like bar_cache, keep only completed days: today's bars are still coming in.
+            return None
+        return ('download', ticker, start, end, self.cache_dir)
+
+    def _load(self, ticker: str, start, end, input_path, fetch_workers: int):
+        import pandas as pd
+        from chunked_fvg import load_bars
+        from download_data import download_data
+        if input_path is not None:
+            return load_bars(input_path)
+        if start is None or end is None:
+            raise ValueError('start and end are required unless input_path is given')
+        if self._download is not None:
+            df = self._download(ticker, start, end)
+        else:
+            df = download_data(ticker, start, end, cache_dir=self.cache_dir, max_workers=fetch_workers)
+        if not df.empty:
+            df.index = pd.to_datetime(df.index)
+        return df
+
+def handlers(daemon: FVGDaemon, server=None) -> Dict:
+    """
+    RPC methods served for a daemon. 'shutdown' stops server after replying.
+    """
+    methods = {'run': daemon.run, 'stats': daemon.stats, 'clear': daemon.clear}
+    if server is not None:
+        def shutdown() -> bool:
+            threading.Thread(target=server.shutdown, daemon=True).start()
+            return True
+        methods['shutdown'] = shutdown
+    return methods
+
+def serve(address: str, daemon: FVGDaemon):
+    """
+    Serve daemon on address until shutdown is requested or the process is interrupted.
+    """
+    methods = {}
+    server = make_server(methods, address)
+    methods.update(handlers(daemon, server))
+    logging.info(f"FVG daemon {os.getpid()} serving on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+class DaemonClient(RPCClient):
+    """
+    Thin client submitting jobs to a running daemon.
+    """
+
+    def run(self, ticker: str, timeframes: List[str], **job) -> Dict:
+        return self.call('run', ticker=ticker, timeframes=timeframes, **job)
+
+    def stats(self) -> Dict:
+        return self.call('stats')
+
+    def clear(self) -> Dict:
+        return self.call('clear')
+
+    def shutdown(self) -> bool:
+        return self.call('shutdown')
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run FVG jobs in a warm, caching daemon process.")
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help="host:port or unix:/path/to.sock")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='Start the daemon')
+    serve_parser.add_argument('--output-dir', default='fvgs_output')
+    serve_parser.add_argument('--cache-bytes', type=int, default=DEFAULT_CACHE_BYTES,
+                              help='Evict least recently used frames beyond this many bytes')
+    serve_parser.add_argument('--cache-dir', help='Local bar store for downloads (see cli --cache-dir)')
+    serve_parser.add_argument('--result-cache', help='On-disk result cache directory (see cli --result-cache)')
+    submit = commands.add_parser('submit', help='Submit a job to a running daemon')
+    submit.add_argument('--ticker', required=True)
+    submit.add_argument('--timeframes', nargs='+', required=True)
+    submit.add_argument('--start')
+    submit.add_argument('--end')
+    submit.add_argument('--input', help='1-minute bars CSV instead of downloading')
+    submit.add_argument('--outputs', nargs='+', help='Any of fvgs, plots, insights (default: all)')
+    submit.add_argument('--format', default='csv', dest='output_format')
+    submit.add_argument('--horizons', type=int, nargs='+')
+    commands.add_parser('stats', help="Show the daemon's cache statistics")
+    commands.add_parser('clear', help="Empty the daemon's frame cache")
+    commands.add_parser('shutdown', help='Stop the daemon')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        from utils import setup_logging
+        setup_logging()
+        from result_cache import ResultCache
+        result_cache = ResultCache(args.result_cache) if args.result_cache else None
+        serve(args.address, FVGDaemon(args.output_dir, args.cache_bytes, args.cache_dir, result_cache=result_cache))
+        return 0
+    import json
+    with DaemonClient(args.address) as client:
+        if args.command == 'submit':
+            job = {name: getattr(args, name) for name in ('start', 'end', 'outputs', 'output_format', 'horizons')}
+            job['input_path'] = os.path.abspath(args.input) if args.input else None
+            result = client.run(args.ticker, args.timeframes, **job)
+        else:
+            result = client.call(args.command)
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Union
+from confluence import _frame_tz
+from fvg_stats import _utc_nanos
+from fvg_store import FVGStore, NAT, TYPE_CODES
+from resample_data import TIMEFRAME_NANOS
+from stream_fvg import StreamingFVGDetector
+
+OPEN = np.iinfo(np.int64).max  # end of the alive interval of a gap that is not filled yet
+
+class _TimeTree:
+    """
+    Static segment tree over time for a snapshot of gaps. Gap g is alive in [start, end) and
+    sits in the O(log n) canonical nodes covering that range. Each node keeps its gaps sorted
+    by low and, separately, by high (CSR arrays), so a query at time T walks the O(log n)
+    nodes from T's leaf to the root and answers the price part with binary searches.
+    """
+
+    def __init__(self, ids: np.ndarray, start: np.ndarray, end: np.ndarray, low: np.ndarray, high: np.ndarray):
+        self.times = np.unique(np.concatenate([start, end[end != OPEN]]))
+        leaves = max(len(self.times), 1)
+        size = 1
+        while size < leaves:
+            size *= 2
+        self.size = size
+        lo = np.searchsorted(self.times, start) + size
+        hi = np.where(end == OPEN, leaves, np.searchsorted(self.times, end)) + size
+        gap = np.arange(len(ids))
+        nodes, members = [], []
+        while len(gap):
+            keep = lo < hi
+            lo, hi, gap = lo[keep], hi[keep], gap[keep]
+            odd = (lo & 1) == 1
+            nodes.append(lo[odd])
+            members.append(gap[odd])
+            lo = lo + odd
+            odd = (hi & 1) == 1
+            hi = hi - odd
+            nodes.append(hi[odd])
+            members.append(gap[odd])
+            lo, hi = lo >> 1, hi >> 1
+        nodes = np.concatenate(nodes) if nodes else np.empty(0, dtype=np.int64)
+        members = np.concatenate(members) if members else np.empty(0, dtype=np.int64)
+        self.ptr = np.searchsorted(np.sort(nodes), np.arange(2 * size + 1))
+        by_low = members[np.lexsort((low[members], nodes))]
+        self.low_by_low, self.high_by_low, self.id_by_low = low[by_low], high[by_low], ids[by_low]
+        by_high = members[np.lexsort((high[members], nodes))]
+        self.high_by_high, self.id_by_high = high[by_high], ids[by_high]
+
+    def _path(self, t: int):
+        leaf = int(np.searchsorted(self.times, t, side='right')) - 1
+        if leaf < 0:
+            return
+        node = leaf + self.size
+        while node:
+            a, b = self.ptr[node], self.ptr[node + 1]
+            if a < b:
+                yield a, b
+            node >>= 1
+
+    def containing(self, t: int, price: float) -> List[np.ndarray]:
+        found = []
+        for a, b in self._path(t):
+            k = a + int(np.searchsorted(self.low_by_low[a:b], price, side='right'))
+            hit = np.flatnonzero(self.high_by_low[a:k] >= price)
+            if len(hit):
+                found.append(self.id_by_low[a + hit])
+        return found
+
+    def nearest_above(self, t: int, price: float, stale: np.ndarray) -> Optional[tuple]:
+        best = None
+        for a, b in self._path(t):
+            k = a + int(np.searchsorted(self.low_by_low[a:b], price, side='right'))
+            while k < b and stale[self.id_by_low[k]]:
+                k += 1
+            if k < b and (best is None or self.low_by_low[k] < best[0]):
+                best = (self.low_by_low[k], self.id_by_low[k])
+        return best
+
+    def nearest_below(self, t: int, price: float, stale: np.ndarray) -> Optional[tuple]:
+        best = None
+        for a, b in self._path(t):
+            k = a + int(np.searchsorted(self.high_by_high[a:b], price, side='left')) - 1
+            while k >= a and stale[self.id_by_high[k]]:
+                k -= 1
+            if k >= a and (best is None or self.high_by_high[k] > best[0]):
+                best = (self.high_by_high[k], self.id_by_high[k])
+        return best
+
+class GapIndex:
+    """
+    The gaps of one (ticker, timeframe), queryable by price and time.
+
+    A gap is alive from the close of its creation bar until the close of the bar that fills
+    it (open-ended while unfilled). Gaps live in a static _TimeTree snapshot plus a small delta
+    of gaps created or filled since; the tree is rebuilt once the delta outgrows
+    max(min_rebuild, rebuild_fraction * gaps), which keeps updates amortized O(log n).
+    """
+
+    def __init__(self, timeframe: str, tz=None, rebuild_fraction: float = 0.25, min_rebuild: int = 4096):
+        self.timeframe = timeframe
+        self.tz = tz
+        self.bar = TIMEFRAME_NANOS[timeframe]
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild = min_rebuild
+        self.n = 0
+        self.timestamp = np.empty(0, dtype=np.int64)
+        self.fill_time = np.empty(0, dtype=np.int64)
+        self.low = np.empty(0)
+        self.high = np.empty(0)
+        self.bullish = np.empty(0, dtype=bool)
+        self._stale = np.empty(0, dtype=bool)  # changed since the snapshot
+        self._tree = None
+        self._delta = None
+
+    @classmethod
+    def from_columns(cls, timeframe: str, cols: Dict[str, np.ndarray], tz=None, **kwargs) -> 'GapIndex':
+        """
+        Build from typed FVG columns (fvg_store.COLUMNS).
+        """
+        index = cls(timeframe, tz, **kwargs)
+        index.add(np.asarray(cols['timestamp']), np.asarray(cols['type']) == TYPE_CODES['Bullish'],
+                  np.asarray(cols['gap_low']), np.asarray(cols['gap_high']), np.asarray(cols['fill_time']))
+        index.rebuild()
+        return index
+
+    @classmethod
+    def from_frame(cls, timeframe: str, fvg_df: pd.DataFrame, **kwargs) -> 'GapIndex':
+        """
+        Build from a detect_fvg frame, or one read back from its CSV.
+        """
+        if fvg_df.empty:
+            return cls(timeframe, **kwargs)
+        filled = fvg_df['Filled'].to_numpy(dtype=bool)
+        fill_time = np.full(len(fvg_df), NAT, dtype=np.int64)
+        if filled.any():
+            fill_time[filled] = _utc_nanos(fvg_df['Fill_Time'][filled])
+        index = cls(timeframe, _frame_tz(fvg_df), **kwargs)
+        index.add(_utc_nanos(fvg_df['Timestamp']), (fvg_df['Type'] == 'Bullish').to_numpy(),
+                  fvg_df['Gap_Low'].to_numpy(dtype=np.float64), fvg_df['Gap_High'].to_numpy(dtype=np.float64), fill_time)
+        index.rebuild()
+        return index
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, timestamp: np.ndarray, bullish: np.ndarray, low: np.ndarray, high: np.ndarray,
+            fill_time: np.ndarray) -> np.ndarray:
+        """
+        Append gaps (timestamps in UTC epoch ns, fill_time NAT while unfilled). Returns their ids.
+        """
+        k = len(timestamp)
+        ids = np.arange(self.n, self.n + k)
+        if self.n + k > len(self.timestamp):
+            capacity = max(2 * len(self.timestamp), self.n + k, 64)
+            for name in ('timestamp', 'fill_time', 'low', 'high', 'bullish', '_stale'):
+                grown = np.zeros(capacity, dtype=getattr(self, name).dtype)
+                grown[:self.n] = getattr(self, name)[:self.n]
+                setattr(self, name, grown)
+        self.timestamp[ids], self.bullish[ids] = timestamp, bullish
+        self.low[ids], self.high[ids], self.fill_time[ids] = low, high, fill_time
+        self._stale[ids] = True
+        self.n += k
+        self._delta = None
+        return ids
+
+    def fill(self, ids: np.ndarray, fill_time: np.ndarray):
+        """
+        Record that gaps were filled at fill_time (UTC epoch ns of the fill bar).
+        """
+        self.fill_time[ids] = fill_time
+        self._stale[ids] = True
+        self._delta = None
+
+    def rebuild(self):
+        """
+        Snapshot every gap into a fresh _TimeTree and clear the delta.
+        """
+        start, end = self._alive()
+        self._tree = _TimeTree(np.arange(self.n), start, end, self.low[:self.n], self.high[:self.n])
+        self._stale[:self.n] = False
+        self._delta = None
+
+    def maybe_rebuild(self):
+        if self._tree is None or self._stale[:self.n].sum() > max(self.min_rebuild, self.rebuild_fraction * self.n):
+            self.rebuild()
+
+    def containing(self, t: int, price: float) -> np.ndarray:
+        """
+        Ids of the gaps alive at t (UTC epoch ns; OPEN for the currently unfilled ones) whose
+        range contains price.
+        """
+        found = []
+        if self._tree is not None:
+            found = [ids[~self._stale[ids]] for ids in self._tree.containing(t, price)]
+        ids, start, end = self._delta_arrays()
+        hit = (start <= t) & ((t < end) | (end == OPEN)) & (self.low[ids] <= price) & (price <= self.high[ids])
+        found.append(ids[hit])
+        return np.sort(np.concatenate(found))
+
+    def nearest(self, t: int, price: float, side: str) -> Optional[int]:
+        """
+        Id of the alive gap closest to price entirely above it (side='above', lowest Gap_Low
+        > price) or below it (side='below', highest Gap_High < price), or None.
+        """
+        if side not in ('above', 'below'):
+            raise ValueError(f"side must be 'above' or 'below', got {side}")
+        above = side == 'above'
+        best = None
+        if self._tree is not None:
+            find = self._tree.nearest_above if above else self._tree.nearest_below
+            best = find(t, price, self._stale)
+        ids, start, end = self._delta_arrays()
+        edge = self.low[ids] if above else self.high[ids]
+        hit = (start <= t) & ((t < end) | (end == OPEN)) & ((edge > price) if above else (edge < price))
+        if hit.any():
+            k = np.flatnonzero(hit)[np.argmin(edge[hit]) if above else np.argmax(edge[hit])]
+            if best is None or (edge[k] < best[0] if above else edge[k] > best[0]):
+                best = (edge[k], ids[k])
+        return None if best is None else int(best[1])
+
+    def open_gaps(self) -> tuple:
+        """
+        (ids, frame) of the gaps that are still unfilled, the frame in detect_fvg layout.
+        """
+        ids = np.flatnonzero(self.fill_time[:self.n] == NAT)
+        stamps = pd.DatetimeIndex(pd.to_datetime(self.timestamp[ids], utc=True))
+        frame = pd.DataFrame({
+            'Timestamp': stamps.tz_convert(self.tz) if self.tz is not None else stamps.tz_localize(None),
+            'Type': np.where(self.bullish[ids], 'Bullish', 'Bearish'),
+            'Gap_Low': self.low[ids],
+            'Gap_High': self.high[ids],
+        })
+        return ids, frame
+
+    def records(self, ids: Iterable[int]) -> List[Dict]:
+        return [self.record(i) for i in ids]
+
+    def record(self, i: int) -> Dict:
+        filled = self.fill_time[i] != NAT
+        return {
+            'timeframe': self.timeframe,
+            'timestamp': self._stamp(self.timestamp[i]),
+            'type': 'Bullish' if self.bullish[i] else 'Bearish',
+            'gap_low': float(self.low[i]),
+            'gap_high': float(self.high[i]),
+            'filled': bool(filled),
+            'fill_time': self._stamp(self.fill_time[i]) if filled else None,
+        }
+
+    def _stamp(self, ns: int) -> str:
+        ts = pd.Timestamp(int(ns), tz='UTC')
+        return (ts.tz_convert(self.tz) if self.tz is not None else ts.tz_localize(None)).isoformat()
+
+    def _alive(self):
+        start = self.timestamp[:self.n] + self.bar
+        fill = self.fill_time[:self.n]
+        return start, np.where(fill == NAT, OPEN, fill + self.bar)
+
+    def _delta_arrays(self):
+        if self._delta is None:
+            ids = np.flatnonzero(self._stale[:self.n])
+            start, end = self._alive()
+            self._delta = ids, start[ids], end[ids]
+        return self._delta
+
+class FVGIndex:
+    """
+    Per-ticker, per-timeframe GapIndexes answering "which gaps contain price P at time T"
+    and "nearest open gap above/below P". Thread safe, for use behind fvg_server.
+
+    load() bulk-loads detection output (a detect_fvg frame, its CSV, or an FVGStore).
+    update() streams newly completed bars of a timeframe through a StreamingFVGDetector and
+    applies the created and filled gaps incrementally. The first update after load() seeds
+    the detector with the loaded gaps that are still open and with the last two bars they
+    were detected from (the tail, given to load() or to that update), so it continues the
+    loaded history; without a tail, only a gap whose three bars straddle the boundary is missed.
+    Times may be Timestamps, strings or UTC epoch ns; naive times are in the gaps' timezone,
+    and time=None means "now", i.e. only the gaps that are still unfilled.
+    """
+
+    def __init__(self, **gap_index_kwargs):
+        self._indexes: Dict[str, Dict[str, GapIndex]] = {}
+        self._detectors = {}
+        self._tails = {}
+        self._kwargs = gap_index_kwargs
+        self._lock = threading.RLock()
+
+    def load(self, ticker: str, timeframe: str, fvgs: Union[pd.DataFrame, FVGStore],
+             tail: Optional[pd.DataFrame] = None):
+        """
+        Replace the gaps of (ticker, timeframe) with detection output. tail: the bars it was
+        detected from (only the last two, High/Low, are kept) for update() to continue from.
+        """
+        if isinstance(fvgs, FVGStore):
+            index = GapIndex.from_columns(timeframe, fvgs.columns(), fvgs.tz, **self._kwargs)
+        else:
+            index = GapIndex.from_frame(timeframe, fvgs, **self._kwargs)
+        with self._lock:
+            self._indexes.setdefault(ticker, {})[timeframe] = index
+            self._detectors.pop((ticker, timeframe), None)
+            self._tails[(ticker, timeframe)] = None if tail is None else tail[['High', 'Low']].iloc[-2:].copy()
+        logging.info(f"Indexed {len(index)} {ticker} {timeframe} FVGs")
+
+    def update(self, ticker: str, timeframe: str, bars: pd.DataFrame, tail: Optional[pd.DataFrame] = None) -> int:
+        """
+        Feed newly completed bars of timeframe (strictly after the previous ones). tail: on
+        the first update after a load() that was not given one, the bars just before these.
+        Returns the number of created and filled events applied.
+        """
+        if bars.empty:
+            return 0
+        with self._lock:
+            if (ticker, timeframe) not in self._detectors:
+                self._detectors[(ticker, timeframe)] = self._resume(ticker, timeframe, bars.index.tz, tail)
+            detector, ids = self._detectors[(ticker, timeframe)]
+            index = self._indexes[ticker][timeframe]
+            events = detector.update(bars)
+            created = [e for e in events if e['Event'] == 'created']
+            if created:
+                new_ids = index.add(_utc_ns([e['Timestamp'] for e in created]),
+                                    np.array([e['Type'] == 'Bullish' for e in created]),
+                                    np.array([e['Gap_Low'] for e in created]),
+                                    np.array([e['Gap_High'] for e in created]),
+                                    np.full(len(created), NAT, dtype=np.int64))
+                ids.update(zip((e['Seq'] for e in created), new_ids.tolist()))
+            filled = [e for e in events if e['Event'] == 'filled']
+            if filled:
+                index.fill(np.array([ids.pop(e['Seq']) for e in filled]), _utc_ns([e['Fill_Time'] for e in filled]))
+            index.maybe_rebuild()
+        return len(events)
+
+    def containing(self, ticker: str, price: float, time=None, timeframes: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Gaps of ticker alive at time whose range contains price, per timeframe in creation order.
+        """
+        results = []
+        with self._lock:
+            for tf, index in self._select(ticker, timeframes):
+                ids = index.containing(self._time(time, index.tz), float(price))
+                results.extend(index.records(ids))
+        return results
+
+    def nearest(self, ticker: str, price: float, side: str = 'above', time=None,
+                timeframes: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        The gap of ticker alive at time that is closest to price, entirely above or below it,
+        with its 'distance' from price; None if there is none.
+        """
+        best = None
+        with self._lock:
+            for tf, index in self._select(ticker, timeframes):
+                i = index.nearest(self._time(time, index.tz), float(price), side)
+                if i is None:
+                    continue
+                distance = index.low[i] - price if side == 'above' else price - index.high[i]
+                if best is None or distance < best['distance']:
+                    best = dict(index.record(i), distance=float(distance))
+        return best
+
+    def query(self, queries: List[Dict]) -> List:
+        """
+        Answer a batch of queries, each {'op': 'containing' | 'nearest', 'ticker', 'price', ...}
+        with the keyword arguments of that method. Returns their results in order.
+        """
+        ops = {'containing': self.containing, 'nearest': self.nearest}
+        results = []
+        for q in queries:
+            q = dict(q)
+            op = q.pop('op', 'containing')
+            if op not in ops:
+                raise ValueError(f"Unknown query op: {op}")
+            results.append(ops[op](**q))
+        return results
+
+    def stats(self) -> Dict:
+        """
+        Number of indexed gaps per ticker and timeframe.
+        """
+        with self._lock:
+            return {ticker: {tf: len(index) for tf, index in indexes.items()} for ticker, indexes in self._indexes.items()}
+
+    def _resume(self, ticker: str, timeframe: str, tz, tail: Optional[pd.DataFrame]) -> tuple:
+        # A detector continuing the loaded gaps of (ticker, timeframe), or a fresh index.
+        detector = StreamingFVGDetector(keep_history=False)
+        index = self._indexes.get(ticker, {}).get(timeframe)
+        if index is None:
+            self._indexes.setdefault(ticker, {})[timeframe] = GapIndex(timeframe, tz, **self._kwargs)
+            return detector, {}
+        if tail is None:
+            tail = self._tails.get((ticker, timeframe))
+        open_ids, open_gaps = index.open_gaps()
+        seqs = detector.seed(open_gaps, tail)
+        return detector, dict(zip(seqs, open_ids.tolist()))
+
+    def _select(self, ticker: str, timeframes: Optional[List[str]]):
+        indexes = self._indexes.get(ticker)
+        if indexes is None:
+            raise KeyError(f"No FVGs indexed for {ticker}")
+        return [(tf, index) for tf, index in indexes.items() if timeframes is None or tf in timeframes]
+
+    @staticmethod
+    def _time(time, tz) -> int:
+        if time is None:
+            return OPEN
+        if isinstance(time, (int, np.integer)):
+            return int(time)
+        ts = pd.Timestamp(time)
+        if ts.tz is None and tz is not None:
+            ts = ts.tz_localize(tz)
+        return ts.value
+
+def _utc_ns(timestamps: list) -> np.ndarray:
+    return np.array([pd.Timestamp(ts).value for ts in timestamps], dtype=np.int64)
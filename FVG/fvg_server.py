@@ -0,0 +1,124 @@
+import os
+import sys
+import logging
+import argparse
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+from confluence import load_fvg_outputs
+from fvg_index import FVGIndex
+from resample_data import SUPPORTED_TIMEFRAMES
+from rpc import RPCClient, make_server
+from utils import setup_logging
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+
+def discover_outputs(output_dir: str) -> Dict[str, List[str]]:
+    """
+    Tickers and timeframes with FVG output ({ticker}_{tf}_fvgs.csv or an FVGStore directory).
+    """
+    found = {}
+    for name in sorted(os.listdir(output_dir)):
+        stem = name[:-len('.csv')] if name.endswith('.csv') else name
+        if not stem.endswith('_fvgs'):
+            continue
+        ticker, _, tf = stem[:-len('_fvgs')].rpartition('_')
+        if ticker and tf in SUPPORTED_TIMEFRAMES:
+            found.setdefault(ticker, [])
+            if tf not in found[ticker]:
+                found[ticker].append(tf)
+    return found
+
+def build_index(output_dir: str, tickers: Optional[Iterable[str]] = None) -> FVGIndex:
+    """
+    An FVGIndex over everything cli wrote to output_dir (or only the given tickers).
+    """
+    index = FVGIndex()
+    for ticker, timeframes in discover_outputs(output_dir).items():
+        if tickers is not None and ticker not in tickers:
+            continue
+        for tf, fvgs in load_fvg_outputs(ticker, timeframes, output_dir).items():
+            index.load(ticker, tf, fvgs)
+    return index
+
+def handlers(index: FVGIndex, output_dir: Optional[str] = None) -> Dict:
+    """
+    RPC methods served for an FVGIndex. 'update' takes bars (and optionally the tail bars
+    before them) as records with an ISO Timestamp and at least High/Low, plus the bars' tz
+    name (None for naive bars); 'reload' re-reads a ticker's output from output_dir.
+    """
+
+    def frame(records: List[Dict], tz: Optional[str]) -> pd.DataFrame:
+        bars = pd.DataFrame(records)
+        stamps = pd.DatetimeIndex(pd.to_datetime(bars.pop('Timestamp'), utc=True))
+        bars.index = stamps.tz_convert(tz) if tz else stamps.tz_localize(None)
+        return bars
+
+    def update(ticker: str, timeframe: str, bars: List[Dict], tz: Optional[str] = None,
+               tail: Optional[List[Dict]] = None) -> int:
+        return index.update(ticker, timeframe, frame(bars, tz), None if tail is None else frame(tail, tz))
+
+    def reload(ticker: str) -> Dict:
+        timeframes = discover_outputs(output_dir).get(ticker, [])
+        for tf, fvgs in load_fvg_outputs(ticker, timeframes, output_dir).items():
+            index.load(ticker, tf, fvgs)
+        return index.stats().get(ticker, {})
+
+    methods = {
+        'containing': index.containing,
+        'nearest': index.nearest,
+        'query': index.query,
+        'update': update,
+        'stats': index.stats,
+    }
+    if output_dir is not None:
+        methods['reload'] = reload
+    return methods
+
+class FVGIndexClient(RPCClient):
+    """
+    Client for fvg_server, with the FVGIndex query methods.
+    """
+
+    def containing(self, ticker: str, price: float, time=None, timeframes: Optional[List[str]] = None) -> List[Dict]:
+        return self.call('containing', ticker=ticker, price=price, time=time, timeframes=timeframes)
+
+    def nearest(self, ticker: str, price: float, side: str = 'above', time=None,
+                timeframes: Optional[List[str]] = None) -> Optional[Dict]:
+        return self.call('nearest', ticker=ticker, price=price, side=side, time=time, timeframes=timeframes)
+
+    def query(self, queries: List[Dict]) -> List:
+        return self.call('query', queries=queries)
+
+    def update(self, ticker: str, timeframe: str, bars: pd.DataFrame, tail: Optional[pd.DataFrame] = None) -> int:
+        tz = str(bars.index.tz) if bars.index.tz is not None else None
+        return self.call('update', ticker=ticker, timeframe=timeframe, bars=_records(bars), tz=tz,
+                         tail=None if tail is None else _records(tail.iloc[-2:]))
+
+    def stats(self) -> Dict:
+        return self.call('stats')
+
+def _records(bars: pd.DataFrame) -> List[Dict]:
+    records = bars.rename_axis('Timestamp').reset_index()[['Timestamp', 'High', 'Low']]
+    records['Timestamp'] = records['Timestamp'].map(pd.Timestamp.isoformat)
+    return records.to_dict('records')
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve open-FVG queries by price and time from a long-lived process.")
+    parser.add_argument('--output-dir', default='fvgs_output', help='Directory cli wrote FVG output to')
+    parser.add_argument('--tickers', nargs='+', help='Only index these tickers')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS, help="host:port or unix:/path/to.sock")
+    args = parser.parse_args(argv)
+    setup_logging()
+    index = build_index(args.output_dir, args.tickers)
+    server = make_server(handlers(index, args.output_dir), args.address)
+    logging.info(f"Serving FVG index of {len(index.stats())} tickers on {args.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
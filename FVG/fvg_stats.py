@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from fvg_store import TYPE_CODES
+
+PERCENTILES = (25, 50, 75, 90)
+FILL_HISTOGRAM_BINS = 30
+GROUPS = ('', 'bullish_', 'bearish_')
+_SIGN = np.uint64(1 << 63)
+
+class FVGStats:
+    """
+    Mergeable accumulator for FVG summary statistics.
+
+    Gap sizes and fill times are kept as arrays (8 bytes per gap) so that means and
+    percentiles of merged stats are exact, not approximations of per-part summaries.
+    Parts are merged in order: the left side's gaps come first, as if the FVG frames had
+    been concatenated, so to_insights() of merged stats equals analyze_fvgs of that concatenation.
+
+    For histories too long to hold those arrays, summarize_store() reads an FVGStore in
+    blocks instead and keeps only a fixed-size summary: counts, extremes, the largest gap
+    and the fill-time histogram are exact, percentiles are exact order statistics found by
+    radix selection over the store, and means are sums over blocks, so they can differ from
+    the in-memory mean in the last digits. Summarized stats cannot be merged.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.filled = 0
+        self._sizes = []  # arrays of gap sizes, in row order
+        self._size_bullish = []  # matching bool arrays
+        self._fill_minutes = []  # arrays of time to fill of filled gaps, in row order
+        self._fill_bullish = []
+        self._summary = None  # set by summarize_store instead of the arrays
+        self.largest = None
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    @classmethod
+    def from_frame(cls, fvg_df: pd.DataFrame) -> 'FVGStats':
+        """
+        Build stats from a detect_fvg frame without modifying it.
+        """
+        stats = cls()
+        stats.add_frame(fvg_df)
+        return stats
+
+    @classmethod
+    def combine(cls, parts: Iterable['FVGStats']) -> 'FVGStats':
+        """
+        Merge any number of stats in order.
+        """
+        stats = cls()
+        for part in parts:
+            stats.merge(part)
+        return stats
+
+    @classmethod
+    def from_store(cls, store) -> 'FVGStats':
+        """
+        Build stats from an FVGStore, reading its memory-mapped columns in place.
+        """
+        stats = cls()
+        stats.add_columns(store.columns(), store.tz)
+        return stats
+
+    def add_frame(self, fvg_df: pd.DataFrame) -> 'FVGStats':
+        """
+        Accumulate the gaps of fvg_df (e.g. the next chunk of a longer history). Returns self.
+        """
+        if fvg_df.empty:
+            return self
+        gap_low = fvg_df['Gap_Low'].to_numpy(dtype=np.float64)
+        sizes = fvg_df['Gap_High'].to_numpy(dtype=np.float64) - gap_low
+        bullish = (fvg_df['Type'] == 'Bullish').to_numpy()
+        filled = fvg_df['Filled'].to_numpy(dtype=bool)
+        delta_ns = None
+        if filled.any():
+            delta_ns = _utc_nanos(fvg_df['Fill_Time'][filled]) - _utc_nanos(fvg_df['Timestamp'][filled])
+
+        def row(k):
+            return (fvg_df['Timestamp'].iat[k], fvg_df['Type'].iat[k],
+                    fvg_df['Gap_Low'].iat[k], fvg_df['Gap_High'].iat[k])
+
+        return self._add(sizes, bullish, filled, delta_ns, row)
+
+    def add_columns(self, cols: Dict[str, np.ndarray], tz=None) -> 'FVGStats':
+        """
+        Accumulate typed FVG columns (see fvg_store.COLUMNS) in the timezone tz. Returns self.
+        """
+        if len(cols['timestamp']) == 0:
+            return self
+        timestamp = np.asarray(cols['timestamp'])
+        gap_low, gap_high = np.asarray(cols['gap_low']), np.asarray(cols['gap_high'])
+        bullish = np.asarray(cols['type']) == TYPE_CODES['Bullish']
+        filled = np.asarray(cols['filled'])
+        delta_ns = np.asarray(cols['fill_time'])[filled] - timestamp[filled] if filled.any() else None
+        return self._add(gap_high - gap_low, bullish, filled, delta_ns, _column_row(cols, tz))
+
+    def summarize_store(self, store, rows: int = 100_000) -> 'FVGStats':
+        """
+        Fill these (empty) stats from an FVGStore read `rows` gaps at a time, keeping a
+        summary of fixed size instead of per-gap arrays (see the class docstring for what
+        is exact). Returns self.
+        """
+        if self.total:
+            raise ValueError("summarize_store() needs empty stats")
+        cols = store.columns()
+        n = len(store)
+        if n == 0:
+            return self
+
+        def blocks() -> Iterator[Dict[str, np.ndarray]]:
+            for start in range(0, n, rows):
+                yield _block_values({name: values[start:start + rows] for name, values in cols.items()})
+
+        row = _column_row(cols, store.tz)
+        summary = {name: {prefix: {'count': 0, 'sum': 0.0, 'min': None, 'max': None} for prefix in GROUPS}
+                   for name in ('gap_size', 'time_to_fill')}
+        largest_size, largest_row = None, None
+        for start, block in zip(range(0, n, rows), blocks()):
+            for name, groups in summary.items():
+                for prefix, acc in groups.items():
+                    values = block[prefix + name]
+                    if not len(values):
+                        continue
+                    acc['count'] += len(values)
+                    acc['sum'] += float(values.sum())
+                    acc['min'] = values.min() if acc['min'] is None else min(acc['min'], values.min())
+                    acc['max'] = values.max() if acc['max'] is None else max(acc['max'], values.max())
+            k = int(np.argmax(block['gap_size']))
+            # Ties keep the earlier gap, like idxmax on the whole frame.
+            if largest_size is None or block['gap_size'][k] > largest_size:
+                largest_size, largest_row = block['gap_size'][k], start + k
+        wanted = {}
+        for name, groups in summary.items():
+            for prefix, acc in groups.items():
+                acc['mean'] = acc['sum'] / acc['count'] if acc['count'] else None
+                acc['ranks'] = _percentile_ranks(acc['count'])
+                wanted[prefix + name] = sorted({r for lo, hi, _ in acc['ranks'] for r in (lo, hi)})
+        found = _order_statistics(blocks, wanted)
+        for name, groups in summary.items():
+            for prefix, acc in groups.items():
+                values = found[prefix + name]
+                if acc['count']:
+                    acc['percentiles'] = [_lerp(values[lo], values[hi], t) for lo, hi, t in acc['ranks']]
+                else:
+                    acc['percentiles'] = [None] * len(PERCENTILES)
+        minutes = summary['time_to_fill']['']
+        histogram = None
+        if minutes['count']:
+            bounds = (minutes['min'], minutes['max'])
+            counts = np.zeros(FILL_HISTOGRAM_BINS, dtype=np.int64)
+            for block in blocks():
+                block_counts, edges = np.histogram(block['time_to_fill'], FILL_HISTOGRAM_BINS, bounds)
+                counts += block_counts
+            histogram = counts, edges
+        self.total = n
+        self.filled = minutes['count']
+        self._summary = {'groups': summary, 'histogram': histogram}
+        timestamp, kind, gap_low, gap_high = row(largest_row)
+        self.largest = {'Timestamp': timestamp, 'Type': kind, 'Gap_Size': largest_size,
+                        'Gap_Low': gap_low, 'Gap_High': gap_high}
+        self.first_timestamp = row(0)[0]
+        self.last_timestamp = row(n - 1)[0]
+        return self
+
+    def _add(self, sizes, bullish, filled, delta_ns, row) -> 'FVGStats':
+        part = FVGStats()
+        part.total = len(sizes)
+        part.filled = int(filled.sum())
+        part._sizes, part._size_bullish = [sizes], [bullish]
+        if delta_ns is not None:
+            part._fill_minutes = [delta_ns / 1e9 / 60]
+            part._fill_bullish = [bullish[filled]]
+        k = int(np.argmax(sizes))
+        timestamp, kind, gap_low, gap_high = row(k)
+        part.largest = {'Timestamp': timestamp, 'Type': kind, 'Gap_Size': sizes[k],
+                        'Gap_Low': gap_low, 'Gap_High': gap_high}
+        part.first_timestamp = row(0)[0]
+        part.last_timestamp = row(part.total - 1)[0]
+        return self.merge(part)
+
+    def merge(self, other: 'FVGStats') -> 'FVGStats':
+        """
+        Fold other's gaps in after this one's. Returns self.
+        """
+        if other.total == 0:
+            return self
+        if self._summary is not None or other._summary is not None:
+            raise ValueError("Stats built by summarize_store() cannot be merged")
+        if self.total == 0:
+            self.first_timestamp = other.first_timestamp
+        self.total += other.total
+        self.filled += other.filled
+        self._sizes += other._sizes
+        self._size_bullish += other._size_bullish
+        self._fill_minutes += other._fill_minutes
+        self._fill_bullish += other._fill_bullish
+        # Ties keep the earlier gap, like idxmax on the concatenated frame.
+        if self.largest is None or other.largest['Gap_Size'] > self.largest['Gap_Size']:
+            self.largest = other.largest
+        self.last_timestamp = other.last_timestamp
+        return self
+
+    def fill_histogram(self, bins: int = FILL_HISTOGRAM_BINS) -> Optional[tuple]:
+        """
+        (counts, edges) of np.histogram over the time to fill in minutes of the filled gaps,
+        or None if none is filled. Summarized stats only have FILL_HISTOGRAM_BINS bins.
+        """
+        if self._summary is not None:
+            if bins != FILL_HISTOGRAM_BINS:
+                raise ValueError(f"Summarized stats keep a histogram of {FILL_HISTOGRAM_BINS} bins, not {bins}")
+            return self._summary['histogram']
+        minutes = _concat(self._fill_minutes, np.float64)
+        return np.histogram(minutes, bins) if len(minutes) else None
+
+    def to_insights(self) -> Dict:
+        """
+        Return the analyze_fvgs dictionary, plus gap-size and time-to-fill percentiles
+        overall and per type.
+        """
+        if self.total == 0:
+            return {'total_fvgs': 0}
+        groups = self._summary['groups'] if self._summary is not None else self._describe()
+        sizes, minutes = groups['gap_size'], groups['time_to_fill']
+        bullish_count = sizes['bullish_']['count']
+        bearish_count = self.total - bullish_count
+        bullish_filled = minutes['bullish_']['count']
+        bearish_filled = self.filled - bullish_filled
+        insights = {
+            'total_fvgs': self.total,
+            'bullish_fvgs': bullish_count,
+            'bearish_fvgs': bearish_count,
+            'filled_fvgs': self.filled,
+            'unfilled_fvgs': self.total - self.filled,
+            'fill_rate': self.filled / self.total,
+            'bullish_filled': bullish_filled,
+            'bearish_filled': bearish_filled,
+            'bullish_fill_rate': bullish_filled / bullish_count if bullish_count else 0,
+            'bearish_fill_rate': bearish_filled / bearish_count if bearish_count else 0,
+            'avg_gap_size': sizes['']['mean'],
+            'min_gap_size': sizes['']['min'],
+            'max_gap_size': sizes['']['max'],
+            'avg_bullish_gap': sizes['bullish_']['mean'],
+            'avg_bearish_gap': sizes['bearish_']['mean'],
+            'avg_time_to_fill_min': minutes['']['mean'],
+            'min_time_to_fill_min': minutes['']['min'],
+            'max_time_to_fill_min': minutes['']['max'],
+            'largest_fvg': dict(self.largest),
+            'first_fvg_timestamp': self.first_timestamp,
+            'last_fvg_timestamp': self.last_timestamp,
+        }
+        for name, suffix in (('gap_size', ''), ('time_to_fill', '_min')):
+            for prefix in GROUPS:
+                for q, value in zip(PERCENTILES, groups[name][prefix]['percentiles']):
+                    insights[f"{prefix}{name}_p{q}{suffix}"] = value
+        return insights
+
+    def _describe(self) -> Dict:
+        # The per-group aggregates of to_insights, from the in-memory arrays.
+        sizes, size_bullish = _concat(self._sizes, np.float64), _concat(self._size_bullish, bool)
+        minutes, fill_bullish = _concat(self._fill_minutes, np.float64), _concat(self._fill_bullish, bool)
+        groups = {}
+        for name, values, bullish in (('gap_size', sizes, size_bullish), ('time_to_fill', minutes, fill_bullish)):
+            groups[name] = {}
+            for prefix, selected in zip(GROUPS, (values, values[bullish], values[~bullish])):
+                groups[name][prefix] = {
+                    'count': len(selected),
+                    'mean': _mean(selected),
+                    'min': selected.min() if len(selected) else None,
+                    'max': selected.max() if len(selected) else None,
+                    'percentiles': _percentiles(selected),
+                }
+        return groups
+
+def _concat(parts: list, dtype) -> np.ndarray:
+    return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+
+def _utc_nanos(values: pd.Series) -> np.ndarray:
+    # utc=True keeps strings with mixed UTC offsets (CSV round trips across DST) comparable.
+    return pd.DatetimeIndex(pd.to_datetime(values, utc=True)).as_unit('ns').asi8
+
+def _mean(values: np.ndarray) -> Optional[float]:
+    return values.mean() if len(values) else None
+
+def _percentiles(values: np.ndarray) -> list:
+    if not len(values):
+        return [None] * len(PERCENTILES)
+    return [float(v) for v in np.percentile(values, PERCENTILES)]
+
+def _column_row(cols: Dict[str, np.ndarray], tz) -> Callable:
+    # (Timestamp, Type, Gap_Low, Gap_High) of row k of typed columns.
+    def row(k):
+        ns = cols['timestamp'][k]
+        ts = pd.Timestamp(ns, tz='UTC').tz_convert(tz) if tz is not None else pd.Timestamp(ns)
+        bullish = cols['type'][k] == TYPE_CODES['Bullish']
+        return ts, 'Bullish' if bullish else 'Bearish', cols['gap_low'][k], cols['gap_high'][k]
+
+    return row
+
+def _block_values(cols: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    # Gap sizes and fill minutes of a block of typed columns, overall and per type.
+    timestamp = np.asarray(cols['timestamp'])
+    sizes = np.asarray(cols['gap_high']) - np.asarray(cols['gap_low'])
+    bullish = np.asarray(cols['type']) == TYPE_CODES['Bullish']
+    filled = np.asarray(cols['filled'])
+    minutes = (np.asarray(cols['fill_time'])[filled] - timestamp[filled]) / 1e9 / 60
+    fill_bullish = bullish[filled]
+    return {
+        'gap_size': sizes, 'bullish_gap_size': sizes[bullish], 'bearish_gap_size': sizes[~bullish],
+        'time_to_fill': minutes, 'bullish_time_to_fill': minutes[fill_bullish],
+        'bearish_time_to_fill': minutes[~fill_bullish],
+    }
+
+def _percentile_ranks(n: int) -> List[tuple]:
+    # (lower rank, upper rank, weight) of each of PERCENTILES under np.percentile's linear method.
+    if not n:
+        return []
+    ranks = []
+    for q in PERCENTILES:
+        h = (n - 1) * (q / 100)
+        lo = int(np.floor(h))
+        ranks.append((lo, min(lo + 1, n - 1), h - lo))
+    return ranks
+
+def _lerp(a: float, b: float, t: float) -> float:
+    # The interpolation np.percentile uses, so exact order statistics give its results.
+    return float(b - (b - a) * (1 - t) if t >= 0.5 else a + (b - a) * t)
+
+def _order_statistics(blocks: Callable[[], Iterable[Dict[str, np.ndarray]]],
+                      wanted: Dict[str, List[int]]) -> Dict[str, Dict[int, float]]:
+    """
+    The values at 0-based ranks of the sorted values of each named series that blocks()
+    yields in pieces. Values are mapped to order-preserving 64-bit keys and selected 16 bits
+    at a time over four passes, holding one 65536-bin count per wanted rank.
+    """
+    state = {(name, r): (0, r) for name, ranks in wanted.items() for r in ranks}  # (key prefix, rank in it)
+    for shift in (48, 32, 16, 0):
+        counts = {(name, prefix): np.zeros(1 << 16, dtype=np.int64) for (name, _), (prefix, _) in state.items()}
+        for block in blocks():
+            for name in wanted:
+                keys = _sortable(block[name])
+                digits = ((keys >> np.uint64(shift)) & np.uint64(0xFFFF)).astype(np.intp)
+                high = keys >> np.uint64(shift + 16) if shift < 48 else np.zeros(len(keys), dtype=np.uint64)
+                for (series, prefix), bins in counts.items():
+                    if series == name:
+                        bins += np.bincount(digits[high == np.uint64(prefix)], minlength=1 << 16)
+        for (name, r), (prefix, rank) in state.items():
+            cumulative = np.cumsum(counts[(name, prefix)])
+            digit = int(np.searchsorted(cumulative, rank, side='right'))
+            state[(name, r)] = ((prefix << 16) | digit, rank - (int(cumulative[digit - 1]) if digit else 0))
+    found = {name: {} for name in wanted}
+    for (name, r), (key, _) in state.items():
+        found[name][r] = _unsortable(key)
+    return found
+
+def _sortable(values: np.ndarray) -> np.ndarray:
+    # float64 -> uint64 keys in the same order: flip every bit of negatives, the sign bit of the rest.
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    return np.where(bits & _SIGN, ~bits, bits | _SIGN)
+
+def _unsortable(key: int) -> float:
+    key = np.uint64(key)
+    bits = key ^ _SIGN if key & _SIGN else ~key
+    return float(np.array([bits], dtype=np.uint64).view(np.float64)[0])
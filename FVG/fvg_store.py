@@ -0,0 +1,187 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, Optional
+
+TYPE_CODES = {'Bearish': 0, 'Bullish': 1}
+NAT = np.iinfo(np.int64).min
+COLUMNS = {
+    'timestamp': np.dtype('<i8'),  # creation time, epoch ns (UTC for tz-aware bars)
+    'type': np.dtype('i1'),  # TYPE_CODES
+    'gap_low': np.dtype('<f8'),
+    'gap_high': np.dtype('<f8'),
+    'filled': np.dtype('?'),
+    'fill_time': np.dtype('<i8'),  # epoch ns, NAT while unfilled
+    'bar': np.dtype('<i8'),  # position of the creation bar
+    'fill_bar': np.dtype('<i8'),  # position of the fill bar, -1 while unfilled
+}
+META_FILE = '_meta.json'
+
+def fvg_columns(index: pd.DatetimeIndex, bars: np.ndarray, bullish: np.ndarray, gap_low: np.ndarray,
+                gap_high: np.ndarray, fill_idx: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Typed FVG columns from per-gap arrays (bars/fill_idx are positions into index,
+    fill_idx is -1 for unfilled gaps).
+    """
+    ns = index.as_unit('ns').asi8
+    filled = fill_idx >= 0
+    return {
+        'timestamp': ns[bars],
+        'type': bullish.astype(np.int8),
+        'gap_low': np.asarray(gap_low, dtype=np.float64),
+        'gap_high': np.asarray(gap_high, dtype=np.float64),
+        'filled': filled,
+        'fill_time': np.where(filled, ns[np.where(filled, fill_idx, 0)], NAT),
+        'bar': np.asarray(bars, dtype=np.int64),
+        'fill_bar': np.where(filled, fill_idx, -1).astype(np.int64),
+    }
+
+def columns_to_frame(cols: Dict[str, np.ndarray], tz=None, any_filled: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Build the detect_fvg DataFrame layout from typed columns.
+    any_filled says whether the whole result (not just this slice) has fills, which decides
+    whether Fill_Time is a datetime column or all None, as in detect_fvg.
+    """
+    if len(cols['timestamp']) == 0:
+        return pd.DataFrame()
+    fill_ns = np.asarray(cols['fill_time'])
+    filled = np.asarray(cols['filled'])
+    if any_filled is None:
+        any_filled = bool(filled.any())
+    return pd.DataFrame({
+        'Timestamp': _from_ns(np.asarray(cols['timestamp']), tz),
+        'Type': np.where(np.asarray(cols['type']) == TYPE_CODES['Bullish'], 'Bullish', 'Bearish').astype(object),
+        'Gap_Low': np.asarray(cols['gap_low']),
+        'Gap_High': np.asarray(cols['gap_high']),
+        'Filled': filled,
+        'Fill_Time': _from_ns(fill_ns, tz) if any_filled else [None] * len(filled),
+    })
+
+class FVGStore:
+    """
+    Typed, columnar FVG results on disk: one raw little-endian file per column in COLUMNS
+    plus _meta.json (row count and timezone). Rows can be appended in chunks and fills
+    patched in place; columns() maps the files read-only, so readers do not copy them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self._meta = json.load(f)
+
+    @classmethod
+    def create(cls, path: str, tz=None) -> 'FVGStore':
+        """
+        Create an empty store at path, replacing any store already there.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in COLUMNS:
+            open(os.path.join(path, f"{name}.bin"), 'wb').close()
+        _write_meta(path, {'rows': 0, 'tz': str(tz) if tz is not None else None,
+                           'columns': {name: dtype.str for name, dtype in COLUMNS.items()}})
+        return cls(path)
+
+    def __len__(self) -> int:
+        return self._meta['rows']
+
+    @property
+    def tz(self) -> Optional[str]:
+        return self._meta['tz']
+
+    def append(self, cols: Dict[str, np.ndarray]) -> 'FVGStore':
+        """
+        Append rows given as typed columns (see fvg_columns). Returns self.
+        Every column is checked before any is written, and each file is cut back to the
+        committed row count first, so a failed or interrupted append leaves no misaligned tail.
+        """
+        n = len(cols['timestamp'])
+        if n == 0:
+            return self
+        arrays = {}
+        for name, dtype in COLUMNS.items():
+            arrays[name] = np.ascontiguousarray(cols[name], dtype=dtype)
+            if len(arrays[name]) != n:
+                raise ValueError(f"Column {name} has {len(arrays[name])} rows, expected {n}")
+        rows = self._meta['rows']
+        for name, values in arrays.items():
+            with open(os.path.join(self.path, f"{name}.bin"), 'r+b') as f:
+                f.truncate(rows * values.itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(values.tobytes())
+        self._meta['rows'] += n
+        _write_meta(self.path, self._meta)
+        return self
+
+    def set_fills(self, rows: np.ndarray, fill_time: np.ndarray, fill_bar: np.ndarray):
+        """
+        Mark the given rows filled at fill_time (epoch ns) on fill_bar, in place.
+        """
+        if len(rows) == 0:
+            return
+        for name, values in (('filled', True), ('fill_time', fill_time), ('fill_bar', fill_bar)):
+            column = self._map(name, 'r+')
+            column[rows] = values
+            column.flush()
+            del column
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        Read-only memory maps of every column.
+        """
+        return {name: self._map(name, 'r') for name in COLUMNS}
+
+    def timestamps(self, column: str = 'timestamp') -> pd.DatetimeIndex:
+        """
+        A timestamp column as a DatetimeIndex in the store's timezone.
+        """
+        return _from_ns(np.asarray(self._map(column, 'r')), self.tz)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The whole store in the detect_fvg DataFrame layout.
+        """
+        return columns_to_frame(self.columns(), self.tz)
+
+    def iter_frames(self, rows: int = 100_000) -> Iterator[pd.DataFrame]:
+        """
+        The store in detect_fvg layout, rows at a time.
+        """
+        cols = self.columns()
+        any_filled = bool(np.asarray(cols['filled']).any())
+        for start in range(0, len(self), rows):
+            sl = slice(start, start + rows)
+            yield columns_to_frame({name: values[sl] for name, values in cols.items()}, self.tz, any_filled)
+
+    def to_csv(self, path: str, rows: int = 100_000):
+        """
+        Export to CSV, identical to writing to_frame() with to_csv(index=False).
+        """
+        if len(self) == 0:
+            pd.DataFrame().to_csv(path, index=False)
+            return
+        for i, frame in enumerate(self.iter_frames(rows)):
+            frame.to_csv(path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+        logging.info(f"Exported {len(self)} FVGs from {self.path} to {path}")
+
+    def _map(self, name: str, mode: str) -> np.ndarray:
+        if len(self) == 0:
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=COLUMNS[name], mode=mode, shape=(len(self),))
+
+def is_fvg_store(path: str) -> bool:
+    """
+    Whether path is a directory written by FVGStore.
+    """
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+def _from_ns(values: np.ndarray, tz) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(values.view('datetime64[ns]'))
+    return index.tz_localize('UTC').tz_convert(tz) if tz is not None else index
+
+def _write_meta(path: str, meta: dict):
+    tmp = os.path.join(path, META_FILE + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(path, META_FILE))
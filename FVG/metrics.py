@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import logging
+import cProfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+COUNTERS = ('rows', 'fvgs')
+
+class Metrics:
+    """
+    Collects one record per timed span: stage, labels (ticker, timeframe, ...), wall and CPU
+    seconds, the process's peak RSS when the span ended, and any counts the caller sets
+    (rows, fvgs). Export with to_json or to_prometheus.
+
+    If profile_stage is set, every span of that stage also runs under cProfile and
+    tracemalloc, and their output is written to profile_dir.
+    """
+
+    def __init__(self, profile_stage: Optional[str] = None, profile_dir: str = '.'):
+        self.records: List[Dict] = []
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """
+        Time the enclosed block. Yields the record, so the block can set counts on it
+        (e.g. record['rows'] = len(df)). The record is kept even if the block raises.
+        """
+        record = {'stage': stage, 'labels': {k: str(v) for k, v in labels.items() if v is not None}}
+        profiler = self._start_profile() if stage == self.profile_stage else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+            record['status'] = 'ok'
+        except BaseException:
+            record['status'] = 'error'
+            raise
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            record['peak_rss_bytes'] = peak_rss_bytes()
+            if profiler is not None:
+                self._dump_profile(profiler, record)
+            self.records.append(record)
+            logging.info(f"[metrics] {stage} {record['labels']} {record['wall_seconds']:.3f}s")
+
+    def extend(self, records: List[Dict]):
+        """
+        Add span records collected elsewhere, e.g. by another process's Metrics.
+        """
+        self.records.extend(records)
+
+    def to_json(self, path: str):
+        """
+        Write every span record to path as JSON.
+        """
+        with open(path, 'w') as f:
+            json.dump({'spans': self.records}, f, indent=4)
+        logging.info(f"Saved metrics to {path}")
+
+    def to_prometheus(self, path: str):
+        """
+        Write per-(stage, labels) totals to path in the Prometheus text exposition format.
+        """
+        with open(path, 'w') as f:
+            f.write(prometheus_text(self.records))
+        logging.info(f"Saved metrics to {path}")
+
+    def export(self, path: str):
+        """
+        Write JSON if path ends in .json, Prometheus text otherwise.
+        """
+        if path.endswith('.json'):
+            self.to_json(path)
+        else:
+            self.to_prometheus(path)
+
+    def _start_profile(self):
+        profiler = cProfile.Profile()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profiler.enable()
+        return profiler, started_tracing
+
+    def _dump_profile(self, profile, record: Dict):
+        profiler, started_tracing = profile
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracing:
+            tracemalloc.stop()
+        name = '_'.join([record['stage']] + list(record['labels'].values()))
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stats_path = os.path.join(self.profile_dir, f"profile_{name}.prof")
+        profiler.dump_stats(stats_path)
+        alloc_path = os.path.join(self.profile_dir, f"profile_{name}_tracemalloc.txt")
+        with open(alloc_path, 'w') as f:
+            for stat in snapshot.statistics('lineno')[:25]:
+                f.write(f"{stat}\n")
+        logging.info(f"Saved profile of {record['stage']} to {stats_path} and {alloc_path}")
+
+def span(metrics: Optional[Metrics], stage: str, **labels):
+    """
+    metrics.span(...), or a no-op context yielding a throwaway record when metrics is None.
+    """
+    if metrics is None:
+        return nullcontext({})
+    return metrics.span(stage, **labels)
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of this process so far, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def prometheus_text(records: List[Dict]) -> str:
+    """
+    Aggregate span records by (stage, labels) and render them in the Prometheus text format:
+    totals that only grow across spans are counters, the peak RSS is a gauge.
+    """
+    totals = {}
+    for r in records:
+        key = (r['stage'],) + tuple(sorted(r['labels'].items()))
+        t = totals.setdefault(key, {'calls': 0, 'errors': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0,
+                                    'peak_rss_bytes': None, **{c: 0 for c in COUNTERS}})
+        t['calls'] += 1
+        t['errors'] += r.get('status') == 'error'
+        t['wall_seconds'] += r['wall_seconds']
+        t['cpu_seconds'] += r['cpu_seconds']
+        if r.get('peak_rss_bytes') is not None:
+            t['peak_rss_bytes'] = max(t['peak_rss_bytes'] or 0, r['peak_rss_bytes'])
+        for c in COUNTERS:
+            t[c] += r.get(c, 0)
+    metrics = [
+        ('calls', 'counter', 'Number of times the stage ran.'),
+        ('errors', 'counter', 'Number of times the stage raised.'),
+        ('wall_seconds', 'counter', 'Wall-clock seconds spent in the stage.'),
+        ('cpu_seconds', 'counter', 'Process CPU seconds spent in the stage.'),
+        ('peak_rss_bytes', 'gauge', 'Peak resident set size of the process when the stage ended.'),
+        ('rows', 'counter', 'Bars processed by the stage.'),
+        ('fvgs', 'counter', 'FVGs produced by the stage.'),
+    ]
+    lines = []
+    for field, kind, help_text in metrics:
+        name = f"fvg_stage_{field}"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for key, t in totals.items():
+            if t[field] is None:
+                continue
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in (('stage', key[0]),) + key[1:])
+            lines.append(f"{name}{{{labels}}} {t[field]}")
+    return '\n'.join(lines) + '\n'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
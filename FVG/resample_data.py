@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
 import logging
+import warnings
+from typing import Dict, List
 
 SUPPORTED_TIMEFRAMES = {
     '1D': '1D',
@@ -13,26 +16,160 @@ SUPPORTED_TIMEFRAMES = {
     '5min': '5T',
 }
 
-def resample_data(df: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+OHLC_DICT = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', FutureWarning)
+    TIMEFRAME_NANOS = {tf: pd.tseries.frequencies.to_offset(rule).nanos for tf, rule in SUPPORTED_TIMEFRAMES.items()}
+
+DAY_NANOS = 86_400 * 10**9
+HOUR_NANOS = 3_600 * 10**9
+
+def resample_data(df: pd.DataFrame, timeframe: str, origin='start_day') -> pd.DataFrame:
     """
     Resample OHLCV data to the specified timeframe.
     Returns a new DataFrame or raises ValueError for unsupported timeframes.
+    origin is passed to DataFrame.resample; pin it when resampling a history piece by piece.
+
+    Bins are computed once from the int64 timestamps and each column is reduced per bin
+    with ufunc.reduceat. Output matches resample_data_reference; frames that path cannot
+    reproduce exactly (NaNs, unsorted index) are handed to it.
     """
     if timeframe not in SUPPORTED_TIMEFRAMES:
         logging.error(f"Unsupported timeframe: {timeframe}")
         raise ValueError(f"Unsupported timeframe: {timeframe}")
-    rule = SUPPORTED_TIMEFRAMES[timeframe]
     logging.info(f"Resampling data to {timeframe}...")
-    ohlc_dict = {
-        'Open': 'first',
-        'High': 'max',
-        'Low': 'min',
-        'Close': 'last',
-        'Volume': 'sum',
-    }
-    resampled = df.resample(rule).apply(ohlc_dict).dropna()
+    if df.empty or not _can_reduce(df):
+        return resample_data_reference(df, timeframe, origin)
+    bins, labels, span = _bin_ids(df.index, TIMEFRAME_NANOS[timeframe], origin)
+    return _reduce_bins(df, bins, labels, span)
+
+def resample_data_reference(df: pd.DataFrame, timeframe: str, origin='start_day') -> pd.DataFrame:
+    """
+    Reference pandas implementation of resample_data, kept for equivalence tests and fallbacks.
+    """
+    if timeframe not in SUPPORTED_TIMEFRAMES:
+        logging.error(f"Unsupported timeframe: {timeframe}")
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    rule = SUPPORTED_TIMEFRAMES[timeframe]
+    resampled = df.resample(rule, origin=origin).apply(OHLC_DICT).dropna()
     return resampled
 
+def resample_cascade(df: pd.DataFrame, timeframes: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Resample df to every timeframe in timeframes, building each one from the finest
+    timeframe already computed whose bins nest inside it (e.g. 5min -> 15min -> 1h -> 4h -> 1D)
+    instead of from the raw bars. Returns {timeframe: resampled}.
+    """
+    done = {}
+    origin = df.index[0].normalize() if len(df) else 'start_day'
+    for tf in sorted(set(timeframes), key=lambda t: TIMEFRAME_NANOS[t]):
+        parent = _cascade_parent(tf, done, df.index.tz is not None)
+        if parent is None:
+            done[tf] = resample_data(df, tf, origin=origin)
+        else:
+            logging.info(f"Resampling data to {tf} from {parent}...")
+            done[tf] = resample_data(done[parent], tf, origin=origin)
+    return {tf: done[tf] for tf in timeframes if tf in done}
+
+def update_resampled(resampled: pd.DataFrame, new_bars: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """
+    Extend a resampled frame with bars newer than the ones it was built from.
+    Only the last (open) bin is re-aggregated; later bins are appended.
+    """
+    if resampled.empty:
+        return resample_data(new_bars, timeframe)
+    if new_bars.empty:
+        return resampled
+    fresh = resample_data(new_bars, timeframe, origin=resampled.index[0].normalize())
+    if fresh.index[0] != resampled.index[-1]:
+        return pd.concat([resampled, fresh])
+    merged = resampled.iloc[-1:].copy()
+    merged['High'] = max(merged['High'].iat[0], fresh['High'].iat[0])
+    merged['Low'] = min(merged['Low'].iat[0], fresh['Low'].iat[0])
+    merged['Close'] = fresh['Close'].iat[0]
+    merged['Volume'] = merged['Volume'].iat[0] + fresh['Volume'].iat[0]
+    return pd.concat([resampled.iloc[:-1], merged, fresh.iloc[1:]])
+
+def _can_reduce(df: pd.DataFrame) -> bool:
+    if not isinstance(df.index, pd.DatetimeIndex) or not df.index.is_monotonic_increasing:
+        return False
+    missing = [c for c in OHLC_DICT if c not in df.columns]
+    if missing:
+        return False
+    values = df[list(OHLC_DICT)]
+    return all(np.issubdtype(t, np.number) for t in values.dtypes) and not values.isna().to_numpy().any()
+
+def _bin_ids(index: pd.DatetimeIndex, step: int, origin):
+    """
+    Map each timestamp to its bin number. Mirrors pandas: bins are anchored at midnight of the
+    first day; daily bins follow local calendar days, intraday bins fixed steps in absolute time.
+    Returns (bin ids, function mapping bin ids to labels, number of bins spanned).
+    """
+    tz = index.tz
+    daily = step == DAY_NANOS
+    if isinstance(origin, str):
+        if origin != 'start_day':
+            raise ValueError(f"Unsupported origin: {origin}")
+        origin = index[0].normalize()
+    origin = pd.Timestamp(origin)
+    if tz is not None and origin.tz is None:
+        origin = origin.tz_localize(tz)
+    if daily and tz is not None:
+        # Days are local calendar days, whatever their length in hours.
+        ns = index.tz_localize(None).as_unit('ns').asi8
+        origin_ns = origin.tz_localize(None).value
+    else:
+        ns = index.as_unit('ns').asi8
+        origin_ns = origin.value
+    bins = (ns - origin_ns) // step
+
+    def labels(ids):
+        values = pd.DatetimeIndex((origin_ns + ids * step).view('datetime64[ns]'))
+        if tz is None:
+            return values
+        return values.tz_localize(tz) if daily else values.tz_localize('UTC').tz_convert(tz)
+
+    return bins, labels, int(bins[-1] - bins[0] + 1)
+
+def _reduce_bins(df: pd.DataFrame, bins: np.ndarray, labels, span: int) -> pd.DataFrame:
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(bins)) + 1])
+    ends = np.concatenate([starts[1:], [len(bins)]])
+    # pandas fills empty bins with NaN before dropna, which turns integer price columns to float.
+    has_empty_bins = len(starts) < span
+    out = {}
+    for col, how in OHLC_DICT.items():
+        values = df[col].to_numpy()
+        if how == 'first':
+            reduced = values[starts]
+        elif how == 'last':
+            reduced = values[ends - 1]
+        elif how == 'max':
+            reduced = np.maximum.reduceat(values, starts)
+        elif how == 'min':
+            reduced = np.minimum.reduceat(values, starts)
+        else:
+            reduced = np.add.reduceat(values, starts)
+        if has_empty_bins and how != 'sum' and np.issubdtype(reduced.dtype, np.integer):
+            reduced = reduced.astype(np.float64)
+        out[col] = reduced
+    return pd.DataFrame(out, index=labels(bins[starts]).rename(df.index.name))
+
+def _cascade_parent(tf: str, done: Dict[str, pd.DataFrame], tz_aware: bool):
+    step = TIMEFRAME_NANOS[tf]
+    candidates = [p for p in done if step % TIMEFRAME_NANOS[p] == 0 and p != tf]
+    if step == DAY_NANOS and tz_aware:
+        # Intraday bins are anchored in absolute time; across a DST change only bins that
+        # divide an hour still nest inside local days.
+        candidates = [p for p in candidates if HOUR_NANOS % TIMEFRAME_NANOS[p] == 0]
+    return max(candidates, key=lambda p: TIMEFRAME_NANOS[p]) if candidates else None
+
 if __name__ == "__main__":
     import sys
     logging.basicConfig(level=logging.INFO)
@@ -41,4 +178,4 @@ if __name__ == "__main__":
         df = pd.read_csv(sys.argv[1], index_col=0, parse_dates=True)
         tf = sys.argv[2] if len(sys.argv) > 2 else '1h'
         resampled = resample_data(df, tf)
-        print(resampled.head()) 
\ No newline at end of file
+        print(resampled.head())
@@ -0,0 +1,307 @@
+import os
+import importlib
+import pickle
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from fvg_store import FVGStore
+
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 2 << 30
+
+class ResultCache:
+    """
+    Content-addressed, size-bounded cache of pipeline results in a local directory.
+
+    Keys are hashes of whatever determines a result (see digest_frame and code_version), so
+    entries never go stale: changed bars, parameters or code simply hash to new keys.
+    Values are pickled objects or files (rendered plots). Each hit refreshes an entry's mtime
+    and the least recently used entries are deleted once the directory outgrows max_bytes.
+    Writes go through a temporary file and an atomic rename, so several processes (e.g.
+    universe workers) can share one directory.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._nbytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file())
+
+    def __getstate__(self):
+        return {'cache_dir': self.cache_dir, 'max_bytes': self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state['cache_dir'], state['max_bytes'])
+
+    def get(self, key: str):
+        """
+        The object stored under key, or None.
+        """
+        path = self._path(key, '.pkl')
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        self._touch(path)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value):
+        """
+        Store value (any picklable object) under key.
+        """
+        self._write(key, '.pkl', lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def get_file(self, key: str, dest: str) -> bool:
+        """
+        Copy the file stored under key to dest. Returns False if there is none.
+        """
+        path = self._path(key, '.file')
+        try:
+            shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        self._touch(path)
+        self.hits += 1
+        return True
+
+    def put_file(self, key: str, src: str):
+        """
+        Store a copy of the file src under key.
+        """
+        with open(src, 'rb') as source:
+            self._write(key, '.file', lambda f: shutil.copyfileobj(source, f))
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses, 'bytes': self._nbytes, 'max_bytes': self.max_bytes}
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def _write(self, key: str, suffix: str, write: Callable):
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            size = os.path.getsize(tmp)
+            os.replace(tmp, self._path(key, suffix))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            self._nbytes += size
+            if self._nbytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rescan rather than trust the running total: other processes write here too.
+        entries = [e for e in os.scandir(self.cache_dir) if e.is_file() and not e.name.endswith('.tmp')]
+        entries.sort(key=lambda e: e.stat().st_mtime_ns)
+        total = sum(e.stat().st_size for e in entries)
+        evicted = 0
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size  # cached by the DirEntry since the sort
+            try:
+                os.unlink(entry.path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+        self._nbytes = total
+        logging.info(f"Result cache evicted {evicted} entries, {total} bytes left")
+
+_code_versions = {}
+
+def code_version(*modules: str) -> str:
+    """
+    Hash of the source of the named modules plus the cache and pandas versions, so a code
+    change invalidates exactly the results computed by that code.
+    """
+    if modules not in _code_versions:
+        h = hashlib.blake2b(f"{CACHE_VERSION}|{pd.__version__}|{np.__version__}".encode(), digest_size=16)
+        for name in modules:
+            module = importlib.import_module(name)
+            with open(module.__file__, 'rb') as f:
+                h.update(f.read())
+        _code_versions[modules] = h.hexdigest()
+    return _code_versions[modules]
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    One uint64 hash per row of df (index included), for digests of any prefix of its rows.
+    """
+    return pd.util.hash_pandas_object(df, index=True).to_numpy()
+
+def digest_frame(df: Union[pd.DataFrame, FVGStore], hashes: Optional[np.ndarray] = None) -> str:
+    """
+    Content hash of a DataFrame (values, index, column names, dtypes and tz) or an FVGStore.
+    Pass hashes (row_hashes(df)[:k]) to digest only the first k rows of df.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(df, FVGStore):
+        h.update(str(df.tz).encode())
+        for name, values in df.columns().items():
+            h.update(name.encode())
+            h.update(np.ascontiguousarray(values).tobytes())
+        return h.hexdigest()
+    tz = getattr(df.index, 'tz', None)
+    h.update(repr((list(df.columns), [str(t) for t in df.dtypes], str(tz))).encode())
+    h.update((row_hashes(df) if hashes is None else hashes).tobytes())
+    return h.hexdigest()
+
+def make_key(*parts) -> str:
+    """
+    Cache key of a stage from the digests and parameters that determine its result.
+    """
+    return hashlib.blake2b(repr(parts).encode(), digest_size=20).hexdigest()
+
+def last_day_start(index: pd.DatetimeIndex) -> int:
+    """
+    Position of the first row on the calendar day of the last row (0 for a single day).
+    """
+    if not len(index):
+        return 0
+    return int(index.searchsorted(index[-1].normalize()))
+
+def cached_resample_cascade(cache: ResultCache, df: pd.DataFrame, timeframes: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    resample_cascade(df, timeframes) through the cache. On a miss, the bars before df's
+    last day are looked up (or resampled and stored) separately and only the last day is
+    folded in with update_resampled, so appending to or revising the last day of a history
+    resamples just that day.
+    """
+    from resample_data import resample_cascade, update_resampled
+    timeframes = list(dict.fromkeys(timeframes))
+    version = code_version('resample_data')
+    hashes = row_hashes(df)
+    key = make_key('resample', digest_frame(df, hashes), timeframes, version)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    split = last_day_start(df.index)
+    if split == 0:
+        result = resample_cascade(df, timeframes)
+    else:
+        prefix_key = make_key('resample', digest_frame(df.iloc[:split], hashes[:split]), timeframes, version)
+        prefix = cache.get(prefix_key)
+        if prefix is None:
+            prefix = resample_cascade(df.iloc[:split], timeframes)
+            cache.put(prefix_key, prefix)
+        result = {tf: update_resampled(prefix[tf], df.iloc[split:], tf) for tf in timeframes}
+    cache.put(key, result)
+    return result
+
+def cached_detect_fvg(cache: ResultCache, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    detect_fvg(df) through the cache (see cached_gaps).
+    """
+    from detect_fvg import build_fvg_frame
+    if len(df) < 3:
+        return pd.DataFrame()
+    return build_fvg_frame(df.index, *cached_gaps(cache, df))
+
+def cached_detect_fvg_columns(cache: ResultCache, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    detect_fvg_columns(df) through the cache (see cached_gaps).
+    """
+    from fvg_store import fvg_columns
+    return fvg_columns(df.index, *cached_gaps(cache, df))
+
+def cached_gaps(cache: ResultCache, df: pd.DataFrame) -> tuple:
+    """
+    (bars, bullish, gap_low, gap_high, fill_idx) of every FVG in df, as detect_fvg finds them.
+    On a miss, the gaps of the bars before df's last day are looked up (or found and stored)
+    and extended: only gaps still open at the end of that prefix are checked against the last
+    day, and only the last day (plus the two bars before it) is searched for new gaps.
+    """
+    version = code_version('detect_fvg', 'fill_resolution')
+    bars = df[['High', 'Low']]
+    hashes = row_hashes(bars)
+    key = make_key('gaps', digest_frame(bars, hashes), version)
+    gaps = cache.get(key)
+    if gaps is not None:
+        return gaps
+    high, low = df['High'].to_numpy(), df['Low'].to_numpy()
+    split = last_day_start(df.index)
+    if split < 3:
+        gaps = _find_gaps(high, low)
+    else:
+        prefix_key = make_key('gaps', digest_frame(bars.iloc[:split], hashes[:split]), version)
+        prefix = cache.get(prefix_key)
+        if prefix is None:
+            prefix = _find_gaps(high[:split], low[:split])
+            cache.put(prefix_key, prefix)
+        gaps = _extend_gaps(prefix, high, low, split)
+    cache.put(key, gaps)
+    return gaps
+
+def _find_gaps(high: np.ndarray, low: np.ndarray) -> tuple:
+    from detect_fvg import find_gaps
+    from fill_resolution import resolve_fills
+    if len(high) < 3:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=bool), np.empty(0), np.empty(0),
+                np.empty(0, dtype=np.int64))
+    bars, bullish, gap_low, gap_high = find_gaps(high, low)
+    return bars, bullish, gap_low, gap_high, resolve_fills(high, low, bars, gap_low, gap_high, bullish)
+
+def _extend_gaps(prefix: tuple, high: np.ndarray, low: np.ndarray, split: int) -> tuple:
+    from detect_fvg import find_gaps
+    from fill_resolution import resolve_fills
+    bars, bullish, gap_low, gap_high, fill_idx = prefix
+    new_bars, new_bullish, new_low, new_high = find_gaps(high[split - 2:], low[split - 2:])
+    new_bars = new_bars + split - 2
+    bars, bullish = np.concatenate([bars, new_bars]), np.concatenate([bullish, new_bullish])
+    gap_low, gap_high = np.concatenate([gap_low, new_low]), np.concatenate([gap_high, new_high])
+    fill_idx = np.concatenate([fill_idx, np.full(len(new_bars), -1, dtype=np.int64)])
+    # Gaps open at the end of the prefix are searched from the first new bar (position -1
+    # in the suffix), new gaps from the bar after their own.
+    open_gaps = np.flatnonzero(fill_idx < 0)
+    start = np.maximum(bars[open_gaps] - split, -1)
+    found = resolve_fills(high[split:], low[split:], start, gap_low[open_gaps], gap_high[open_gaps],
+                          bullish[open_gaps])
+    fill_idx[open_gaps] = np.where(found >= 0, found + split, -1)
+    return bars, bullish, gap_low, gap_high, fill_idx
+
+def cached_fvg_stats(cache: ResultCache, fvg_df: Union[pd.DataFrame, FVGStore]):
+    """
+    The FVGStats behind analyze_fvgs(fvg_df) through the cache (fvg_df may be an FVGStore).
+    """
+    from fvg_stats import FVGStats
+    key = make_key('analyze', digest_frame(fvg_df), code_version('fvg_stats'))
+    stats = cache.get(key)
+    if stats is None:
+        stats = FVGStats.from_store(fvg_df) if isinstance(fvg_df, FVGStore) else FVGStats.from_frame(fvg_df)
+        cache.put(key, stats)
+    return stats
+
+def cached_render(cache: ResultCache, render: Callable, output_path: str, inputs: Iterable, *args, **kwargs):
+    """
+    Call render(*inputs, *args, output_path, **kwargs) (a visualize_fvg plot function)
+    unless the same inputs, arguments and plotting code already rendered a file, which is
+    then copied to output_path.
+    """
+    inputs = list(inputs)
+    key = make_key('render', render.__name__, [digest_frame(i) for i in inputs], args, sorted(kwargs.items()),
+                   code_version('visualize_fvg'))
+    if cache.get_file(key, output_path):
+        return
+    render(*inputs, *args, output_path, **kwargs)
+    if os.path.exists(output_path):
+        cache.put_file(key, output_path)
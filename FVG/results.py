@@ -12,4 +12,13 @@ def save_insights_to_file(insights: Dict, ticker: str, timeframe: str, output_di
     path = os.path.join(output_dir, filename)
     with open(path, 'w') as f:
         json.dump(insights, f, indent=4, default=str)
-    logging.info(f"Saved insights to {path}") 
\ No newline at end of file
+    logging.info(f"Saved insights to {path}") 
+
+def save_universe_summary(summary: Dict, output_dir: str):
+    """
+    Save the aggregated summary of a universe run to universe_summary.json in the output directory.
+    """
+    path = os.path.join(output_dir, 'universe_summary.json')
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=4, default=str)
+    logging.info(f"Saved universe summary to {path}")
\ No newline at end of file
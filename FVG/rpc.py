@@ -0,0 +1,117 @@
+import os
+import json
+import socket
+import logging
+import threading
+import socketserver
+from typing import Callable, Dict, Tuple
+
+class RPCError(Exception):
+    """
+    Raised by RPCClient.call when the server's handler failed.
+    """
+
+def parse_address(address: str) -> Tuple[int, object]:
+    """
+    'unix:/path/to.sock' or 'host:port' -> (socket family, address).
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    # Rebinding right after a restart must not fail on sockets left in TIME_WAIT.
+    allow_reuse_address = True
+
+def make_server(handlers: Dict[str, Callable], address: str) -> socketserver.BaseServer:
+    """
+    A threaded server answering line-delimited JSON requests {"id", "method", "params"} with
+    {"id", "result"} or {"id", "error"} on the same persistent connection. handlers maps a
+    method name to a function taking the params as keyword arguments. Values that are not
+    JSON types (Timestamps, numpy scalars) are sent as strings.
+    Call serve_forever() on the result, and server_close() when done.
+    """
+    family, target = parse_address(address)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                request = {}
+                try:
+                    request = json.loads(line)
+                    handler = handlers.get(request['method'])
+                    if handler is None:
+                        raise KeyError(f"Unknown method: {request['method']}")
+                    response = {'id': request.get('id'), 'result': handler(**request.get('params', {}))}
+                except Exception as ex:
+                    logging.exception(f"RPC {request.get('method')} failed")
+                    response = {'id': request.get('id'), 'error': f"{type(ex).__name__}: {ex}"}
+                self.wfile.write(json.dumps(response, default=_to_json).encode() + b'\n')
+                self.wfile.flush()
+
+    if family == socket.AF_UNIX:
+        if os.path.exists(target):
+            os.unlink(target)
+        server = socketserver.ThreadingUnixStreamServer(target, Handler)
+    else:
+        server = _ThreadingTCPServer(target, Handler)
+    server.daemon_threads = True
+    return server
+
+def serve_in_thread(handlers: Dict[str, Callable], address: str) -> socketserver.BaseServer:
+    """
+    Start make_server(handlers, address) on a daemon thread. Stop it with shutdown().
+    """
+    server = make_server(handlers, address)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class RPCClient:
+    """
+    Client side of make_server, keeping one connection open across calls.
+    """
+
+    def __init__(self, address: str, timeout: float = None):
+        family, target = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(target)
+        if family == socket.AF_INET:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile('rb')
+        self._next_id = 0
+
+    def call(self, method: str, **params):
+        """
+        Run method on the server and return its result. Raises RPCError if it failed there.
+        """
+        self._next_id += 1
+        request = {'id': self._next_id, 'method': method, 'params': params}
+        self.sock.sendall(json.dumps(request, default=_to_json).encode() + b'\n')
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("RPC server closed the connection")
+        response = json.loads(line)
+        if 'error' in response:
+            raise RPCError(response['error'])
+        return response['result']
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _to_json(value):
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
@@ -0,0 +1,175 @@
+import heapq
+import logging
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from detect_fvg import find_gaps
+from fill_resolution import resolve_fills
+
+class StreamingFVGDetector:
+    """
+    Incremental FVG detector that is fed one bar or a small batch of bars at a time.
+
+    Only the last two bars and the open gaps are kept. Open bullish gaps sit in a max-heap on
+    Gap_Low and open bearish gaps in a min-heap on Gap_High, so each new bar closes every gap
+    it fills with O(log k) heap pops instead of rescanning. After any sequence of updates,
+    to_frame() equals detect_fvg() run once over the same bars.
+    """
+
+    def __init__(self, keep_history: bool = True):
+        self.keep_history = keep_history
+        self.bars_seen = 0
+        self._tail_index = None
+        self._tail_high = np.empty(0)
+        self._tail_low = np.empty(0)
+        self._bullish_open = []  # (-Gap_Low, seq)
+        self._bearish_open = []  # (Gap_High, seq)
+        self._open = {}  # seq -> record
+        self._records = []
+        self._next_seq = 0
+
+    def update(self, bars: pd.DataFrame) -> List[Dict]:
+        """
+        Feed new bars (a DataFrame with High/Low, index strictly after the previous bars).
+        Returns the 'created' and 'filled' events they caused, in bar order.
+        """
+        if bars.empty:
+            return []
+        return self._update_arrays(bars.index, bars['High'].to_numpy(), bars['Low'].to_numpy())
+
+    def update_bar(self, timestamp, high: float, low: float) -> List[Dict]:
+        """
+        Feed a single bar. Returns the events it caused.
+        """
+        return self._update_arrays(pd.DatetimeIndex([timestamp]), np.array([high]), np.array([low]))
+
+    def seed(self, open_gaps: pd.DataFrame, tail: Optional[pd.DataFrame] = None) -> List[int]:
+        """
+        Resume from earlier detection output before the first update: open_gaps (detect_fvg
+        layout, still unfilled) are tracked as if they had been seen, and the last two bars of
+        tail (High/Low) let a gap that straddles the boundary be found. Returns the Seqs given
+        to open_gaps, in their order.
+        """
+        if self.bars_seen or self._next_seq:
+            raise ValueError("seed() must be called before the first update")
+        seqs = []
+        for record in open_gaps.to_dict('records'):
+            seq = self._next_seq
+            self._next_seq += 1
+            record = dict(record, Filled=False, Fill_Time=None)
+            if self.keep_history:
+                self._records.append(record)
+            self._open[seq] = record
+            if record['Type'] == 'Bullish':
+                heapq.heappush(self._bullish_open, (-record['Gap_Low'], seq))
+            else:
+                heapq.heappush(self._bearish_open, (record['Gap_High'], seq))
+            seqs.append(seq)
+        if tail is not None and not tail.empty:
+            tail = tail.iloc[-2:]
+            self._tail_index = tail.index
+            self._tail_high = tail['High'].to_numpy(dtype=np.float64)
+            self._tail_low = tail['Low'].to_numpy(dtype=np.float64)
+            self.bars_seen = len(tail)
+        return seqs
+
+    @property
+    def gaps_seen(self) -> int:
+        """
+        Number of gaps created so far.
+        """
+        return self._next_seq
+
+    @property
+    def open_count(self) -> int:
+        """
+        Number of gaps still unfilled.
+        """
+        return len(self._open)
+
+    def open_gaps(self) -> pd.DataFrame:
+        """
+        Return the currently unfilled gaps in creation order.
+        """
+        return pd.DataFrame([self._open[seq] for seq in sorted(self._open)])
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Return every gap seen so far in the same layout as detect_fvg.
+        Requires keep_history=True.
+        """
+        if not self.keep_history:
+            raise ValueError("to_frame() needs a detector created with keep_history=True")
+        return pd.DataFrame(self._records)
+
+    def _update_arrays(self, index: pd.Index, high: np.ndarray, low: np.ndarray) -> List[Dict]:
+        events = self._fill_open_gaps(index, high, low)
+        events += self._detect_new_gaps(index, high, low)
+        # Within one bar, fills of older gaps come before the gap that bar creates.
+        events.sort(key=lambda e: (e['Bar'], e['Event'] == 'created', e['Seq']))
+        if self._tail_index is None:
+            self._tail_index = index[-2:]
+        else:
+            self._tail_index = self._tail_index.append(index)[-2:]
+        self._tail_high = np.concatenate([self._tail_high, high])[-2:]
+        self._tail_low = np.concatenate([self._tail_low, low])[-2:]
+        self.bars_seen += len(index)
+        for e in events:
+            logging.debug(f"FVG {e['Event']}: {e}")
+        return events
+
+    def _fill_open_gaps(self, index: pd.Index, high: np.ndarray, low: np.ndarray) -> List[Dict]:
+        events = []
+        if self._bullish_open:
+            # Running minimum of Low is non-increasing, so the first bar that reaches a level
+            # is a binary search away.
+            run_min = np.minimum.accumulate(np.where(np.isnan(low), np.inf, low))
+            while self._bullish_open and -self._bullish_open[0][0] >= run_min[-1]:
+                neg_level, seq = heapq.heappop(self._bullish_open)
+                j = int(np.searchsorted(-run_min, neg_level, side='left'))
+                events.append(self._close(seq, index, j))
+        if self._bearish_open:
+            run_max = np.maximum.accumulate(np.where(np.isnan(high), -np.inf, high))
+            while self._bearish_open and self._bearish_open[0][0] <= run_max[-1]:
+                level, seq = heapq.heappop(self._bearish_open)
+                j = int(np.searchsorted(run_max, level, side='left'))
+                events.append(self._close(seq, index, j))
+        return events
+
+    def _close(self, seq: int, index: pd.Index, j: int) -> Dict:
+        record = self._open.pop(seq)
+        record['Filled'] = True
+        record['Fill_Time'] = index[j]
+        return {'Event': 'filled', 'Seq': seq, 'Bar': self.bars_seen + j, **record}
+
+    def _detect_new_gaps(self, index: pd.Index, high: np.ndarray, low: np.ndarray) -> List[Dict]:
+        t = len(self._tail_high)
+        ext_index = index if self._tail_index is None else self._tail_index.append(index)
+        ext_high = np.concatenate([self._tail_high, high])
+        ext_low = np.concatenate([self._tail_low, low])
+        bars, bullish, gap_low, gap_high = find_gaps(ext_high, ext_low)
+        fill_idx = resolve_fills(ext_high, ext_low, bars, gap_low, gap_high, bullish)
+        events = []
+        for k, p in enumerate(bars):
+            seq = self._next_seq
+            self._next_seq += 1
+            record = {
+                'Timestamp': ext_index[p],
+                'Type': 'Bullish' if bullish[k] else 'Bearish',
+                'Gap_Low': gap_low[k],
+                'Gap_High': gap_high[k],
+                'Filled': False,
+                'Fill_Time': None,
+            }
+            bar = int(self.bars_seen - t + p)
+            events.append({'Event': 'created', 'Seq': seq, 'Bar': bar, **record})
+            if self.keep_history:
+                self._records.append(record)
+            self._open[seq] = record
+            if fill_idx[k] >= 0:
+                events.append(self._close(seq, index, int(fill_idx[k]) - t))
+            elif bullish[k]:
+                heapq.heappush(self._bullish_open, (-gap_low[k], seq))
+            else:
+                heapq.heappush(self._bearish_open, (gap_high[k], seq))
+        return events
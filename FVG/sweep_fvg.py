@@ -0,0 +1,188 @@
+import sys
+import logging
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Iterable, List, Optional, Tuple, Union
+from detect_fvg import find_gaps
+from fill_resolution import build_min_tree, first_at_or_below
+from fvg_store import fvg_columns
+from fvg_stats import FVGStats
+
+FILL_LEVELS = {'touch': 0.0, 'midpoint': 0.5, 'full': 1.0}
+SIZE_FILTERS = ('abs', 'atr', 'pct')
+ATR_PERIOD = 14
+
+class SweepArrays:
+    """
+    Everything a sweep shares between configurations, computed once per bar series:
+    the High/Low arrays, their range-minimum trees (Low and -High), every gap with no
+    size filter, and per-gap scales for the relative size filters (built on first use).
+    """
+
+    def __init__(self, df: pd.DataFrame, atr_period: int = ATR_PERIOD):
+        self.index = df.index
+        self.high = df['High'].to_numpy(dtype=np.float64)
+        self.low = df['Low'].to_numpy(dtype=np.float64)
+        self._close = df['Close'].to_numpy(dtype=np.float64) if 'Close' in df.columns else None
+        self.atr_period = atr_period
+        if len(df) < 3:
+            empty = np.empty(0, dtype=np.int64)
+            self.bars, self.bullish, self.gap_low, self.gap_high = empty, empty.astype(bool), empty * 1.0, empty * 1.0
+        else:
+            self.bars, self.bullish, self.gap_low, self.gap_high = find_gaps(self.high, self.low)
+        self.sizes = self.gap_high - self.gap_low
+        self._low_tree = None
+        self._neg_high_tree = None
+        self._scales = {}
+
+    def scaled_sizes(self, kind: str) -> np.ndarray:
+        """
+        Gap sizes in the units of a size filter: price ('abs'), multiples of the ATR of the
+        atr_period bars ending at the gap's first candle ('atr'), or percent of that candle's
+        Close ('pct').
+        """
+        if kind == 'abs':
+            return self.sizes
+        if kind not in SIZE_FILTERS:
+            raise ValueError(f"Unknown size filter: {kind}")
+        if kind not in self._scales:
+            if self._close is None:
+                raise ValueError(f"The '{kind}' size filter needs a Close column")
+            first = self.bars - 2
+            if kind == 'atr':
+                self._scales[kind] = average_true_range(self.high, self.low, self._close, self.atr_period)[first]
+            else:
+                self._scales[kind] = self._close[first] / 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.sizes / self._scales[kind]
+
+    def fill_bars(self, fraction: float) -> np.ndarray:
+        """
+        Position of the first bar after creation that reaches `fraction` of the way through
+        each gap (0 touches its near edge, 1 crosses it fully, as detect_fvg), or -1.
+        """
+        fill_idx = np.full(len(self.bars), -1, dtype=np.int64)
+        bull = np.flatnonzero(self.bullish)
+        bear = np.flatnonzero(~self.bullish)
+        # Price enters a bullish gap from above and a bearish one from below.
+        if len(bull):
+            if self._low_tree is None:
+                self._low_tree = build_min_tree(self.low)
+            level = _fill_level(self.gap_high[bull], self.gap_low[bull], fraction)
+            fill_idx[bull] = first_at_or_below(self._low_tree, self.bars[bull] + 1, level)
+        if len(bear):
+            if self._neg_high_tree is None:
+                self._neg_high_tree = build_min_tree(-self.high)
+            level = _fill_level(self.gap_low[bear], self.gap_high[bear], fraction)
+            fill_idx[bear] = first_at_or_below(self._neg_high_tree, self.bars[bear] + 1, -level)
+        return fill_idx
+
+def sweep_fvg(
+    df: pd.DataFrame,
+    size_filters: Iterable[Tuple[str, float]] = (('abs', 0.0),),
+    fills: Iterable[Union[str, float]] = ('full',),
+    expiries: Iterable[Optional[int]] = (None,),
+    atr_period: int = ATR_PERIOD
+) -> pd.DataFrame:
+    """
+    Evaluate every combination of size filter, fill definition and expiry on the bars in df
+    and return one row of analyze_fvgs insights per configuration.
+
+    size_filters are (kind, minimum) pairs with kind in SIZE_FILTERS; a gap is kept if its
+    size in those units is >= minimum (0 keeps every gap). fills are names in FILL_LEVELS or
+    fractions of the gap that price has to cover. expiries are bar counts after which an
+    unfilled gap no longer counts as filled (None: never expires).
+
+    Gaps are found once and each fill definition is resolved once for all gaps with shared
+    range-minimum trees, so bar-level work grows with the number of fill definitions only;
+    size filters and expiries are masks over the gap arrays. The configuration
+    ('abs', 0), 'full', None reproduces analyze_fvgs(detect_fvg(df)).
+    """
+    arrays = SweepArrays(df, atr_period)
+    size_filters, expiries = list(size_filters), list(expiries)
+    keep = {(kind, minimum): arrays.scaled_sizes(kind) >= minimum for kind, minimum in size_filters}
+    tz = df.index.tz
+    rows = []
+    for fill in fills:
+        fill_idx = arrays.fill_bars(_fill_fraction(fill))
+        waited = fill_idx - arrays.bars
+        for (kind, minimum), expiry in itertools.product(size_filters, expiries):
+            in_time = fill_idx >= 0 if expiry is None else (fill_idx >= 0) & (waited <= expiry)
+            sel = keep[(kind, minimum)]
+            cols = fvg_columns(arrays.index, arrays.bars[sel], arrays.bullish[sel], arrays.gap_low[sel],
+                               arrays.gap_high[sel], np.where(in_time, fill_idx, -1)[sel])
+            insights = FVGStats().add_columns(cols, tz).to_insights()
+            insights.pop('largest_fvg', None)
+            rows.append({'size_filter': kind, 'min_size': minimum, 'fill': fill, 'expiry_bars': expiry, **insights})
+    logging.info(f"Swept {len(rows)} FVG configurations over {len(arrays.bars)} gaps")
+    table = pd.DataFrame(rows)
+    if len(table):
+        table['expiry_bars'] = table['expiry_bars'].astype('Int64')
+    return table
+
+def average_true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    """
+    Simple moving average of the true range over `period` bars (fewer at the start).
+    """
+    prev_close = np.concatenate([close[:1], close[:-1]])
+    true_range = np.maximum(high, prev_close) - np.minimum(low, prev_close)
+    true_range[0] = high[0] - low[0]
+    csum = np.concatenate([[0.0], np.cumsum(true_range)])
+    end = np.arange(1, len(true_range) + 1)
+    start = np.maximum(end - period, 0)
+    return (csum[end] - csum[start]) / (end - start)
+
+def _fill_fraction(fill: Union[str, float]) -> float:
+    if isinstance(fill, str):
+        if fill not in FILL_LEVELS:
+            raise ValueError(f"Unknown fill definition: {fill}")
+        return FILL_LEVELS[fill]
+    if not 0 <= fill <= 1:
+        raise ValueError(f"Fill fraction must be between 0 and 1, got {fill}")
+    return float(fill)
+
+def _fill_level(near: np.ndarray, far: np.ndarray, fraction: float) -> np.ndarray:
+    # The edges themselves are used at 0 and 1 so a full fill compares exactly like detect_fvg.
+    if fraction == 0:
+        return near
+    if fraction == 1:
+        return far
+    return near + fraction * (far - near)
+
+def _parse_size_filter(text: str) -> Tuple[str, float]:
+    kind, _, minimum = text.partition(':')
+    if kind not in SIZE_FILTERS or not minimum:
+        raise argparse.ArgumentTypeError(f"Expected KIND:MIN with KIND in {SIZE_FILTERS}, got {text}")
+    return kind, float(minimum)
+
+def _parse_fill(text: str) -> Union[str, float]:
+    return text if text in FILL_LEVELS else float(text)
+
+def _parse_expiry(text: str) -> Optional[int]:
+    return None if text.lower() == 'none' else int(text)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from chunked_fvg import load_bars
+    from resample_data import resample_data
+    parser = argparse.ArgumentParser(description="Sweep FVG size filters, fill definitions and expiries in one pass.")
+    parser.add_argument('--input', required=True, help='CSV of 1-minute bars')
+    parser.add_argument('--timeframe', default='1h')
+    parser.add_argument('--size-filters', type=_parse_size_filter, nargs='+', default=[('abs', 0.0)],
+                        help='KIND:MIN pairs, e.g. abs:0 atr:0.5 pct:0.1')
+    parser.add_argument('--fills', type=_parse_fill, nargs='+', default=['full'],
+                        help='touch, midpoint, full or a fraction of the gap')
+    parser.add_argument('--expiries', type=_parse_expiry, nargs='+', default=[None], help="Bars, or 'none'")
+    parser.add_argument('--atr-period', type=int, default=ATR_PERIOD)
+    parser.add_argument('--output', default='fvg_sweep.csv')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    bars = resample_data(load_bars(args.input), args.timeframe)
+    table = sweep_fvg(bars, args.size_filters, args.fills, args.expiries, args.atr_period)
+    table.to_csv(args.output, index=False)
+    print(f"Saved {len(table)} configurations to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
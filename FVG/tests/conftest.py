@@ -0,0 +1,46 @@
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import date, timedelta
+
+def _random_walk_ohlcv(n=500, seed=0, tz=None):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    idx = pd.date_range('2023-01-02 09:30', periods=n, freq='1min', tz=tz)
+    return pd.DataFrame({
+        'Open': close,
+        'High': close + rng.random(n),
+        'Low': close - rng.random(n),
+        'Close': close,
+        'Volume': rng.integers(100, 1000, n),
+    }, index=idx)
+
+@pytest.fixture
+def random_walk_ohlcv():
+    """
+    Factory for seeded random-walk 1-minute bars: random_walk_ohlcv(n=500, seed=0, tz=None).
+    """
+    return _random_walk_ohlcv
+
+@pytest.fixture
+def run_cli(tmp_path, monkeypatch):
+    """
+    Run cli.main for ticker SYN over the last `days` days, downloading `bars` through a
+    stubbed yf_fetch with no pauses: run_cli(bars, '--timeframes', '1h', days=3, workdir=None).
+    Runs in workdir (default tmp_path) and returns its fvgs_output directory.
+    """
+    def run(bars, *args, days=3, workdir=None):
+        import cli
+        import download_data
+        workdir = tmp_path if workdir is None else workdir
+        monkeypatch.setattr(download_data, 'yf_fetch', lambda *fetch_args: bars.copy())
+        monkeypatch.setattr(download_data.time, 'sleep', lambda seconds: None)
+        monkeypatch.chdir(workdir)
+        end = date.today()
+        monkeypatch.setattr(sys, 'argv', ['cli.py', '--ticker', 'SYN', '--start', (end - timedelta(days=days)).isoformat(),
+                                          '--end', end.isoformat(), *args])
+        cli.main()
+        return workdir / 'fvgs_output'
+
+    return run
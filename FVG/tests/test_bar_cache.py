@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import pandas as pd
+from datetime import datetime, timedelta
+from bar_cache import cached_days, covered_days, load_cached_bars, store_bars
+from download_data import download_data
+
+class StubFetcher:
+    """Serve synthetic market-hours 1-minute bars and record every request."""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, ticker, start, end, interval, auto_adjust):
+        self.calls.append((start, end))
+        idx = pd.date_range(start, end, freq='1min', inclusive='left', tz='America/New_York')
+        idx = idx[(idx.hour >= 10) & (idx.hour < 15) & (idx.dayofweek < 5)]
+        close = 100 + (idx.asi8 % 997) / 100.0
+        return pd.DataFrame({'Open': close, 'High': close + 0.5, 'Low': close - 0.5,
+                             'Close': close, 'Volume': np.arange(len(idx), dtype=np.int64)}, index=idx)
+
+def day(offset):
+    return (datetime.utcnow().date() + timedelta(days=offset)).isoformat()
+
+def test_store_and_load_roundtrip(tmp_path):
+    fetch = StubFetcher()
+    df = fetch('AAPL', datetime(2024, 3, 8), datetime(2024, 3, 12), '1m', False)
+    days = [d.date() for d in pd.date_range('2024-03-08', '2024-03-11')]
+    store_bars(str(tmp_path), 'AAPL', '1m', df, days)
+    assert cached_days(str(tmp_path), 'AAPL', '1m') == set(days)
+    pd.testing.assert_frame_equal(load_cached_bars(str(tmp_path), 'AAPL', '1m', days), df, check_freq=False)
+
+def test_interrupted_store_leaves_no_partial_partition(tmp_path, monkeypatch):
+    fetch = StubFetcher()
+    df = fetch('AAPL', datetime(2024, 3, 8), datetime(2024, 3, 12), '1m', False)
+    days = [d.date() for d in pd.date_range('2024-03-08', '2024-03-11')]
+    store_bars(str(tmp_path), 'AAPL', '1m', df, days[:1])
+    save = np.save
+
+    def interrupted_save(f, records):
+        save(f, records)
+        f.truncate(64)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(np, 'save', interrupted_save)
+    with pytest.raises(KeyboardInterrupt):
+        store_bars(str(tmp_path), 'AAPL', '1m', df, days[1:])
+    assert cached_days(str(tmp_path), 'AAPL', '1m') == set(days[:1])
+    assert sorted(p.name for p in tmp_path.rglob('*') if p.is_file()) == ['2024-03-08.npy', '_meta.json']
+
+def test_second_run_is_served_from_cache(tmp_path):
+    fetch = StubFetcher()
+    first = download_data('AAPL', day(-10), day(-2), pause=0, cache_dir=str(tmp_path), fetch=fetch)
+    assert fetch.calls and not first.empty
+    fetch.calls.clear()
+    second = download_data('AAPL', day(-10), day(-2), pause=0, cache_dir=str(tmp_path), fetch=fetch)
+    assert fetch.calls == []
+    pd.testing.assert_frame_equal(second, first, check_freq=False)
+
+def test_only_missing_days_are_fetched(tmp_path):
+    fetch = StubFetcher()
+    download_data('AAPL', day(-10), day(-5), pause=0, cache_dir=str(tmp_path), fetch=fetch)
+    fetch.calls.clear()
+    df = download_data('AAPL', day(-10), day(-2), pause=0, cache_dir=str(tmp_path), fetch=fetch)
+    assert [(s.date().isoformat(), e.date().isoformat()) for s, e in fetch.calls] == [(day(-5), day(-2))]
+    assert not df.index.duplicated().any()
+    assert df.index.is_monotonic_increasing
+
+def test_cached_days_outlive_lookback_and_work_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr('download_data.MAX_LOOKBACK_DAYS', 90)
+    first = download_data('AAPL', day(-60), day(-40), pause=0, cache_dir=str(tmp_path), fetch=StubFetcher())
+    monkeypatch.undo()
+    def offline(*args, **kwargs):
+        raise ConnectionError("offline")
+    df = download_data('AAPL', day(-60), day(-40), retries=1, pause=0, cache_dir=str(tmp_path), fetch=offline)
+    pd.testing.assert_frame_equal(df, first, check_freq=False)
+
+def test_adjusted_and_unadjusted_bars_are_cached_apart(tmp_path):
+    fetch = StubFetcher()
+    download_data('AAPL', day(-10), day(-2), pause=0, cache_dir=str(tmp_path), fetch=fetch)
+    fetch.calls.clear()
+    download_data('AAPL', day(-10), day(-2), pause=0, auto_adjust=True, cache_dir=str(tmp_path), fetch=fetch)
+    assert fetch.calls
+    assert cached_days(str(tmp_path), 'AAPL', '1m', auto_adjust=True) == cached_days(str(tmp_path), 'AAPL', '1m')
+
+@pytest.mark.parametrize('failure', ['empty', 'missing'])
+def test_failed_or_empty_weekdays_are_not_cached(tmp_path, failure):
+    def bad_fetch(ticker, start, end, interval, auto_adjust):
+        if failure == 'missing':
+            raise ValueError("YFPricesMissingError: no price data found")
+        return pd.DataFrame()
+
+    assert download_data('AAPL', day(-10), day(-2), pause=0, cache_dir=str(tmp_path), fetch=bad_fetch).empty
+    weekends = {d.date() for d in pd.date_range(day(-10), day(-2), inclusive='left') if d.dayofweek >= 5}
+    assert cached_days(str(tmp_path), 'AAPL', '1m') == (weekends if failure == 'empty' else set())
+    fetch = StubFetcher()
+    df = download_data('AAPL', day(-10), day(-2), pause=0, cache_dir=str(tmp_path), fetch=fetch)
+    assert fetch.calls and set(df.index.date) == {d.date() for d in pd.date_range(day(-10), day(-2), inclusive='left')
+                                                   if d.dayofweek < 5}
+
+def test_holidays_between_trading_days_are_cached(tmp_path):
+    fetch = StubFetcher()
+    df = fetch('AAPL', datetime(2024, 3, 25), datetime(2024, 4, 2), '1m', False)
+    days = [d.date() for d in pd.date_range('2024-03-25', '2024-04-01')]
+    holiday = df[df.index.date != datetime(2024, 3, 29).date()]
+    assert covered_days(holiday, days) == days
+    assert covered_days(df[df.index.date < datetime(2024, 3, 28).date()], days) == days[:3] + days[5:7]
@@ -0,0 +1,51 @@
+import os
+import time
+import pandas as pd
+from benchmark import synthetic_bars, run_benchmarks, run_cli, compare_to_baseline
+from detect_fvg import detect_fvg
+
+def test_synthetic_bars_are_seeded():
+    pd.testing.assert_frame_equal(synthetic_bars(2000, seed=3), synthetic_bars(2000, seed=3))
+    assert not synthetic_bars(2000, seed=3).equals(synthetic_bars(2000, seed=4))
+
+def test_synthetic_bars_are_valid_ohlc():
+    bars = synthetic_bars(5000, tz='America/New_York')
+    assert (bars['High'] >= bars[['Open', 'Close']].max(axis=1)).all()
+    assert (bars['Low'] <= bars[['Open', 'Close']].min(axis=1)).all()
+    assert bars.index.is_monotonic_increasing
+
+def test_gap_rate_and_fill_prob_are_controllable():
+    assert detect_fvg(synthetic_bars(20_000, gap_rate=0)).empty
+    sparse = detect_fvg(synthetic_bars(50_000, gap_rate=0.002, fill_prob=0.0))
+    assert 70 <= len(sparse) <= 130
+    assert not sparse['Filled'].any()
+    assert detect_fvg(synthetic_bars(50_000, gap_rate=0.002, fill_prob=1.0))['Filled'].all()
+    half = detect_fvg(synthetic_bars(50_000, gap_rate=0.002, fill_prob=0.5))
+    assert 0.3 < half['Filled'].mean() < 0.7
+
+def test_run_benchmarks_records_each_stage():
+    report = run_benchmarks([500, 1000], stages=['detect_fvg', 'analyze_fvgs'], repeat=1)
+    assert [(r['stage'], r['bars']) for r in report['results']] == [
+        ('detect_fvg', 500), ('analyze_fvgs', 500), ('detect_fvg', 1000), ('analyze_fvgs', 1000)]
+    assert all(r['seconds'] >= 0 and r['peak_mb'] >= 0 for r in report['results'])
+    assert report['meta']['seed'] == 0
+
+def test_run_cli_end_to_end(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    cwd = os.getcwd()
+    run_cli(synthetic_bars(3000), ['1h'], str(tmp_path))
+    assert not any(sleeps)
+    assert os.getcwd() == cwd
+    assert os.path.exists(tmp_path / 'fvgs_output' / 'SYN_1h_fvgs.csv')
+
+def test_compare_to_baseline():
+    baseline = {'results': [{'stage': 'detect_fvg', 'bars': 1000, 'seconds': 0.10, 'peak_mb': 10.0},
+                            {'stage': 'analyze_fvgs', 'bars': 1000, 'seconds': 0.001, 'peak_mb': 0.1}]}
+    current = {'results': [{'stage': 'detect_fvg', 'bars': 1000, 'seconds': 0.30, 'peak_mb': 10.5},
+                           {'stage': 'analyze_fvgs', 'bars': 1000, 'seconds': 0.005, 'peak_mb': 0.5},
+                           {'stage': 'plot_fvgs', 'bars': 1000, 'seconds': 9.0, 'peak_mb': 9.0}]}
+    regressions = compare_to_baseline(current, baseline)
+    assert len(regressions) == 1
+    assert regressions[0].startswith('detect_fvg @ 1000 bars')
+    assert compare_to_baseline(baseline, baseline) == []
@@ -0,0 +1,73 @@
+import filecmp
+import json
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg
+from resample_data import resample_data
+from chunked_fvg import read_bars_chunked, resample_chunks, detect_fvg_chunked, load_bars
+
+def minute_bars(tz=None, days=10, seed=0):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range('2024-03-04 09:30', periods=days * 24 * 60, freq='1min', tz=tz)
+    idx = idx[(idx.hour >= 9) & (idx.hour < 16)]
+    close = 100 + np.cumsum(rng.normal(0, 0.1, len(idx)))
+    return pd.DataFrame({
+        'Open': close,
+        'High': close + rng.random(len(idx)) * 0.2,
+        'Low': close - rng.random(len(idx)) * 0.2,
+        'Close': close,
+        'Volume': rng.integers(100, 1000, len(idx)),
+    }, index=idx)
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+@pytest.mark.parametrize('timeframe', ['1D', '12h', '1h', '5min'])
+def test_chunked_matches_in_memory(tmp_path, tz, timeframe):
+    bars_path = tmp_path / 'bars.csv'
+    minute_bars(tz).to_csv(bars_path)
+    full = load_bars(str(bars_path), tz)
+    resampled = resample_data(full, timeframe)
+    chunked = pd.concat(list(resample_chunks(read_bars_chunked(str(bars_path), 500, tz), timeframe)))
+    pd.testing.assert_frame_equal(chunked, resampled, check_freq=False)
+
+    expected_path = tmp_path / 'expected.csv'
+    detect_fvg(resampled).to_csv(expected_path, index=False)
+    out_path = tmp_path / 'chunked.csv'
+    detect_fvg_chunked(resample_chunks(read_bars_chunked(str(bars_path), 500, tz), timeframe), str(out_path), write_rows=7)
+    assert filecmp.cmp(expected_path, out_path, shallow=False)
+
+def test_cli_chunked_mode_matches_in_memory(tmp_path, monkeypatch):
+    import cli
+    bars_path = tmp_path / 'bars.csv'
+    minute_bars(days=3).to_csv(bars_path)
+    outputs = {}
+    fvg_reads = []
+    read_csv = pd.read_csv
+
+    def spy_read_csv(path, *args, **kwargs):
+        if str(path).endswith('_fvgs.csv'):
+            fvg_reads.append(kwargs.get('usecols'))
+        return read_csv(path, *args, **kwargs)
+
+    for mode, extra in [('memory', []), ('chunked', ['--chunk-size', '300'])]:
+        run_dir = tmp_path / mode
+        run_dir.mkdir()
+        monkeypatch.chdir(run_dir)
+        monkeypatch.setattr(sys, 'argv', ['cli.py', '--ticker', 'TEST', '--input', str(bars_path),
+                                          '--timeframes', '15min', '1h'] + extra)
+        monkeypatch.setattr(pd, 'read_csv', spy_read_csv)
+        cli.main()
+        outputs[mode] = run_dir / 'fvgs_output'
+    # Chunked mode takes insights from a summary of the spilled store; only timestamps are read back.
+    assert fvg_reads == [['Timestamp'], ['Timestamp']]
+    for tf in ['15min', '1h']:
+        name = f'TEST_{tf}_fvgs.csv'
+        assert filecmp.cmp(outputs['memory'] / name, outputs['chunked'] / name, shallow=False)
+        insights = {}
+        for mode in outputs:
+            with open(outputs[mode] / f'TEST_{tf}_insights.json') as f:
+                insights[mode] = json.load(f)
+        # Means are summed per block in chunked mode, so only they may differ, in the last digits.
+        assert insights['chunked'] == {key: pytest.approx(value, rel=1e-12) if key.startswith('avg_') else value
+                                       for key, value in insights['memory'].items()}
@@ -0,0 +1,70 @@
+import time
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from concurrent_fetch import TokenBucket, jittered_backoff
+from download_data import download_data
+
+class FlakyFetcher:
+    """Local stand-in for yfinance that adds latency and fails the first attempt of some chunks."""
+    def __init__(self, latency=0.05, fail_every=3):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.attempts = {}
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def __call__(self, ticker, start, end, interval, auto_adjust):
+        with self.lock:
+            n = self.attempts[start] = self.attempts.get(start, 0) + 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.latency)
+            if n == 1 and start.toordinal() % self.fail_every == 0:
+                raise ConnectionError("transient")
+            idx = pd.date_range(start, end, freq='1h', inclusive='left')
+            return pd.DataFrame({'Open': 1.0, 'High': 2.0, 'Low': 0.5, 'Close': 1.5,
+                                 'Volume': np.arange(len(idx))}, index=idx)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+def window():
+    today = datetime.utcnow().date()
+    return (today - timedelta(days=28)).isoformat(), today.isoformat()
+
+def test_concurrent_matches_serial():
+    start, end = window()
+    serial = download_data('AAPL', start, end, pause=0, fetch=FlakyFetcher())
+    fetcher = FlakyFetcher()
+    concurrent = download_data('AAPL', start, end, pause=0, fetch=fetcher, max_workers=4)
+    pd.testing.assert_frame_equal(concurrent, serial)
+    assert fetcher.max_active > 1
+
+def test_concurrent_is_faster_than_serial():
+    start, end = window()
+    t0 = time.perf_counter()
+    download_data('AAPL', start, end, pause=0, fetch=FlakyFetcher(latency=0.1))
+    serial = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    download_data('AAPL', start, end, pause=0, fetch=FlakyFetcher(latency=0.1), max_workers=5)
+    assert time.perf_counter() - t0 < serial
+
+def test_token_bucket_limits_rate():
+    clock = [0.0]
+    sleeps = []
+    def sleep(dt):
+        sleeps.append(dt)
+        clock[0] += dt
+    bucket = TokenBucket(rate=2.0, capacity=1, clock=lambda: clock[0], sleep=sleep)
+    for _ in range(5):
+        bucket.acquire()
+    assert abs(clock[0] - 2.0) < 1e-9
+
+def test_jittered_backoff_bounds():
+    for attempt in range(1, 5):
+        delay = jittered_backoff(1.0, attempt)
+        assert 0.5 * 2 ** (attempt - 1) <= delay < 1.5 * 2 ** (attempt - 1)
@@ -0,0 +1,95 @@
+import itertools
+import pandas as pd
+import pytest
+from confluence import find_confluence, load_fvg_outputs, save_confluence
+from detect_fvg import detect_fvg, detect_fvg_columns
+from fvg_store import FVGStore
+from resample_data import resample_cascade, TIMEFRAME_NANOS
+from benchmark import synthetic_bars
+
+TIMEFRAMES = ['4h', '1h', '15min', '5min']
+
+def cascade_fvgs(bars):
+    cascade = resample_cascade(bars, TIMEFRAMES)
+    return {tf: detect_fvg(cascade[tf]) for tf in TIMEFRAMES}
+
+def alive(fvg_df, tf, as_of):
+    bar = pd.Timedelta(TIMEFRAME_NANOS[tf])
+    start = pd.to_datetime(fvg_df['Timestamp'], utc=True) + bar
+    end = pd.to_datetime(fvg_df['Fill_Time'], utc=True) + bar
+    return start, end.fillna(as_of)
+
+def brute_force(fvgs, max_ways):
+    # Every combination of one gap per timeframe, checked directly.
+    as_of = max(max(pd.to_datetime(f['Timestamp'], utc=True).max(), pd.to_datetime(f['Fill_Time'], utc=True).max())
+                + pd.Timedelta(TIMEFRAME_NANOS[tf]) for tf, f in fvgs.items())
+    gaps = []
+    for tf in TIMEFRAMES:
+        start, end = alive(fvgs[tf], tf, as_of)
+        gaps.append([(tf, k, start[k], end[k], fvgs[tf]['Gap_Low'][k], fvgs[tf]['Gap_High'][k])
+                     for k in range(len(fvgs[tf]))])
+    found = set()
+    for ways in range(2, max_ways + 1):
+        for tfs in itertools.combinations(range(len(TIMEFRAMES)), ways):
+            for members in itertools.product(*(gaps[t] for t in tfs)):
+                if max(m[2] for m in members) < min(m[3] for m in members) and \
+                        max(m[4] for m in members) < min(m[5] for m in members):
+                    found.add(('|'.join(m[0] for m in members), '|'.join(str(m[1]) for m in members)))
+    return found
+
+def test_matches_brute_force(random_walk_ohlcv):
+    fvgs = cascade_fvgs(random_walk_ohlcv(6000, 1))
+    result = find_confluence(fvgs, max_ways=3)
+    assert set(zip(result['Timeframes'], result['Gap_Rows'])) == brute_force(fvgs, 3)
+    assert len(result) == len(set(zip(result['Timeframes'], result['Gap_Rows'])))
+    assert result['Ways'].max() == 3
+    assert (result['Overlap_Size'] > 0).all()
+    assert (result['Lifetime'] > pd.Timedelta(0)).all()
+
+def test_overlap_and_lifetime_of_a_pair():
+    created = pd.Timestamp('2024-01-01 00:00')
+    coarse = pd.DataFrame({'Timestamp': [created], 'Type': ['Bullish'], 'Gap_Low': [10.0], 'Gap_High': [12.0],
+                           'Filled': [False], 'Fill_Time': [None]})
+    fine_times = [created + pd.Timedelta('5h'), created + pd.Timedelta('6h')]
+    fine = pd.DataFrame({'Timestamp': fine_times, 'Type': ['Bearish', 'Bullish'], 'Gap_Low': [11.0, 12.0],
+                         'Gap_High': [13.0, 14.0], 'Filled': [True, False],
+                         'Fill_Time': [fine_times[0] + pd.Timedelta('30min'), None]})
+    (row,) = find_confluence({'4h': coarse, '5min': fine}, as_of='2024-01-02').to_dict('records')
+    # The second fine gap only touches the coarse one at 12.0.
+    assert row['Timeframes'] == '4h|5min' and row['Gap_Rows'] == '0|0'
+    assert (row['Overlap_Low'], row['Overlap_High'], row['Overlap_Size']) == (11.0, 12.0, 1.0)
+    # Alive from the close of the creation bar to the close of the fill bar.
+    assert row['Start'] == fine_times[0] + pd.Timedelta('5min')
+    assert row['End'] == fine_times[0] + pd.Timedelta('35min')
+    assert row['Lifetime'] == pd.Timedelta('30min')
+    assert not row['Open'] and not row['Aligned']
+    (row,) = find_confluence({'4h': coarse, '5min': fine.assign(Gap_Low=[11.0, 11.5])}, as_of='2024-01-02') \
+        .query('Gap_Rows == "0|1"').to_dict('records')
+    assert row['Open'] and row['Aligned'] and row['End'] == pd.Timestamp('2024-01-02')
+
+def test_stores_and_csv_give_the_same_result(tmp_path):
+    bars = synthetic_bars(8000, tz='America/New_York', gap_rate=0.02)
+    cascade = resample_cascade(bars, TIMEFRAMES)
+    frames = {tf: detect_fvg(cascade[tf]) for tf in TIMEFRAMES}
+    expected = find_confluence(frames)
+    assert len(expected)
+    stores = {tf: FVGStore.create(str(tmp_path / tf), cascade[tf].index.tz).append(detect_fvg_columns(cascade[tf]))
+              for tf in TIMEFRAMES}
+    pd.testing.assert_frame_equal(find_confluence(stores), expected)
+    for tf, fvg_df in frames.items():
+        fvg_df.to_csv(tmp_path / f'SYN_{tf}_fvgs.csv', index=False)
+    from_csv = find_confluence(load_fvg_outputs('SYN', TIMEFRAMES, str(tmp_path)))
+    pd.testing.assert_frame_equal(from_csv, expected, check_dtype=False)
+
+def test_empty_inputs(random_walk_ohlcv):
+    fvgs = cascade_fvgs(random_walk_ohlcv(2000, 1))
+    assert find_confluence({}).empty
+    assert find_confluence({'1h': fvgs['1h'], '5min': pd.DataFrame()}).empty
+    with pytest.raises(ValueError):
+        find_confluence({'3min': fvgs['5min']})
+
+def test_cli_writes_confluence(run_cli):
+    output = run_cli(synthetic_bars(6000, gap_rate=0.02), '--timeframes', '1h', '15min', '5min', '--confluence',
+                     days=5)
+    written = pd.read_csv(output / 'SYN_confluence.csv')
+    assert len(written) == save_confluence('SYN', ['1h', '15min', '5min'], str(output)) > 0
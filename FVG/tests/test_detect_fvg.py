@@ -1,6 +1,7 @@
+import numpy as np
 import pandas as pd
 import pytest
-from detect_fvg import detect_fvg, analyze_fvgs
+from detect_fvg import detect_fvg, detect_fvg_reference, analyze_fvgs
 
 def synthetic_ohlcv():
     # Create synthetic OHLCV data with known FVGs
@@ -41,4 +42,19 @@ def test_analyze_fvgs():
     assert 'total_fvgs' in insights
     assert 'filled_fvgs' in insights
     assert 'fill_rate' in insights
-    assert 'avg_gap_size' in insights 
\ No newline at end of file
+    assert 'avg_gap_size' in insights 
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_detect_fvg_matches_reference(tz, random_walk_ohlcv):
+    df = random_walk_ohlcv(tz=tz)
+    pd.testing.assert_frame_equal(detect_fvg(df), detect_fvg_reference(df))
+
+def test_detect_fvg_matches_reference_all_unfilled():
+    df = synthetic_ohlcv()
+    df['High'] = df['High'] + np.arange(len(df)) * 3
+    df['Low'] = df['Low'] + np.arange(len(df)) * 3
+    pd.testing.assert_frame_equal(detect_fvg(df), detect_fvg_reference(df))
+
+def test_detect_fvg_short_frame():
+    df = synthetic_ohlcv().iloc[:2]
+    assert detect_fvg(df).empty
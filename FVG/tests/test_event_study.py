@@ -0,0 +1,82 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg
+from event_study import event_study, window_extremes, summarize_event_study
+from benchmark import synthetic_bars
+
+def brute_force(df, horizons):
+    # Per-gap slicing, as the vectorized version must reproduce.
+    rows = []
+    for row in detect_fvg(df).itertuples():
+        b = df.index.get_loc(row.Timestamp)
+        entry = df['Close'].iat[b]
+        bullish = row.Type == 'Bullish'
+        out = {}
+        for h in horizons:
+            if b + h >= len(df):
+                out.update({f'return_{h}': np.nan, f'mfe_{h}': np.nan, f'mae_{h}': np.nan, f'reached_{h}': pd.NA})
+                continue
+            window = df.iloc[b + 1:b + h + 1]
+            ret = df['Close'].iat[b + h] / entry - 1
+            hi, lo = window['High'].max(), window['Low'].min()
+            out[f'return_{h}'] = ret if bullish else -ret
+            out[f'mfe_{h}'] = hi / entry - 1 if bullish else 1 - lo / entry
+            out[f'mae_{h}'] = 1 - lo / entry if bullish else hi / entry - 1
+            out[f'reached_{h}'] = bool(lo <= row.Gap_High) if bullish else bool(hi >= row.Gap_Low)
+        rows.append(out)
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_event_study_matches_brute_force(tz, random_walk_ohlcv):
+    df = random_walk_ohlcv(500, 1, tz)
+    horizons = [1, 3, 7, 20, 600]
+    events = event_study(df, horizons)
+    fvg_df = detect_fvg(df)
+    pd.testing.assert_series_equal(events['Timestamp'], fvg_df['Timestamp'], check_names=False)
+    assert list(events['Type']) == list(fvg_df['Type'])
+    expected = brute_force(df, horizons)
+    for h in horizons:
+        for stat in ('return', 'mfe', 'mae'):
+            np.testing.assert_allclose(events[f'{stat}_{h}'], expected[f'{stat}_{h}'].astype(float), equal_nan=True)
+        assert list(events[f'reached_{h}'].astype(object).where(events[f'reached_{h}'].notna(), None)) == \
+            list(expected[f'reached_{h}'].astype(object).where(expected[f'reached_{h}'].notna(), None))
+
+def test_window_extremes():
+    values = np.random.default_rng(0).normal(size=300)
+    for reduce, ref in ((np.maximum, np.max), (np.minimum, np.min)):
+        result = window_extremes(values, [1, 2, 5, 64, 100, 300, 301], reduce)
+        for h in (1, 2, 5, 64, 100, 300):
+            expected = [ref(values[i:i + h]) for i in range(len(values) - h + 1)]
+            np.testing.assert_array_equal(result[h], expected)
+        assert len(result[301]) == 0
+
+def test_subset_of_gaps(random_walk_ohlcv):
+    df = random_walk_ohlcv(500, 2)
+    fvg_df = detect_fvg(df)
+    subset = fvg_df[fvg_df['Type'] == 'Bearish'].reset_index(drop=True)
+    events = event_study(df, [5], subset)
+    full = event_study(df, [5])
+    expected = full[full['Type'] == 'Bearish'].reset_index(drop=True)
+    pd.testing.assert_frame_equal(events, expected)
+    assert event_study(df, [5], fvg_df.iloc[:0]).empty
+    with pytest.raises(ValueError):
+        event_study(df, [0])
+
+def test_summary_is_json_ready():
+    events = event_study(synthetic_bars(5000), [1, 10])
+    summary = summarize_event_study(events)
+    assert summary['events_1b'] == summary['bullish_events_1b'] + summary['bearish_events_1b']
+    assert summary['events_10b'] <= summary['events_1b']
+    assert 0 <= summary['reach_prob_10b'] <= 1
+    assert summary['reach_prob_10b'] >= summary['reach_prob_1b']
+    assert summary['bearish_avg_return_1b'] is None
+    json.dumps(summary)
+
+def test_cli_adds_event_study_to_insights(run_cli):
+    output = run_cli(synthetic_bars(3000), '--timeframes', '5min', '--horizons', '1', '12')
+    with open(output / 'SYN_5min_insights.json') as f:
+        insights = json.load(f)
+    assert insights['total_fvgs'] > 0
+    assert insights['events_12b'] > 0 and 'reach_prob_1b' in insights
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from fill_resolution import build_min_tree, first_at_or_below, resolve_fills
+from detect_fvg import check_fvg_filled
+
+def brute_first_at_or_below(values, start, level):
+    for j in range(start, len(values)):
+        if values[j] <= level:
+            return j
+    return -1
+
+@pytest.mark.parametrize('n', [1, 2, 7, 64, 100])
+def test_first_at_or_below_matches_scan(n):
+    rng = np.random.default_rng(n)
+    values = rng.integers(0, 10, n).astype(float)
+    values[rng.random(n) < 0.1] = np.nan
+    start = rng.integers(0, n + 2, 200)
+    level = rng.integers(-1, 11, 200).astype(float)
+    got = first_at_or_below(build_min_tree(values), start, level)
+    expected = [brute_first_at_or_below(values, s, l) for s, l in zip(start, level)]
+    assert got.tolist() == expected
+
+def test_resolve_fills_matches_check_fvg_filled():
+    import pandas as pd
+    rng = np.random.default_rng(0)
+    n = 300
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    df = pd.DataFrame({'High': close + rng.random(n), 'Low': close - rng.random(n)},
+                      index=pd.date_range('2023-01-01', periods=n, freq='1min'))
+    bars = np.arange(2, n)
+    bullish = rng.random(len(bars)) < 0.5
+    gap_low = df['Low'].to_numpy()[bars] - rng.random(len(bars)) * 3
+    gap_high = df['High'].to_numpy()[bars] + rng.random(len(bars)) * 3
+    fill_idx = resolve_fills(df['High'].to_numpy(), df['Low'].to_numpy(), bars, gap_low, gap_high, bullish)
+    for k, i in enumerate(bars):
+        filled, fill_time = check_fvg_filled(df, i, gap_low[k], gap_high[k], bullish=bullish[k])
+        assert filled == (fill_idx[k] >= 0)
+        if filled:
+            assert df.index[fill_idx[k]] == fill_time
+
+def test_resolve_fills_empty():
+    assert len(resolve_fills(np.ones(5), np.ones(5), np.array([], dtype=int), np.array([]), np.array([]), np.array([], dtype=bool))) == 0
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from datetime import datetime, timedelta
+from fvg_daemon import DaemonClient, FVGDaemon, LRUCache, handlers
+from rpc import RPCError, serve_in_thread
+
+@pytest.fixture
+def write_bars(random_walk_ohlcv):
+    def write(path, n=3000, seed=0):
+        random_walk_ohlcv(n, seed).to_csv(path)
+        return str(path)
+
+    return write
+
+def test_lru_cache_evicts_least_recently_used_by_bytes():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    assert cache.get('a') == 'xxxx'
+    cache.put('c', 'xxxx')
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.nbytes == 8
+    cache.put('huge', 'x' * 11)
+    assert 'huge' not in cache and len(cache) == 2
+    cache.put('a', 'xxxxxx')
+    assert cache.nbytes == 10 and 'c' in cache
+    assert cache.stats()['evictions'] == 1
+
+def test_daemon_reuses_cached_frames(tmp_path, write_bars):
+    path = write_bars(tmp_path / 'bars.csv')
+    daemon = FVGDaemon(str(tmp_path / 'out'), cache_bytes=50_000_000)
+    first = daemon.run('X', ['1h', '15min', 'bogus'], input_path=path, outputs=['fvgs', 'insights'])
+    assert not first['cached_bars']
+    assert first['timeframes']['bogus'] == {'status': 'skipped'}
+    assert os.path.exists(tmp_path / 'out' / 'X_15min_fvgs.csv')
+    assert os.path.exists(tmp_path / 'out' / 'X_15min_insights.json')
+    assert not os.path.exists(tmp_path / 'out' / 'X_15min_fvg_plot.png')
+    second = daemon.run('X', ['15min', '1h'], input_path=path, outputs=['insights'])
+    assert second['cached_bars']
+    assert second['timeframes'] == {tf: first['timeframes'][tf] for tf in ('15min', '1h')}
+    # A new timeframe is resampled from the cached bars.
+    third = daemon.run('X', ['5min'], input_path=path, outputs=['insights'])
+    assert third['cached_bars'] and third['timeframes']['5min']['status'] == 'ok'
+    write_bars(path, n=2000, seed=1)
+    os.utime(path, ns=(1, 1))
+    assert not daemon.run('X', ['1h'], input_path=path, outputs=[])['cached_bars']
+
+def test_detection_only_jobs_do_not_import_matplotlib(tmp_path, write_bars):
+    path = write_bars(tmp_path / 'bars.csv', n=500)
+    code = (
+        "import sys\n"
+        "from fvg_daemon import FVGDaemon\n"
+        f"daemon = FVGDaemon({str(tmp_path / 'out')!r})\n"
+        f"daemon.run('X', ['5min'], input_path={path!r}, outputs=['fvgs', 'insights'])\n"
+        "assert not daemon.stats()['matplotlib_loaded']\n"
+        f"daemon.run('X', ['5min'], input_path={path!r}, outputs=['plots'])\n"
+        "assert daemon.stats()['matplotlib_loaded']\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', code], cwd=root, check=True)
+
+def test_daemon_refetches_ranges_reaching_today(tmp_path, random_walk_ohlcv):
+    calls = []
+
+    def download(ticker, start, end):
+        calls.append(end)
+        return random_walk_ohlcv(3000, seed=len(calls))
+
+    daemon = FVGDaemon(str(tmp_path / 'out'), download=download)
+    today = datetime.utcnow().date()
+    job = dict(start=(today - timedelta(days=5)).isoformat(), end=today.isoformat(), outputs=['insights'])
+    first = daemon.run('X', ['1h'], **job)
+    second = daemon.run('X', ['1h'], **job)
+    assert len(calls) == 2 and not second['cached_bars']
+    assert second['timeframes']['1h'] != first['timeframes']['1h']
+    assert len(daemon.cache) == 0
+    past = dict(job, end=(today - timedelta(days=2)).isoformat())
+    daemon.run('X', ['1h'], **past)
+    assert daemon.run('X', ['1h'], **past)['cached_bars'] and len(calls) == 3
+
+def test_client_submits_jobs(tmp_path, write_bars):
+    path = write_bars(tmp_path / 'bars.csv')
+    frames = []
+
+    def download(ticker, start, end):
+        frames.append(ticker)
+        return pd.read_csv(path, index_col=0, parse_dates=True)
+
+    daemon = FVGDaemon(str(tmp_path / 'out'), download=download)
+    server = serve_in_thread(handlers(daemon), f"unix:{tmp_path / 'daemon.sock'}")
+    try:
+        with DaemonClient(f"unix:{tmp_path / 'daemon.sock'}") as client:
+            result = client.run('X', ['1h'], start='2023-01-02', end='2023-01-05', outputs=['insights'])
+            assert result['timeframes']['1h']['status'] == 'ok'
+            assert client.run('X', ['1h'], start='2023-01-02', end='2023-01-05')['cached_bars']
+            assert frames == ['X']
+            assert client.stats()['jobs'] == 2
+            assert client.clear()['cache']['entries'] == 0
+            with pytest.raises(RPCError, match='ValueError'):
+                client.run('X', ['1h'], outputs=['insights'])
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,161 @@
+import socketserver
+import numpy as np
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg
+from fvg_index import FVGIndex, GapIndex, OPEN
+from fvg_server import FVGIndexClient, build_index, handlers
+from fvg_store import FVGStore, fvg_columns
+from resample_data import resample_cascade, TIMEFRAME_NANOS
+from rpc import RPCClient, RPCError, serve_in_thread
+
+TIMEFRAMES = ['1h', '15min', '5min']
+
+@pytest.fixture
+def cascade(random_walk_ohlcv):
+    def build(n=20_000, seed=3, tz='America/New_York'):
+        return resample_cascade(random_walk_ohlcv(n, seed, tz), TIMEFRAMES)
+
+    return build
+
+def brute_containing(fvg_df, tf, t, price):
+    bar = pd.Timedelta(TIMEFRAME_NANOS[tf])
+    start = fvg_df['Timestamp'] + bar
+    end = pd.to_datetime(fvg_df['Fill_Time']) + bar
+    alive = end.isna() if t is None else (start <= t) & (end.isna() | (t < end))
+    hit = alive & (fvg_df['Gap_Low'] <= price) & (price <= fvg_df['Gap_High'])
+    return np.flatnonzero(hit.to_numpy())
+
+def test_containing_matches_brute_force(cascade):
+    bars = cascade()
+    fvg_df = detect_fvg(bars['5min'])
+    index = GapIndex.from_frame('5min', fvg_df)
+    rng = np.random.default_rng(0)
+    times = bars['5min'].index[rng.integers(0, len(bars['5min']), 200)]
+    prices = rng.uniform(bars['5min']['Low'].min(), bars['5min']['High'].max(), 200)
+    for t, p in zip(list(times) + [None] * 20, np.concatenate([prices, prices[:20]])):
+        got = index.containing(OPEN if t is None else t.value, p)
+        np.testing.assert_array_equal(got, brute_containing(fvg_df, '5min', t, p))
+
+def test_nearest_matches_brute_force(cascade):
+    bars = cascade()
+    fvg_df = detect_fvg(bars['15min'])
+    index = FVGIndex()
+    index.load('X', '15min', fvg_df)
+    bar = pd.Timedelta(TIMEFRAME_NANOS['15min'])
+    rng = np.random.default_rng(1)
+    for t in [None] + list(bars['15min'].index[rng.integers(0, len(bars['15min']), 100)]):
+        p = float(bars['15min']['Close'].iloc[rng.integers(len(bars['15min']))])
+        start = fvg_df['Timestamp'] + bar
+        end = pd.to_datetime(fvg_df['Fill_Time']) + bar
+        alive = end.isna() if t is None else (start <= t) & (end.isna() | (t < end))
+        above = fvg_df[alive & (fvg_df['Gap_Low'] > p)]
+        below = fvg_df[alive & (fvg_df['Gap_High'] < p)]
+        got_above = index.nearest('X', p, 'above', t)
+        got_below = index.nearest('X', p, 'below', t)
+        assert (got_above is None) == above.empty
+        assert (got_below is None) == below.empty
+        if not above.empty:
+            assert got_above['gap_low'] == above['Gap_Low'].min()
+            assert got_above['distance'] == pytest.approx(above['Gap_Low'].min() - p)
+        if not below.empty:
+            assert got_below['gap_high'] == below['Gap_High'].max()
+
+def test_streaming_updates_match_bulk_load(cascade):
+    bars = cascade()
+    streamed = FVGIndex(min_rebuild=50, rebuild_fraction=0.1)
+    for tf in TIMEFRAMES:
+        for chunk in np.array_split(np.arange(len(bars[tf])), 37):
+            streamed.update('X', tf, bars[tf].iloc[chunk])
+    loaded = FVGIndex()
+    for tf in TIMEFRAMES:
+        loaded.load('X', tf, detect_fvg(bars[tf]))
+    assert streamed.stats() == loaded.stats()
+    rng = np.random.default_rng(2)
+    queries = []
+    for t in [None] + list(bars['5min'].index[rng.integers(0, len(bars['5min']), 50)]):
+        p = float(rng.uniform(bars['5min']['Low'].min(), bars['5min']['High'].max()))
+        queries += [{'op': 'containing', 'ticker': 'X', 'price': p, 'time': t},
+                    {'op': 'nearest', 'ticker': 'X', 'price': p, 'side': 'above', 'time': t},
+                    {'op': 'nearest', 'ticker': 'X', 'price': p, 'side': 'below', 'time': t, 'timeframes': ['1h']}]
+    assert streamed.query(queries) == loaded.query(queries)
+
+def test_updates_continue_loaded_history(cascade):
+    bars = cascade()
+    resumed, loaded = FVGIndex(min_rebuild=50, rebuild_fraction=0.1), FVGIndex()
+    split = {}
+    for k, tf in enumerate(TIMEFRAMES):
+        split[tf] = bars[tf].index[len(bars[tf]) // 2]
+        history, recent = bars[tf].loc[:split[tf]], bars[tf].loc[split[tf]:].iloc[1:]
+        if k % 2:
+            resumed.load('X', tf, detect_fvg(history))
+            resumed.update('X', tf, recent.iloc[:10], tail=history)
+        else:
+            resumed.load('X', tf, detect_fvg(history), tail=history)
+            resumed.update('X', tf, recent.iloc[:10])
+        for chunk in np.array_split(np.arange(10, len(recent)), 7):
+            resumed.update('X', tf, recent.iloc[chunk])
+        loaded.load('X', tf, detect_fvg(bars[tf]))
+    assert resumed.stats() == loaded.stats()
+    rng = np.random.default_rng(4)
+    queries = []
+    for t in [None] + list(bars['5min'].index[rng.integers(0, len(bars['5min']), 50)]):
+        p = float(rng.uniform(bars['5min']['Low'].min(), bars['5min']['High'].max()))
+        queries += [{'op': 'containing', 'ticker': 'X', 'price': p, 'time': t},
+                    {'op': 'nearest', 'ticker': 'X', 'price': p, 'side': 'above', 'time': t},
+                    {'op': 'nearest', 'ticker': 'X', 'price': p, 'side': 'below', 'time': t}]
+    results = resumed.query(queries)
+    assert results == loaded.query(queries)
+    stamps = [pd.Timestamp(gap['timestamp']) for gaps in results[::3] for gap in gaps]
+    assert min(stamps) < split['5min'] < max(stamps)
+
+def test_store_and_csv_load_like_frames(tmp_path, cascade):
+    bars = cascade(5000)
+    fvg_df = detect_fvg(bars['5min'])
+    store = FVGStore.create(str(tmp_path / 'X_5min_fvgs'), fvg_df['Timestamp'].dt.tz)
+    index = bars['5min'].index
+    fill_bar = np.where(fvg_df['Filled'], index.get_indexer(pd.to_datetime(fvg_df['Fill_Time'])), -1)
+    store.append(fvg_columns(index, index.get_indexer(fvg_df['Timestamp']), (fvg_df['Type'] == 'Bullish').to_numpy(),
+                             fvg_df['Gap_Low'].to_numpy(), fvg_df['Gap_High'].to_numpy(), fill_bar))
+    fvg_df.to_csv(tmp_path / 'X_15min_fvgs.csv', index=False)
+    detect_fvg(bars['15min']).to_csv(tmp_path / 'Y_15min_fvgs.csv', index=False)
+    index = build_index(str(tmp_path), tickers=['X'])
+    assert index.stats() == {'X': {'15min': len(fvg_df), '5min': len(fvg_df)}}
+    t = bars['5min'].index[len(bars['5min']) // 2]
+    price = float(bars['5min']['Close'].loc[t])
+    by_tf = {}
+    for gap in index.containing('X', price, t):
+        by_tf.setdefault(gap['timeframe'], []).append({k: v for k, v in gap.items() if k != 'timeframe'})
+    assert by_tf.get('5min') == by_tf.get('15min')
+
+def test_server_round_trip(tmp_path, cascade):
+    bars = cascade(5000)
+    index = FVGIndex()
+    index.load('X', '15min', detect_fvg(bars['15min']))
+    server = serve_in_thread(handlers(index), f"unix:{tmp_path / 'fvg.sock'}")
+    try:
+        with FVGIndexClient(f"unix:{tmp_path / 'fvg.sock'}") as client:
+            t = bars['15min'].index[100]
+            assert client.containing('X', 100.0, t.isoformat()) == index.containing('X', 100.0, t)
+            assert client.nearest('X', 100.0, 'below') == index.nearest('X', 100.0, 'below')
+            assert client.update('Y', '5min', bars['5min']) > 0
+            assert client.stats()['Y']['5min'] == len(detect_fvg(bars['5min']))
+            batch = [{'op': 'nearest', 'ticker': 'Y', 'price': 100.0}, {'ticker': 'Y', 'price': 100.0}]
+            assert client.query(batch) == index.query(batch)
+            with pytest.raises(RPCError, match='KeyError'):
+                client.containing('Z', 1.0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_tcp_server_leaves_stdlib_server_class_alone():
+    server = serve_in_thread({'echo': lambda value: value}, '127.0.0.1:0')
+    try:
+        host, port = server.server_address
+        with RPCClient(f"{host}:{port}", timeout=5) as client:
+            assert client.call('echo', value=[1, 'a']) == [1, 'a']
+        assert server.allow_reuse_address
+        assert not socketserver.ThreadingTCPServer.allow_reuse_address
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,71 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg, detect_fvg_columns, analyze_fvgs, analyze_fvgs_reference
+from fvg_stats import FVGStats, PERCENTILES
+from fvg_store import FVGStore
+
+def assert_matches_reference(insights, fvg_df):
+    expected = analyze_fvgs_reference(fvg_df.copy())
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert insights[key] == pytest.approx(value, rel=1e-12), key
+        else:
+            assert insights[key] == value, key
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_matches_reference_and_does_not_mutate(tz, random_walk_ohlcv):
+    fvg_df = detect_fvg(random_walk_ohlcv(5000, seed=1, tz=tz))
+    before = fvg_df.copy()
+    insights = analyze_fvgs(fvg_df)
+    pd.testing.assert_frame_equal(fvg_df, before)
+    assert_matches_reference(insights, fvg_df)
+
+def test_matches_reference_after_csv_roundtrip(random_walk_ohlcv):
+    fvg_df = detect_fvg(random_walk_ohlcv(5000, seed=2, tz='America/New_York'))
+    buf = io.StringIO()
+    fvg_df.to_csv(buf, index=False)
+    buf.seek(0)
+    loaded = pd.read_csv(buf)
+    assert_matches_reference(analyze_fvgs(loaded), loaded)
+
+def test_percentiles(random_walk_ohlcv):
+    fvg_df = detect_fvg(random_walk_ohlcv(5000, seed=3))
+    insights = analyze_fvgs(fvg_df)
+    sizes = fvg_df['Gap_High'] - fvg_df['Gap_Low']
+    bearish = fvg_df['Type'] == 'Bearish'
+    for q in PERCENTILES:
+        assert insights[f'gap_size_p{q}'] == pytest.approx(np.percentile(sizes, q))
+        assert insights[f'bearish_gap_size_p{q}'] == pytest.approx(np.percentile(sizes[bearish], q))
+    assert insights['time_to_fill_p50_min'] <= insights['time_to_fill_p90_min']
+
+def test_merge_equals_concatenation(random_walk_ohlcv):
+    frames = [detect_fvg(random_walk_ohlcv(3000, seed=s)) for s in range(4)]
+    merged = FVGStats.combine(FVGStats.from_frame(f) for f in frames).to_insights()
+    assert merged == analyze_fvgs(pd.concat(frames, ignore_index=True))
+
+def test_merge_with_empty_parts(random_walk_ohlcv):
+    fvg_df = detect_fvg(random_walk_ohlcv(2000, seed=5))
+    parts = [FVGStats(), FVGStats.from_frame(fvg_df), FVGStats.from_frame(pd.DataFrame())]
+    assert FVGStats.combine(parts).to_insights() == analyze_fvgs(fvg_df)
+    assert FVGStats().to_insights() == {'total_fvgs': 0}
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_summarized_store_matches_in_memory_stats(tmp_path, tz, random_walk_ohlcv):
+    cols = detect_fvg_columns(random_walk_ohlcv(20_000, seed=4, tz=tz))
+    cols['gap_high'][:40] = cols['gap_low'][:40] + 0.25  # ties across blocks
+    store = FVGStore.create(str(tmp_path / 'fvgs'), tz).append(cols)
+    summarized = FVGStats().summarize_store(store, rows=97)
+    in_memory = FVGStats.from_store(store)
+    assert summarized._sizes == [] and summarized._fill_minutes == []
+    expected = in_memory.to_insights()
+    for key, value in summarized.to_insights().items():
+        if key.startswith('avg_'):
+            assert value == pytest.approx(expected[key], rel=1e-12), key
+        else:
+            assert value == expected[key], key
+    for got, want in zip(summarized.fill_histogram(), in_memory.fill_histogram()):
+        np.testing.assert_array_equal(got, want)
+    with pytest.raises(ValueError, match='cannot be merged'):
+        in_memory.merge(summarized)
@@ -0,0 +1,109 @@
+import filecmp
+import numpy as np
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg, detect_fvg_columns
+from fvg_stats import FVGStats
+from fvg_store import FVGStore, COLUMNS, NAT, is_fvg_store
+from chunked_fvg import detect_fvg_chunked
+from visualize_fvg import plot_fvgs, plot_fvg_duration_histogram, plot_fvg_frequency_timeseries
+from benchmark import synthetic_bars
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_store_round_trips_detect_fvg(tmp_path, tz):
+    bars = synthetic_bars(5000, tz=tz)
+    store = FVGStore.create(str(tmp_path / 'store'), bars.index.tz).append(detect_fvg_columns(bars))
+    assert is_fvg_store(store.path)
+    reopened = FVGStore(store.path)
+    pd.testing.assert_frame_equal(reopened.to_frame(), detect_fvg(bars))
+    expected = tmp_path / 'expected.csv'
+    detect_fvg(bars).to_csv(expected, index=False)
+    reopened.to_csv(str(tmp_path / 'export.csv'), rows=7)
+    assert filecmp.cmp(expected, tmp_path / 'export.csv', shallow=False)
+
+def test_columns_are_typed_read_only_maps(tmp_path):
+    bars = synthetic_bars(3000)
+    store = FVGStore.create(str(tmp_path / 'store')).append(detect_fvg_columns(bars))
+    cols = store.columns()
+    assert {name: cols[name].dtype for name in COLUMNS} == COLUMNS
+    assert isinstance(cols['gap_low'], np.memmap)
+    with pytest.raises(ValueError):
+        cols['gap_low'][0] = 0.0
+    fvg_df = detect_fvg(bars)
+    assert (bars.index[cols['bar']] == pd.DatetimeIndex(fvg_df['Timestamp'])).all()
+    filled = cols['filled']
+    assert (bars.index[cols['fill_bar'][filled]] == pd.DatetimeIndex(fvg_df['Fill_Time'][filled])).all()
+    assert (cols['fill_bar'][~filled] == -1).all()
+
+def test_chunked_appends_and_fills(tmp_path):
+    bars = synthetic_bars(3000)
+    cols = detect_fvg_columns(bars)
+    store = FVGStore.create(str(tmp_path / 'store'))
+    unfilled = dict(cols, filled=np.zeros_like(cols['filled']), fill_time=np.full_like(cols['fill_time'], NAT),
+                    fill_bar=np.full_like(cols['fill_bar'], -1))
+    half = len(cols['timestamp']) // 2
+    store.append({k: v[:half] for k, v in unfilled.items()}).append({k: v[half:] for k, v in unfilled.items()})
+    rows = np.flatnonzero(cols['filled'])
+    store.set_fills(rows, cols['fill_time'][rows], cols['fill_bar'][rows])
+    pd.testing.assert_frame_equal(store.to_frame(), detect_fvg(bars))
+    with pytest.raises(ValueError):
+        store.append(dict(cols, gap_low=cols['gap_low'][:1]))
+
+def test_failed_append_leaves_columns_aligned(tmp_path):
+    bars = synthetic_bars(3000)
+    cols = detect_fvg_columns(bars)
+    half = len(cols['timestamp']) // 2
+    store = FVGStore.create(str(tmp_path / 'store')).append({k: v[:half] for k, v in cols.items()})
+    with pytest.raises(ValueError):
+        store.append(dict({k: v[half:] for k, v in cols.items()}, fill_bar=cols['fill_bar'][:1]))
+    assert all((tmp_path / 'store' / f'{name}.bin').stat().st_size == half * dtype.itemsize
+               for name, dtype in COLUMNS.items())
+    # A crash mid-append leaves bytes past the committed rows in some files.
+    with open(tmp_path / 'store' / 'gap_low.bin', 'ab') as f:
+        f.write(b'\0' * 24)
+    FVGStore(store.path).append({k: v[half:] for k, v in cols.items()})
+    pd.testing.assert_frame_equal(FVGStore(store.path).to_frame(), detect_fvg(bars))
+
+def test_empty_store(tmp_path):
+    store = FVGStore.create(str(tmp_path / 'store'))
+    assert len(store) == 0
+    assert store.to_frame().empty
+    assert FVGStats.from_store(store).to_insights() == FVGStats().to_insights()
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_detect_fvg_chunked_writes_a_store(tmp_path, tz):
+    bars = synthetic_bars(5000, tz=tz)
+    chunks = (bars.iloc[i:i + 333] for i in range(0, len(bars), 333))
+    path = str(tmp_path / 'store')
+    count = detect_fvg_chunked(chunks, path, output_format='store')
+    store = FVGStore(path)
+    assert count == len(store)
+    expected = detect_fvg_columns(bars)
+    for name, values in store.columns().items():
+        np.testing.assert_array_equal(values, expected[name])
+    with pytest.raises(ValueError):
+        detect_fvg_chunked([], path, output_format='parquet')
+
+def test_stats_and_plots_read_the_store(tmp_path):
+    bars = synthetic_bars(5000, tz='America/New_York')
+    store = FVGStore.create(str(tmp_path / 'store'), bars.index.tz).append(detect_fvg_columns(bars))
+    assert FVGStats.from_store(store).to_insights() == FVGStats.from_frame(detect_fvg(bars)).to_insights()
+    plot_fvgs(bars, store, '1min', str(tmp_path / 'plot.png'))
+    plot_fvg_duration_histogram(store, str(tmp_path / 'hist.png'))
+    plot_fvg_frequency_timeseries(store, str(tmp_path / 'freq.png'))
+    assert {p.name for p in tmp_path.glob('*.png')} == {'plot.png', 'hist.png', 'freq.png'}
+
+def test_cli_store_format_matches_csv(tmp_path, run_cli):
+    import json
+    bars = synthetic_bars(3000)
+    insights = {}
+    for fmt in ('csv', 'store'):
+        workdir = tmp_path / fmt
+        workdir.mkdir()
+        output = run_cli(bars, '--timeframes', '15min', '--format', fmt, workdir=workdir)
+        with open(output / 'SYN_15min_insights.json') as f:
+            insights[fmt] = json.load(f)
+    assert insights['store'] == insights['csv']
+    store = FVGStore(str(tmp_path / 'store' / 'fvgs_output' / 'SYN_15min_fvgs'))
+    store.to_csv(str(tmp_path / 'export.csv'))
+    assert filecmp.cmp(tmp_path / 'export.csv', tmp_path / 'csv' / 'fvgs_output' / 'SYN_15min_fvgs.csv', shallow=False)
@@ -0,0 +1,69 @@
+import json
+import os
+import pytest
+from metrics import Metrics, span, prometheus_text
+from benchmark import synthetic_bars
+
+def test_span_records_timings_and_counts():
+    metrics = Metrics()
+    with metrics.span('detect', ticker='AAPL', timeframe='1h') as record:
+        record['rows'], record['fvgs'] = 100, 7
+    (r,) = metrics.records
+    assert r['stage'] == 'detect'
+    assert r['labels'] == {'ticker': 'AAPL', 'timeframe': '1h'}
+    assert r['status'] == 'ok'
+    assert r['wall_seconds'] >= 0 and r['cpu_seconds'] >= 0
+    assert r['rows'] == 100 and r['fvgs'] == 7
+
+def test_span_records_errors():
+    metrics = Metrics()
+    with pytest.raises(KeyError):
+        with metrics.span('download', ticker='X'):
+            raise KeyError('boom')
+    assert metrics.records[0]['status'] == 'error'
+
+def test_span_without_metrics_is_a_noop():
+    with span(None, 'detect') as record:
+        record['rows'] = 1
+
+def test_prometheus_text_aggregates_by_labels():
+    records = [
+        {'stage': 'detect', 'labels': {'ticker': 'A"B'}, 'status': 'ok', 'wall_seconds': 1.0,
+         'cpu_seconds': 0.5, 'peak_rss_bytes': 100, 'rows': 10, 'fvgs': 2},
+        {'stage': 'detect', 'labels': {'ticker': 'A"B'}, 'status': 'error', 'wall_seconds': 2.0,
+         'cpu_seconds': 0.5, 'peak_rss_bytes': 300, 'rows': 5},
+    ]
+    text = prometheus_text(records)
+    assert '# TYPE fvg_stage_wall_seconds counter' in text
+    assert '# TYPE fvg_stage_calls counter' in text
+    assert '# TYPE fvg_stage_peak_rss_bytes gauge' in text
+    assert 'fvg_stage_wall_seconds{stage="detect",ticker="A\\"B"} 3.0' in text
+    assert 'fvg_stage_calls{stage="detect",ticker="A\\"B"} 2' in text
+    assert 'fvg_stage_errors{stage="detect",ticker="A\\"B"} 1' in text
+    assert 'fvg_stage_peak_rss_bytes{stage="detect",ticker="A\\"B"} 300' in text
+    assert 'fvg_stage_rows{stage="detect",ticker="A\\"B"} 15' in text
+
+def test_profile_stage_dumps_profiles(tmp_path):
+    metrics = Metrics(profile_stage='detect', profile_dir=str(tmp_path))
+    with metrics.span('detect', ticker='AAPL', timeframe='1h'):
+        sum(range(1000))
+    with metrics.span('plot_fvgs', ticker='AAPL', timeframe='1h'):
+        pass
+    assert sorted(os.listdir(tmp_path)) == ['profile_detect_AAPL_1h.prof', 'profile_detect_AAPL_1h_tracemalloc.txt']
+
+@pytest.mark.parametrize('suffix', ['json', 'prom'])
+def test_cli_writes_metrics(tmp_path, run_cli, suffix):
+    path = str(tmp_path / f'metrics.{suffix}')
+    run_cli(synthetic_bars(3000), '--timeframes', '1h', '--metrics', path)
+    with open(path) as f:
+        content = f.read()
+    if suffix == 'json':
+        spans = json.loads(content)['spans']
+        stages = {s['stage'] for s in spans}
+        assert {'download', 'download_request', 'download_pause', 'resample', 'detect', 'plot_fvgs',
+                'analyze', 'save_insights'} <= stages
+        detect = next(s for s in spans if s['stage'] == 'detect')
+        assert detect['labels'] == {'ticker': 'SYN', 'timeframe': '1h'}
+        assert detect['rows'] == 51
+    else:
+        assert 'fvg_stage_wall_seconds{stage="detect",ticker="SYN",timeframe="1h"}' in content
@@ -1 +1,58 @@
- 
\ No newline at end of file
+import numpy as np
+import pandas as pd
+import pytest
+from resample_data import (
+    resample_data, resample_data_reference, resample_cascade, update_resampled, SUPPORTED_TIMEFRAMES
+)
+
+def minute_bars(tz=None, days=10, start='2024-03-06', seed=0):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(start, periods=days * 24 * 60, freq='min', tz=tz)
+    idx = idx[(idx.hour >= 9) & (idx.hour < 16)]
+    close = 100 + np.cumsum(rng.normal(0, 0.1, len(idx)))
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.05, len(idx)),
+        'High': close + 0.2,
+        'Low': close - 0.2,
+        'Close': close,
+        'Volume': rng.integers(1, 1000, len(idx)),
+    }, index=idx)
+
+# America/New_York crosses the March DST change inside the sample.
+@pytest.mark.parametrize('tz', [None, 'UTC', 'America/New_York'])
+@pytest.mark.parametrize('tf', list(SUPPORTED_TIMEFRAMES))
+def test_matches_reference(tz, tf):
+    df = minute_bars(tz)
+    pd.testing.assert_frame_equal(resample_data(df, tf), resample_data_reference(df, tf), check_freq=False)
+
+def test_matches_reference_with_pinned_origin():
+    df = minute_bars('America/New_York')
+    origin = df.index[0].normalize()
+    part = df.iloc[777:]
+    for tf in SUPPORTED_TIMEFRAMES:
+        pd.testing.assert_frame_equal(resample_data(part, tf, origin=origin),
+                                      resample_data_reference(part, tf, origin=origin), check_freq=False)
+
+def test_nan_rows_fall_back_to_reference():
+    df = minute_bars()
+    df.iloc[10:20, df.columns.get_loc('High')] = np.nan
+    pd.testing.assert_frame_equal(resample_data(df, '1h'), resample_data_reference(df, '1h'), check_freq=False)
+
+def test_unsupported_timeframe():
+    with pytest.raises(ValueError):
+        resample_data(minute_bars(days=1), '3min')
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_cascade_matches_direct(tz):
+    df = minute_bars(tz)
+    cascade = resample_cascade(df, ['1D', '4h', '15min', '5min', '1h'])
+    assert list(cascade) == ['1D', '4h', '15min', '5min', '1h']
+    for tf, resampled in cascade.items():
+        pd.testing.assert_frame_equal(resampled, resample_data_reference(df, tf), check_freq=False)
+
+@pytest.mark.parametrize('cut', [1000, 1001, 2345])
+def test_update_resampled_matches_full(cut):
+    df = minute_bars('America/New_York')
+    for tf in SUPPORTED_TIMEFRAMES:
+        updated = update_resampled(resample_data(df.iloc[:cut], tf), df.iloc[cut:], tf)
+        pd.testing.assert_frame_equal(updated, resample_data_reference(df, tf), check_freq=False)
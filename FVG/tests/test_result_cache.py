@@ -0,0 +1,99 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from cli import process_timeframe
+from detect_fvg import detect_fvg, detect_fvg_columns
+from resample_data import resample_cascade
+from result_cache import (ResultCache, cached_detect_fvg, cached_detect_fvg_columns, cached_render, cached_resample_cascade, digest_frame,
+                          last_day_start)
+
+TIMEFRAMES = ['1D', '1h', '15min']
+
+def revise_last_day(bars, seed=9):
+    # Change the last day's bars and append another day, as a daily refresh would.
+    rng = np.random.default_rng(seed)
+    revised = bars.copy()
+    split = last_day_start(bars.index)
+    revised.iloc[split:, :4] += rng.normal(0, 0.5, (len(bars) - split, 1))
+    revised['High'] = revised[['Open', 'High', 'Low', 'Close']].max(axis=1)
+    revised['Low'] = revised[['Open', 'High', 'Low', 'Close']].min(axis=1)
+    return revised
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_cached_resample_matches_and_reuses_the_prefix(tmp_path, tz, random_walk_ohlcv):
+    cache = ResultCache(str(tmp_path))
+    bars = random_walk_ohlcv(6000, 4, tz)
+    first = cached_resample_cascade(cache, bars, TIMEFRAMES)
+    for tf, expected in resample_cascade(bars, TIMEFRAMES).items():
+        pd.testing.assert_frame_equal(first[tf], expected)
+    hits = cache.hits
+    again = cached_resample_cascade(cache, bars, TIMEFRAMES)
+    assert cache.hits == hits + 1
+    pd.testing.assert_frame_equal(again['1h'], first['1h'])
+    revised = revise_last_day(bars)
+    updated = cached_resample_cascade(cache, revised, TIMEFRAMES)
+    assert cache.hits == hits + 2  # the bars before the last day
+    for tf, expected in resample_cascade(revised, TIMEFRAMES).items():
+        pd.testing.assert_frame_equal(updated[tf], expected)
+
+def test_cached_detect_fvg_matches_and_extends_the_prefix(tmp_path, random_walk_ohlcv):
+    cache = ResultCache(str(tmp_path))
+    bars = resample_cascade(random_walk_ohlcv(8000, 5, 'UTC'), ['5min'])['5min']
+    pd.testing.assert_frame_equal(cached_detect_fvg(cache, bars), detect_fvg(bars))
+    hits = cache.hits
+    pd.testing.assert_frame_equal(cached_detect_fvg(cache, bars), detect_fvg(bars))
+    revised = revise_last_day(bars)
+    pd.testing.assert_frame_equal(cached_detect_fvg(cache, revised), detect_fvg(revised))
+    assert cache.hits == hits + 2
+    for name, values in detect_fvg_columns(revised).items():
+        np.testing.assert_array_equal(cached_detect_fvg_columns(cache, revised)[name], values)
+
+def test_digest_depends_on_values_index_and_dtypes(random_walk_ohlcv):
+    bars = random_walk_ohlcv(100)
+    assert digest_frame(bars) == digest_frame(bars.copy())
+    changed = bars.copy()
+    changed.iloc[50, 1] += 1e-9
+    assert digest_frame(changed) != digest_frame(bars)
+    assert digest_frame(bars.tz_localize('UTC')) != digest_frame(bars)
+    assert digest_frame(bars.astype({'Volume': 'float64'})) != digest_frame(bars)
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=2500)
+    for key in ('a', 'b'):
+        cache.put(key, b'x' * 1000)
+        time.sleep(0.01)
+    assert cache.get('a') is not None  # refreshes a
+    time.sleep(0.01)
+    cache.put('c', b'x' * 1000)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert ResultCache(str(tmp_path), max_bytes=2500).stats()['bytes'] <= 2500
+
+def test_cached_render_copies_unchanged_plots(tmp_path, random_walk_ohlcv):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    calls = []
+
+    def render(df, title, path):
+        calls.append(title)
+        with open(path, 'w') as f:
+            f.write(f"{title} {len(df)}")
+
+    bars = random_walk_ohlcv(100)
+    cached_render(cache, render, str(tmp_path / 'a.txt'), [bars], 'x')
+    cached_render(cache, render, str(tmp_path / 'b.txt'), [bars], 'x')
+    cached_render(cache, render, str(tmp_path / 'c.txt'), [bars], 'y')
+    assert calls == ['x', 'y']
+    assert open(tmp_path / 'b.txt').read() == 'x 100'
+
+def test_process_timeframe_with_cache_matches(tmp_path, random_walk_ohlcv):
+    bars = random_walk_ohlcv(3000, 6)
+    plain = process_timeframe(bars, 'X', '15min', str(tmp_path), outputs=['fvgs', 'insights']).to_insights()
+    cache = ResultCache(str(tmp_path / 'cache'))
+    for _ in range(2):
+        cached = process_timeframe(bars, 'X', '15min', str(tmp_path), outputs=['fvgs', 'plots', 'insights'],
+                                   cache=cache).to_insights()
+        assert cached == plain
+        assert os.path.exists(tmp_path / 'X_15min_fvg_plot.png')
+    assert cache.hits >= 5
@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg
+from stream_fvg import StreamingFVGDetector
+
+@pytest.mark.parametrize('batch', [1, 2, 3, 50])
+def test_stream_matches_batch(batch, random_walk_ohlcv):
+    df = random_walk_ohlcv(n=400)
+    detector = StreamingFVGDetector()
+    for start in range(0, len(df), batch):
+        detector.update(df.iloc[start:start + batch])
+    pd.testing.assert_frame_equal(detector.to_frame(), detect_fvg(df))
+
+def test_stream_update_bar_events(random_walk_ohlcv):
+    df = random_walk_ohlcv(n=200, seed=1)
+    detector = StreamingFVGDetector()
+    events = []
+    for ts, row in df.iterrows():
+        new = detector.update_bar(ts, row['High'], row['Low'])
+        assert all(e['Bar'] == detector.bars_seen - 1 for e in new)
+        events += new
+    expected = detect_fvg(df)
+    assert sum(e['Event'] == 'created' for e in events) == len(expected)
+    assert sum(e['Event'] == 'filled' for e in events) == expected['Filled'].sum()
+    assert len(detector.open_gaps()) == (~expected['Filled']).sum()
+
+def test_stream_without_history(random_walk_ohlcv):
+    detector = StreamingFVGDetector(keep_history=False)
+    detector.update(random_walk_ohlcv(n=50))
+    with pytest.raises(ValueError):
+        detector.to_frame()
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from detect_fvg import detect_fvg, analyze_fvgs
+from sweep_fvg import sweep_fvg, average_true_range, main
+from benchmark import synthetic_bars
+
+def assert_insights_equal(row, expected):
+    expected = dict(expected)
+    expected.pop('largest_fvg', None)
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert row[key] == pytest.approx(value), key
+        else:
+            assert row[key] == value, key
+
+def brute_force_fills(df, fraction):
+    # Row-by-row: first bar after creation reaching `fraction` of the way through the gap.
+    fvg_df = detect_fvg(df)
+    bars = df.index.get_indexer(pd.DatetimeIndex(fvg_df['Timestamp']))
+    result = []
+    for bar, row in zip(bars, fvg_df.itertuples()):
+        size = row.Gap_High - row.Gap_Low
+        fill = -1
+        for j in range(bar + 1, len(df)):
+            if row.Type == 'Bullish' and df['Low'].iat[j] <= row.Gap_High - fraction * size:
+                fill = j
+                break
+            if row.Type == 'Bearish' and df['High'].iat[j] >= row.Gap_Low + fraction * size:
+                fill = j
+                break
+        result.append(fill)
+    return bars, np.array(result)
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_default_configuration_matches_analyze_fvgs(tz, random_walk_ohlcv):
+    df = random_walk_ohlcv(3000, 2, tz)
+    (row,) = sweep_fvg(df).to_dict('records')
+    assert row['size_filter'] == 'abs' and row['fill'] == 'full' and pd.isna(row['expiry_bars'])
+    assert_insights_equal(row, analyze_fvgs(detect_fvg(df)))
+
+def test_size_filters_match_filtering_detected_gaps(random_walk_ohlcv):
+    df = random_walk_ohlcv(3000, 3)
+    fvg_df = detect_fvg(df)
+    size = fvg_df['Gap_High'] - fvg_df['Gap_Low']
+    first = df.index.get_indexer(pd.DatetimeIndex(fvg_df['Timestamp'])) - 2
+    atr = pd.Series(np.maximum(df['High'], df['Close'].shift().fillna(df['Close'].iloc[0]))
+                    - np.minimum(df['Low'], df['Close'].shift().fillna(df['Close'].iloc[0])))
+    atr.iloc[0] = df['High'].iloc[0] - df['Low'].iloc[0]
+    atr = atr.rolling(14, min_periods=1).mean().to_numpy()[first]
+    pct = size.to_numpy() / df['Close'].to_numpy()[first] * 100
+    table = sweep_fvg(df, [('abs', 0.1), ('atr', 0.5), ('pct', 0.1)])
+    for row, keep in zip(table.to_dict('records'), [size >= 0.1, size.to_numpy() / atr >= 0.5, pct >= 0.1]):
+        assert 0 < keep.sum() < len(fvg_df)
+        assert_insights_equal(row, analyze_fvgs(fvg_df[np.asarray(keep)].reset_index(drop=True)))
+
+@pytest.mark.parametrize('fill, fraction', [('touch', 0.0), ('midpoint', 0.5), (0.25, 0.25), ('full', 1.0)])
+def test_fill_definitions_match_brute_force(fill, fraction, random_walk_ohlcv):
+    df = random_walk_ohlcv(400, 4)
+    bars, fills = brute_force_fills(df, fraction)
+    (row,) = sweep_fvg(df, fills=[fill]).to_dict('records')
+    assert row['filled_fvgs'] == (fills >= 0).sum()
+    minutes = (df.index[fills[fills >= 0]] - df.index[bars[fills >= 0]]).total_seconds().to_numpy() / 60
+    assert row['avg_time_to_fill_min'] == pytest.approx(minutes.mean())
+
+def test_expiry_counts_only_fills_within_the_window(random_walk_ohlcv):
+    df = random_walk_ohlcv(400, 5)
+    bars, fills = brute_force_fills(df, 1.0)
+    table = sweep_fvg(df, fills=['full'], expiries=[None, 0, 1, 10])
+    assert list(table['expiry_bars'].astype('object').where(table['expiry_bars'].notna(), None)) == [None, 0, 1, 10]
+    for row in table.to_dict('records')[1:]:
+        assert row['filled_fvgs'] == ((fills >= 0) & (fills - bars <= row['expiry_bars'])).sum()
+        assert row['total_fvgs'] == len(bars)
+
+def test_grid_is_tidy():
+    table = sweep_fvg(synthetic_bars(3000), [('abs', 0.0), ('atr', 1.0)], ['touch', 'full'], [None, 20])
+    assert len(table) == 8
+    assert table[['size_filter', 'min_size', 'fill', 'expiry_bars']].drop_duplicates().shape[0] == 8
+    assert (table.groupby('size_filter')['total_fvgs'].nunique() == 1).all()
+    touch = table[table['fill'] == 'touch']['filled_fvgs'].to_numpy()
+    full = table[table['fill'] == 'full']['filled_fvgs'].to_numpy()
+    assert (touch >= full).all()
+
+def test_invalid_configurations_raise(random_walk_ohlcv):
+    df = random_walk_ohlcv(100, 6)
+    with pytest.raises(ValueError):
+        sweep_fvg(df, fills=['halfway'])
+    with pytest.raises(ValueError):
+        sweep_fvg(df, fills=[1.5])
+    with pytest.raises(ValueError):
+        sweep_fvg(df, [('volume', 1.0)])
+
+def test_short_input_has_no_gaps(random_walk_ohlcv):
+    table = sweep_fvg(random_walk_ohlcv(2, 7), fills=['touch', 'full'])
+    assert list(table['total_fvgs']) == [0, 0]
+
+def test_average_true_range():
+    high, low, close = np.array([2.0, 3.0, 5.0]), np.array([1.0, 2.0, 4.0]), np.array([1.5, 2.5, 4.5])
+    np.testing.assert_allclose(average_true_range(high, low, close, 2), [1.0, 1.25, 2.0])
+
+def test_main_writes_the_table(tmp_path):
+    bars_path = tmp_path / 'bars.csv'
+    synthetic_bars(3000).to_csv(bars_path)
+    out = tmp_path / 'sweep.csv'
+    assert main(['--input', str(bars_path), '--timeframe', '15min', '--size-filters', 'abs:0', 'pct:0.5',
+                 '--fills', 'touch', '0.5', '--expiries', 'none', '10', '--output', str(out)]) == 0
+    assert len(pd.read_csv(out)) == 8
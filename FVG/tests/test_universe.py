@@ -0,0 +1,117 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import universe
+from multiprocessing import shared_memory
+from metrics import Metrics, prometheus_text
+from universe import read_ticker_file, share_bars, attach_bars, run_universe
+
+def minute_bars(seed=0, n=3000, tz='America/New_York'):
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range('2024-03-04 09:30', periods=n, freq='1min', tz=tz)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    return pd.DataFrame({'Open': close, 'High': close + rng.random(n) * 0.2, 'Low': close - rng.random(n) * 0.2,
+                         'Close': close, 'Volume': rng.integers(100, 1000, n)}, index=idx)
+
+def test_read_ticker_file(tmp_path):
+    path = tmp_path / 'tickers.txt'
+    path.write_text("AAPL\n\n# comment\nMSFT  # inline\nAAPL\n")
+    assert read_ticker_file(str(path)) == ['AAPL', 'MSFT']
+
+@pytest.mark.parametrize('tz', [None, 'America/New_York'])
+def test_share_and_attach_roundtrip(tz):
+    df = minute_bars(tz=tz)
+    shm, spec = share_bars(df)
+    try:
+        block, attached = attach_bars(spec)
+        pd.testing.assert_frame_equal(attached, df, check_freq=False)
+        # Columns and index are views of the block, not private copies.
+        assert all(np.shares_memory(attached[c].to_numpy(), np.asarray(block.buf)) for c in attached.columns)
+        assert np.shares_memory(attached.index.asi8, np.asarray(block.buf))
+        assert not attached['Close'].to_numpy().flags.writeable
+        del attached
+        block.close()
+    finally:
+        shm.close()
+        shm.unlink()
+
+def fake_download(ticker):
+    if ticker == 'BROKEN':
+        raise ConnectionError('no route')
+    if ticker == 'EMPTY':
+        return pd.DataFrame()
+    return minute_bars(seed=len(ticker))
+
+def test_run_universe_isolates_failures(tmp_path):
+    summary = run_universe(['AAPL', 'BROKEN', 'MSFT', 'EMPTY'], ['1h', '15min'], str(tmp_path), fake_download, workers=2)
+    assert summary['ok'] == 4
+    assert summary['errors'] == 1
+    assert summary['empty'] == 1
+    assert os.path.exists(tmp_path / 'AAPL_15min_fvgs.csv')
+    with open(tmp_path / 'universe_summary.json') as f:
+        assert json.load(f)['jobs'] == 6
+
+@pytest.fixture
+def shared_blocks(monkeypatch):
+    # Names of the blocks run_universe creates, and of those it has released so far.
+    blocks = {'created': [], 'live': set(), 'peak': 0}
+    share, release = universe.share_bars, universe._release
+
+    def tracked_share(df):
+        shm, spec = share(df)
+        blocks['created'].append(shm.name)
+        blocks['live'].add(shm.name)
+        blocks['peak'] = max(blocks['peak'], len(blocks['live']))
+        return shm, spec
+
+    def tracked_release(shm):
+        blocks['live'].discard(shm.name)
+        release(shm)
+
+    monkeypatch.setattr(universe, 'share_bars', tracked_share)
+    monkeypatch.setattr(universe, '_release', tracked_release)
+    return blocks
+
+def test_run_universe_limits_tickers_in_flight(tmp_path, shared_blocks):
+    tickers = ['A', 'BB', 'CCC', 'DDDD', 'EEEEE']
+    summary = run_universe(tickers, ['1h'], str(tmp_path), fake_download, workers=2, max_tickers=2)
+    assert summary['ok'] == len(tickers)
+    assert len(shared_blocks['created']) == len(tickers)
+    assert shared_blocks['peak'] == 2 and not shared_blocks['live']
+
+def test_run_universe_releases_blocks_when_interrupted(tmp_path, shared_blocks):
+    def interrupted_download(ticker):
+        if ticker == 'STOP':
+            raise KeyboardInterrupt
+        return fake_download(ticker)
+
+    with pytest.raises(KeyboardInterrupt):
+        run_universe(['AAPL', 'MSFT', 'STOP'], ['1h', '15min'], str(tmp_path), interrupted_download, workers=2)
+    assert len(shared_blocks['created']) == 2 and not shared_blocks['live']
+    for name in shared_blocks['created']:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+def test_run_universe_pools_insights(tmp_path):
+    summary = run_universe(['AAPL', 'MSFT'], ['1h', '15min'], str(tmp_path), fake_download, workers=2)
+    assert summary['insights']['total_fvgs'] == summary['total_fvgs']
+    assert summary['total_fvgs'] == sum(r['total_fvgs'] for r in summary['results'])
+    assert 'gap_size_p50' in summary['insights']
+
+def test_run_universe_merges_worker_spans(tmp_path):
+    metrics = Metrics()
+    summary = run_universe(['AAPL', 'MSFT'], ['1h', '15min'], str(tmp_path), fake_download, workers=2, metrics=metrics)
+    assert all('spans' not in r for r in summary['results'])
+    jobs = {(r['labels']['ticker'], r['labels']['timeframe']) for r in metrics.records if r['stage'] == 'job'}
+    assert jobs == {(t, tf) for t in ('AAPL', 'MSFT') for tf in ('1h', '15min')}
+    detect = [r for r in metrics.records if r['stage'] == 'detect']
+    assert len(detect) == 4 and sum(r['fvgs'] for r in detect) == summary['total_fvgs']
+    assert 'fvg_stage_calls{stage="detect",ticker="AAPL",timeframe="1h"} 1' in prometheus_text(metrics.records)
+
+def test_run_universe_finds_confluence(tmp_path):
+    summary = run_universe(['AAPL', 'BROKEN'], ['1h', '15min', '5min'], str(tmp_path), fake_download, workers=2,
+                           confluence=True)
+    assert list(summary['confluences']) == ['AAPL']
+    assert len(pd.read_csv(tmp_path / 'AAPL_confluence.csv')) == summary['confluences']['AAPL']
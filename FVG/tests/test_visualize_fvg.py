@@ -1,6 +1,9 @@
+import numpy as np
 import pandas as pd
+import pytest
 import os
-from visualize_fvg import plot_fvgs
+from visualize_fvg import plot_fvgs, decimate_minmax
+from detect_fvg import detect_fvg
 
 def synthetic_ohlcv():
     data = [
@@ -23,4 +26,23 @@ def test_plot_fvgs(tmp_path):
     fvg_df = synthetic_fvg()
     output_path = tmp_path / "fvg_plot.png"
     plot_fvgs(df, fvg_df, '1h', str(output_path))
-    assert os.path.exists(output_path) 
\ No newline at end of file
+    assert os.path.exists(output_path) 
+
+def test_decimate_minmax_keeps_extremes():
+    rng = np.random.default_rng(0)
+    x = np.arange(100_000, dtype=float)
+    y = np.cumsum(rng.normal(size=len(x)))
+    keep = decimate_minmax(x, y, 500)
+    assert len(keep) <= 2 * 500 + 2
+    assert np.all(np.diff(keep) > 0)
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert y.argmax() in keep and y.argmin() in keep
+    assert len(decimate_minmax(x[:10], y[:10], 500)) == 10
+
+@pytest.mark.parametrize('max_gaps', [0, 100_000])
+def test_plot_fvgs_many_gaps(tmp_path, max_gaps, random_walk_ohlcv):
+    df = random_walk_ohlcv(20_000, seed=1, tz='America/New_York')
+    fvg_df = detect_fvg(df)
+    output_path = tmp_path / "fvg_plot.png"
+    plot_fvgs(df, fvg_df, '1min', str(output_path), max_gaps=max_gaps)
+    assert os.path.exists(output_path)
@@ -0,0 +1,224 @@
+import os
+import time
+import logging
+import numpy as np
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+from results import save_universe_summary
+from fvg_stats import FVGStats
+from metrics import Metrics, span
+
+def read_ticker_file(path: str) -> List[str]:
+    """
+    Read one ticker per line, ignoring blank lines, '#' comments and duplicates.
+    """
+    tickers = []
+    with open(path) as f:
+        for line in f:
+            ticker = line.split('#', 1)[0].strip()
+            if ticker and ticker not in tickers:
+                tickers.append(ticker)
+    return tickers
+
+def share_bars(df: pd.DataFrame) -> Tuple[shared_memory.SharedMemory, Dict]:
+    """
+    Copy the bar index and columns into one shared-memory block.
+    Returns the block (the caller owns it and must unlink it) and a small picklable spec
+    that workers pass to attach_bars.
+    """
+    arrays = [('__index__', df.index.as_unit('ns').asi8)] + [(str(c), df[c].to_numpy()) for c in df.columns]
+    layout, offset = [], 0
+    for name, values in arrays:
+        offset = -(-offset // 8) * 8
+        layout.append((name, values.dtype.str, offset))
+        offset += values.nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for (name, dtype, start), (_, values) in zip(layout, arrays):
+        np.ndarray(len(values), dtype=dtype, buffer=shm.buf, offset=start)[:] = values
+    tz = str(df.index.tz) if df.index.tz is not None else None
+    return shm, {'name': shm.name, 'rows': len(df), 'tz': tz, 'layout': layout}
+
+def attach_bars(spec: Dict) -> Tuple[shared_memory.SharedMemory, pd.DataFrame]:
+    """
+    The bar DataFrame described by spec, as read-only views of the shared block (no copy).
+    Returns the attached block too: drop every reference to the frame, then close it.
+    """
+    # Pool workers share the parent's resource tracker, so attaching here does not
+    # hand ownership of the block away from the parent.
+    shm = shared_memory.SharedMemory(name=spec['name'])
+    views = {}
+    for name, dtype, start in spec['layout']:
+        views[name] = np.ndarray(spec['rows'], dtype=dtype, buffer=shm.buf, offset=start)
+        views[name].flags.writeable = False
+    index = pd.DatetimeIndex(views.pop('__index__').view('datetime64[ns]'))
+    if spec['tz'] is not None:
+        # The block holds UTC nanoseconds, which is what a tz-aware index stores; view, not convert.
+        index = pd.DatetimeIndex(index.array.view(pd.DatetimeTZDtype(tz=spec['tz'])), copy=False)
+    return shm, pd.DataFrame(views, index=index, copy=False)
+
+def run_job(spec: Dict, ticker: str, tf: str, output_dir: str, output_format: str = 'csv',
+            horizons: Optional[List[int]] = None, outputs: Optional[List[str]] = None, result_cache=None,
+            metrics_options: Optional[Dict] = None) -> Dict:
+    """
+    Worker entry point: process one (ticker, timeframe) job on shared bars.
+    Failures are returned as a result record instead of raised.
+    With metrics_options (Metrics keyword arguments), the job's stage spans are recorded in
+    this process and returned under 'spans' for the parent to merge.
+    """
+    from cli import process_timeframe, OUTPUTS
+    metrics = Metrics(**metrics_options) if metrics_options is not None else None
+    started = time.perf_counter()
+    shm = None
+    try:
+        with span(metrics, 'job', ticker=ticker, timeframe=tf):
+            with span(metrics, 'attach_bars', ticker=ticker, timeframe=tf) as record:
+                shm, df = attach_bars(spec)
+                record['rows'] = len(df)
+            stats = process_timeframe(df, ticker, tf, output_dir, metrics=metrics, output_format=output_format,
+                                      horizons=horizons, outputs=OUTPUTS if outputs is None else outputs,
+                                      cache=result_cache)
+        status = 'ok' if stats is not None else 'empty'
+        result = {'status': status, 'stats': stats}
+    except Exception as ex:
+        logging.exception(f"Job {ticker} {tf} failed")
+        result = {'status': 'error', 'error': f"{type(ex).__name__}: {ex}"}
+    finally:
+        # The frame's columns are views of the block, which cannot close while they exist.
+        df = None
+        if shm is not None:
+            shm.close()
+    result.update({'ticker': ticker, 'timeframe': tf, 'seconds': time.perf_counter() - started})
+    if metrics is not None:
+        result['spans'] = metrics.records
+    return result
+
+def run_universe(
+    tickers: List[str],
+    timeframes: List[str],
+    output_dir: str,
+    download: Callable,
+    workers: int = None,
+    output_format: str = 'csv',
+    horizons: Optional[List[int]] = None,
+    confluence: bool = False,
+    max_ways: Optional[int] = None,
+    outputs: Optional[List[str]] = None,
+    result_cache=None,
+    metrics: Optional[Metrics] = None,
+    max_tickers: Optional[int] = None
+) -> Dict:
+    """
+    Download each ticker in this process, share its bars, and fan its (ticker, timeframe)
+    jobs out to a process pool while the next ticker downloads. At most max_tickers tickers
+    (default: enough to keep every worker busy, plus the one downloading) have bars in
+    shared memory at once; the next download waits for one to finish. A failing ticker or
+    job is recorded in the summary and does not stop the others. Writes universe_summary.json.
+    With confluence, each ticker's multi-timeframe confluences are found on the pool as soon
+    as its last timeframe is done. outputs and result_cache (a result_cache.ResultCache the
+    workers share) are passed on to cli.process_timeframe. With metrics, the workers record
+    their jobs' stage spans and these are merged into metrics as the jobs complete.
+    Shared blocks are released even when a download or the pool fails or is interrupted.
+    """
+    from resample_data import SUPPORTED_TIMEFRAMES
+    from confluence import save_confluence
+    timeframes = [tf for tf in timeframes if tf in SUPPORTED_TIMEFRAMES]
+    metrics_options = None
+    if metrics is not None:
+        metrics_options = {'profile_stage': metrics.profile_stage, 'profile_dir': metrics.profile_dir}
+    if max_tickers is None:
+        max_tickers = -(-(workers or os.cpu_count() or 1) // max(len(timeframes), 1)) + 1
+    results, blocks, pending, futures = [], {}, {}, {}
+    confluence_futures, confluences = {}, {}
+    started = time.perf_counter()
+
+    def collect(future):
+        ticker, tf = futures.pop(future)
+        try:
+            result = future.result()
+            spans = result.pop('spans', [])
+            if metrics is not None:
+                metrics.extend(spans)
+            results.append(result)
+        except Exception as ex:
+            # The worker process itself died (e.g. BrokenProcessPool).
+            results.append({'ticker': ticker, 'timeframe': tf, 'status': 'error', 'error': repr(ex)})
+        pending[ticker] -= 1
+        if pending[ticker] == 0:
+            _release(blocks.pop(ticker))
+            if confluence:
+                confluence_futures[pool.submit(save_confluence, ticker, timeframes, output_dir, max_ways)] = ticker
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for ticker in tickers:
+                while len(blocks) >= max_tickers:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+                try:
+                    df = download(ticker)
+                except Exception as ex:
+                    logging.error(f"Download failed for {ticker}: {ex}")
+                    results.append({'ticker': ticker, 'timeframe': None, 'status': 'error', 'error': f"download: {ex}"})
+                    continue
+                if df.empty:
+                    results.append({'ticker': ticker, 'timeframe': None, 'status': 'empty'})
+                    continue
+                with span(metrics, 'share_bars', ticker=ticker) as record:
+                    shm, spec = share_bars(df)
+                    record['rows'] = len(df)
+                blocks[ticker], pending[ticker] = shm, len(timeframes)
+                for tf in timeframes:
+                    future = pool.submit(run_job, spec, ticker, tf, output_dir, output_format, horizons, outputs,
+                                         result_cache, metrics_options)
+                    futures[future] = (ticker, tf)
+            for future in as_completed(list(futures)):
+                collect(future)
+            for future in as_completed(confluence_futures):
+                ticker = confluence_futures[future]
+                try:
+                    confluences[ticker] = future.result()
+                except Exception as ex:
+                    logging.error(f"Confluence failed for {ticker}: {ex}")
+                    confluences[ticker] = f"error: {type(ex).__name__}: {ex}"
+    finally:
+        for shm in blocks.values():
+            _release(shm)
+    summary = summarize_universe(results, time.perf_counter() - started)
+    summary['confluences'] = dict(sorted(confluences.items()))
+    save_universe_summary(summary, output_dir)
+    return summary
+
+def _release(shm: shared_memory.SharedMemory):
+    shm.close()
+    shm.unlink()
+
+def summarize_universe(results: List[Dict], seconds: float) -> Dict:
+    """
+    Aggregate per-job results into one summary. The jobs' FVG statistics are merged
+    (in ticker, timeframe order) into pooled insights over every gap in the universe.
+    """
+    ok = sorted((r for r in results if r['status'] == 'ok'), key=lambda r: (r['ticker'], r['timeframe']))
+    pooled = FVGStats.combine(r['stats'] for r in ok)
+    total_fvgs, filled = pooled.total, pooled.filled
+    return {
+        'jobs': len(results),
+        'ok': len(ok),
+        'empty': sum(r['status'] == 'empty' for r in results),
+        'errors': sum(r['status'] == 'error' for r in results),
+        'total_fvgs': total_fvgs,
+        'filled_fvgs': filled,
+        'fill_rate': filled / total_fvgs if total_fvgs else 0,
+        'wall_seconds': seconds,
+        'job_seconds': sum(r.get('seconds', 0) for r in results),
+        'insights': pooled.to_insights(),
+        'results': sorted((_job_record(r) for r in results), key=lambda r: (r['ticker'], r['timeframe'] or '')),
+    }
+
+def _job_record(result: Dict) -> Dict:
+    record = {k: v for k, v in result.items() if k != 'stats'}
+    if result['status'] == 'ok':
+        record['total_fvgs'] = result['stats'].total
+    return record
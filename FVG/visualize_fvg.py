@@ -1,44 +1,190 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.collections import PolyCollection
 import logging
+from typing import Union
+from fvg_store import FVGStore, TYPE_CODES, is_fvg_store
+from fvg_stats import FVGStats
 
-def plot_fvgs(df: pd.DataFrame, fvg_df: pd.DataFrame, timeframe: str, output_path: str):
+FVG_COLORS = {'Bullish': (0.0, 0.5, 0.0), 'Bearish': (1.0, 0.0, 0.0)}
+FILLED_ALPHA = 0.1
+UNFILLED_ALPHA = 0.3
+
+def plot_fvgs(
+    df: pd.DataFrame,
+    fvg_df: Union[pd.DataFrame, FVGStore],
+    timeframe: str,
+    output_path: str,
+    max_points: int = 2000,
+    max_gaps: int = 1000
+):
     """
     Plot price data and overlay FVGs (bullish/bearish, filled/unfilled).
-    Save the plot as a PNG to output_path.
+    Save the plot as a PNG to output_path. fvg_df may also be an FVGStore, whose
+    columns are then read from the memory maps without building a DataFrame.
+
+    Each gap is a rectangle from its creation to its Fill_Time (or the end of the chart).
+    Up to max_gaps of them are drawn as one PolyCollection; beyond that (matplotlib still
+    builds one Path per polygon) they are composited into a single image at pixel resolution.
+    The Close series is reduced to the min and max of at most max_points time buckets.
+    Together this keeps render time and memory roughly constant as the number of bars grows.
     """
-    plt.figure(figsize=(16, 8))
-    plt.plot(df.index, df['Close'], label='Close', color='black', linewidth=1)
-    # Plot FVGs
-    for _, row in fvg_df.iterrows():
-        color = 'green' if row['Type'] == 'Bullish' else 'red'
-        alpha = 0.3 if not row['Filled'] else 0.1
-        plt.axhspan(row['Gap_Low'], row['Gap_High'], xmin=0, xmax=1, color=color, alpha=alpha)
-    plt.title(f'FVGs on {timeframe} Chart')
-    plt.xlabel('Time')
-    plt.ylabel('Price')
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close()
+    fig, ax = plt.subplots(figsize=(16, 8))
+    x = _date_nums(df.index)
+    close = df['Close'].to_numpy(dtype=np.float64)
+    keep = decimate_minmax(x, close, max_points)
+    ax.plot(x[keep], close[keep], label='Close', color='black', linewidth=1, zorder=2)
+    if len(fvg_df):
+        boxes = _fvg_boxes(fvg_df, x[-1])
+        start, end, low, high = boxes[:4]
+        ax.update_datalim([[start.min(), low.min()], [end.max(), high.max()]])
+        ax.autoscale_view()
+        if len(start) <= max_gaps:
+            gaps = ax.add_collection(_fvg_collection(*boxes), autolim=False)
+            gaps.set_in_layout(False)
+        else:
+            bounds = (x[0], x[-1], min(low.min(), close.min()), max(high.max(), close.max()))
+            box = ax.get_window_extent()
+            _draw_fvg_raster(ax, boxes, bounds, width=max(int(box.width), 1), height=max(int(box.height), 1))
+    ax.xaxis_date(tz=df.index.tz)
+    ax.set_title(f'FVGs on {timeframe} Chart')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Price')
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(output_path)
+    plt.close(fig)
     logging.info(f"Saved FVG plot to {output_path}")
 
-def plot_fvg_duration_histogram(fvg_df: pd.DataFrame, output_path: str):
+def decimate_minmax(x: np.ndarray, y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    Indices of the points to draw: the first and last point plus the lowest and highest
+    point of each of `buckets` equal-width slices of x, in order. Peaks and troughs survive,
+    unlike with plain striding. x must be sorted.
+    """
+    n = len(x)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    span = max(x[-1] - x[0], np.finfo(np.float64).tiny)
+    bucket = np.minimum(((x - x[0]) / span * buckets).astype(np.int64), buckets - 1)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(bucket)) + 1])
+    keep = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extreme = np.repeat(reduce.reduceat(y, starts), np.diff(np.append(starts, n)))
+        hits = np.flatnonzero(y == extreme)
+        # First hit in each bucket.
+        keep.append(hits[np.concatenate([[True], bucket[hits[1:]] != bucket[hits[:-1]]])])
+    return np.unique(np.concatenate(keep))
+
+def _date_nums(values) -> np.ndarray:
+    # Matplotlib date numbers of the UTC instants; the axis formatter shows them in the bars' timezone.
+    stamps = pd.DatetimeIndex(pd.to_datetime(values, utc=True)).tz_localize(None)
+    return mdates.date2num(stamps.to_numpy())
+
+def _fvg_boxes(fvg_df: Union[pd.DataFrame, FVGStore], chart_end: float) -> tuple:
+    if isinstance(fvg_df, FVGStore):
+        return _store_boxes(fvg_df.columns(), chart_end)
+    start = _date_nums(fvg_df['Timestamp'])
+    filled = fvg_df['Filled'].to_numpy(dtype=bool)
+    end = np.full(len(start), max(chart_end, start.max()))
+    if filled.any():
+        end[filled] = _date_nums(fvg_df['Fill_Time'][filled])
+    low = fvg_df['Gap_Low'].to_numpy(dtype=np.float64)
+    high = fvg_df['Gap_High'].to_numpy(dtype=np.float64)
+    bullish = (fvg_df['Type'] == 'Bullish').to_numpy()
+    return start, end, low, high, bullish, filled
+
+def _store_boxes(cols: dict, chart_end: float) -> tuple:
+    # Epoch ns are UTC instants for tz-aware stores, matching _date_nums.
+    start = mdates.date2num(np.asarray(cols['timestamp']).view('datetime64[ns]'))
+    filled = np.asarray(cols['filled'])
+    end = np.full(len(start), max(chart_end, start.max()))
+    if filled.any():
+        end[filled] = mdates.date2num(np.asarray(cols['fill_time'])[filled].view('datetime64[ns]'))
+    bullish = np.asarray(cols['type']) == TYPE_CODES['Bullish']
+    return start, end, np.asarray(cols['gap_low']), np.asarray(cols['gap_high']), bullish, filled
+
+def _fvg_collection(start, end, low, high, bullish, filled) -> PolyCollection:
+    verts = np.stack([np.column_stack(corner) for corner in
+                      ((start, low), (start, high), (end, high), (end, low))], axis=1)
+    rgba = np.empty((len(start), 4))
+    rgba[:, :3] = np.where(bullish[:, None], FVG_COLORS['Bullish'], FVG_COLORS['Bearish'])
+    rgba[:, 3] = np.where(filled, FILLED_ALPHA, UNFILLED_ALPHA)
+    return PolyCollection(verts, facecolors=rgba, edgecolors='none', zorder=1)
+
+def _draw_fvg_raster(ax, boxes: tuple, bounds: tuple, width: int, height: int):
+    """
+    Draw the gap rectangles as one RGBA image of width x height cells over bounds
+    (x0, x1, y0, y1). Per style, overlap counts come from a 2-D difference array, and
+    n overlapping rectangles of opacity a get 1 - (1 - a)**n, as alpha blending would give.
+    """
+    start, end, low, high, bullish, filled = boxes
+    x0, x1, y0, y1 = bounds
+    if x1 <= x0:
+        x1 = x0 + 1
+    if y1 <= y0:
+        y1 = y0 + 1
+    c0 = np.clip(np.floor((start - x0) / (x1 - x0) * width), 0, width - 1).astype(np.int64)
+    c1 = np.clip(np.ceil((end - x0) / (x1 - x0) * width), c0 + 1, width).astype(np.int64)
+    r0 = np.clip(np.floor((low - y0) / (y1 - y0) * height), 0, height - 1).astype(np.int64)
+    r1 = np.clip(np.ceil((high - y0) / (y1 - y0) * height), r0 + 1, height).astype(np.int64)
+    color = np.zeros((height, width, 3), dtype=np.float32)
+    alpha = np.zeros((height, width), dtype=np.float32)
+    # Filled gaps first, so the stronger unfilled ones are composited on top.
+    for is_filled, opacity in ((True, FILLED_ALPHA), (False, UNFILLED_ALPHA)):
+        for is_bullish, rgb in ((False, FVG_COLORS['Bearish']), (True, FVG_COLORS['Bullish'])):
+            sel = (filled == is_filled) & (bullish == is_bullish)
+            if not sel.any():
+                continue
+            diff = np.zeros((height + 1) * (width + 1), dtype=np.int32)
+            for rows, cols, sign in ((r0, c0, 1), (r0, c1, -1), (r1, c0, -1), (r1, c1, 1)):
+                np.add.at(diff, rows[sel] * (width + 1) + cols[sel], sign)
+            count = diff.reshape(height + 1, width + 1).cumsum(axis=0).cumsum(axis=1)[:height, :width]
+            layer = 1 - np.float32(1 - opacity) ** count.astype(np.float32)
+            color *= 1 - layer[..., None]
+            color += layer[..., None] * np.asarray(rgb, dtype=np.float32)
+            alpha *= 1 - layer
+            alpha += layer
+    # color holds premultiplied values.
+    rgba = np.dstack([color / np.maximum(alpha, 1e-12)[..., None], alpha])
+    ax.imshow(rgba, extent=(x0, x1, y0, y1), origin='lower', aspect='auto', interpolation='nearest', zorder=1)
+
+def plot_fvg_duration_histogram(fvg_df: Union[pd.DataFrame, FVGStore, FVGStats], output_path: str):
     """
     Plot a histogram of FVG fill durations (in minutes) for filled FVGs.
+    fvg_df may also be an FVGStore, or the FVGStats accumulated over the gaps.
     """
-    if fvg_df.empty or 'Filled' not in fvg_df.columns:
+    hist_kwargs = {'bins': 30}
+    if isinstance(fvg_df, FVGStats):
+        if not fvg_df.total:
+            logging.warning("No FVGs to plot duration histogram.")
+            return
+        histogram = fvg_df.fill_histogram(hist_kwargs['bins'])
+        if histogram is None:
+            logging.warning("No filled FVGs to plot duration histogram.")
+            return
+        # Bars drawn from the binned counts, identical to hist() over the durations themselves.
+        counts, edges = histogram
+        durations, hist_kwargs = pd.Series(edges[:-1]), {'bins': edges, 'weights': counts}
+    elif not len(fvg_df) or not isinstance(fvg_df, FVGStore) and 'Filled' not in fvg_df.columns:
         logging.warning("No FVGs to plot duration histogram.")
         return
-    filled = fvg_df[fvg_df['Filled']]
-    if filled.empty:
+    elif isinstance(fvg_df, FVGStore):
+        cols = fvg_df.columns()
+        filled = np.asarray(cols['filled'])
+        durations = pd.Series((np.asarray(cols['fill_time'])[filled] - np.asarray(cols['timestamp'])[filled]) / 6e10)
+    else:
+        filled = fvg_df[fvg_df['Filled']]
+        durations = (
+            pd.to_datetime(filled['Fill_Time']) - pd.to_datetime(filled['Timestamp'])
+        ).dt.total_seconds() / 60
+    if durations.empty:
         logging.warning("No filled FVGs to plot duration histogram.")
         return
-    durations = (
-        pd.to_datetime(filled['Fill_Time']) - pd.to_datetime(filled['Timestamp'])
-    ).dt.total_seconds() / 60
     plt.figure(figsize=(10, 6))
-    plt.hist(durations.dropna(), bins=30, color='blue', alpha=0.7)
+    plt.hist(durations.dropna(), color='blue', alpha=0.7, **hist_kwargs)
     plt.title('Histogram of FVG Fill Durations (minutes)')
     plt.xlabel('Minutes to Fill')
     plt.ylabel('Number of FVGs')
@@ -47,10 +193,13 @@ def plot_fvg_duration_histogram(fvg_df: pd.DataFrame, output_path: str):
     plt.close()
     logging.info(f"Saved FVG duration histogram to {output_path}")
 
-def plot_fvg_frequency_timeseries(fvg_df: pd.DataFrame, output_path: str, freq: str = 'W'):
+def plot_fvg_frequency_timeseries(fvg_df: Union[pd.DataFrame, FVGStore], output_path: str, freq: str = 'W'):
     """
     Plot a time series (bar chart) of FVG frequency per period (default: week).
+    fvg_df may also be an FVGStore, of which only the timestamp column is read.
     """
+    if isinstance(fvg_df, FVGStore):
+        fvg_df = pd.DataFrame({'Timestamp': fvg_df.timestamps()}) if len(fvg_df) else pd.DataFrame()
     if fvg_df.empty or 'Timestamp' not in fvg_df.columns:
         logging.warning("No FVGs to plot frequency timeseries.")
         return
@@ -71,7 +220,8 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     if len(sys.argv) > 2:
         df = pd.read_csv(sys.argv[1], index_col=0, parse_dates=True)
-        fvg_df = pd.read_csv(sys.argv[2])
+        # argv[2] is an FVG CSV or an FVGStore directory (cli --format store).
+        fvg_df = FVGStore(sys.argv[2]) if is_fvg_store(sys.argv[2]) else pd.read_csv(sys.argv[2])
         plot_fvgs(df, fvg_df, '1h', 'fvg_plot.png')
         plot_fvg_duration_histogram(fvg_df, 'fvg_duration_hist.png')
         plot_fvg_frequency_timeseries(fvg_df, 'fvg_frequency_timeseries.png') 
\ No newline at end of file
@@ -0,0 +1,345 @@
+"""
+Run the notebook's extract_details over a whole CSV column of complaints, for several models at once.
+
+extract_details made one blocking chat completion call per complaint and model. Here requests
+run concurrently under asyncio, capped by a semaphore and paced by a requests-per-minute
+limiter, with retries on rate limits and server errors. Every response is cached in a local
+SQLite file keyed by (model, system prompt, input), so re-runs, and evaluate.py, cost nothing.
+
+The client is swappable: OpenAIClient uses the openai package, HTTPClient speaks the same
+/chat/completions protocol with the standard library, and serve_stub starts a local
+OpenAI-compatible stub server to measure throughput and caching offline.
+
+    python batch_inference.py "Customer Complaints.csv" --models gpt-4 ft:gpt-3.5-turbo:... --output responses.jsonl
+    python batch_inference.py --serve-stub 8000
+    python batch_inference.py "Customer Complaints.csv" --models stub --base-url http://127.0.0.1:8000/v1
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+
+SYSTEM_PROMPT = """
+        Given a customer complaint text, extract and return the following information in JSON (dict) format:
+        - Topic
+        - Problem
+        - Customer_Dissatisfaction_Index
+    """
+
+DEFAULT_CACHE = "responses.sqlite"
+DEFAULT_CONCURRENCY = 8
+RETRIES = 4
+BACKOFF_SECONDS = 0.5
+RETRY_STATUSES = (408, 409, 429, 500, 502, 503, 504)
+
+
+class RetryableError(Exception):
+    """A request that failed in a way worth retrying (rate limit, timeout, server error)."""
+
+
+def cache_key(model, system, user):
+    return hashlib.sha256(json.dumps([model, system, user], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Responses on disk in one SQLite file, keyed by cache_key(model, system, user).
+    Each row keeps the request, the answer, the latency of the call that produced it and the
+    token usage, so recorded runs can be re-scored offline (see evaluate.py).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, model TEXT, system TEXT, user TEXT, "
+            "output TEXT, latency_s REAL, usage TEXT, created REAL)"
+        )
+        self._db.commit()
+
+    def get(self, model, system, user):
+        with self._lock:
+            row = self._db.execute("SELECT output, latency_s, usage FROM responses WHERE key = ?",
+                                   (cache_key(model, system, user),)).fetchone()
+        if row is None:
+            return None
+        return {"output": row[0], "latency_s": row[1], "usage": json.loads(row[2]) if row[2] else None}
+
+    def put(self, model, system, user, output, latency_s, usage=None):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (cache_key(model, system, user), model, system, user, output, latency_s,
+                              json.dumps(usage) if usage else None, time.time()))
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class RateLimiter:
+    """Async token bucket: at most `per_minute` acquisitions per minute, with bursts of up to `burst`."""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HTTPClient:
+    """
+    Minimal OpenAI-compatible chat completions client on urllib, run in worker threads.
+    Works against api.openai.com and against serve_stub or any compatible local server.
+    The latency is timed inside the worker, so it never includes waiting for a free thread.
+    """
+
+    def __init__(self, base_url="https://api.openai.com/v1", api_key=None, timeout=60):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.timeout = timeout
+
+    async def complete(self, model, messages, executor=None):
+        return await asyncio.get_running_loop().run_in_executor(executor, self._post, model, messages)
+
+    def _post(self, model, messages):
+        body = json.dumps({"model": model, "messages": messages}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        if self.api_key:
+            request.add_header("Authorization", f"Bearer {self.api_key}")
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                reply = json.load(response)
+        except urllib.error.HTTPError as ex:
+            if ex.code in RETRY_STATUSES:
+                raise RetryableError(f"HTTP {ex.code}") from ex
+            raise
+        except (urllib.error.URLError, TimeoutError) as ex:
+            raise RetryableError(str(ex)) from ex
+        return reply["choices"][0]["message"]["content"], reply.get("usage"), time.perf_counter() - started
+
+
+class OpenAIClient:
+    """The openai package's AsyncOpenAI client behind the same complete() interface."""
+
+    def __init__(self, api_key=None, base_url=None):
+        import openai
+        self._openai = openai
+        self._client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url)
+
+    async def complete(self, model, messages, executor=None):
+        started = time.perf_counter()
+        try:
+            response = await self._client.chat.completions.create(model=model, messages=messages)
+        except (self._openai.RateLimitError, self._openai.APITimeoutError,
+                self._openai.APIConnectionError, self._openai.InternalServerError) as ex:
+            raise RetryableError(str(ex)) from ex
+        usage = response.usage.model_dump() if response.usage is not None else None
+        return response.choices[0].message.content, usage, time.perf_counter() - started
+
+
+async def run_batch(inputs, models, client, cache=None, system=SYSTEM_PROMPT, concurrency=DEFAULT_CONCURRENCY,
+                    requests_per_minute=None, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """
+    Ask every model about every input (the notebook's extract_details, batched).
+
+    Returns one record per (model, input) in model-major order: model, row, input, output,
+    latency_s (of the call that produced the answer), cached, and error (None on success).
+    Cached answers are returned without a request; identical inputs are requested once.
+    At most `concurrency` requests are in flight and, with requests_per_minute, they are
+    paced by a token bucket. Retryable failures are retried up to `retries` times, backing
+    off exponentially from `backoff` seconds with jitter.
+
+    client.complete(model, messages, executor) returns (output, usage, latency_s); blocking
+    clients run on `executor`, a thread pool of `concurrency` workers owned by this call.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch_inference")
+    limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+    pending = {}
+
+    async def ask(model, user):
+        if cache is not None:
+            hit = cache.get(model, system, user)
+            if hit is not None:
+                return {"output": hit["output"], "latency_s": hit["latency_s"], "cached": True, "error": None}
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        async with semaphore:
+            for attempt in range(retries + 1):
+                if limiter is not None:
+                    await limiter.acquire()
+                try:
+                    output, usage, latency = await client.complete(model, messages, executor)
+                except RetryableError as ex:
+                    if attempt == retries:
+                        return {"output": None, "latency_s": None, "cached": False, "error": str(ex)}
+                    await asyncio.sleep(min(30.0, backoff * 2 ** attempt) * random.uniform(0.5, 1.0))
+                    continue
+                except Exception as ex:
+                    return {"output": None, "latency_s": None, "cached": False, "error": f"{type(ex).__name__}: {ex}"}
+                break
+        if cache is not None:
+            cache.put(model, system, user, output, latency, usage)
+        return {"output": output, "latency_s": latency, "cached": False, "error": None}
+
+    for model in models:
+        for user in inputs:
+            if (model, user) not in pending:
+                pending[(model, user)] = asyncio.ensure_future(ask(model, user))
+    try:
+        await asyncio.gather(*pending.values())
+    finally:
+        executor.shutdown(wait=False)
+    return [{"model": model, "row": row, "input": user, **pending[(model, user)].result()}
+            for model in models for row, user in enumerate(inputs)]
+
+
+def read_inputs(csv_path, column="Complaints"):
+    return pd.read_csv(csv_path, usecols=[column], dtype=str, keep_default_na=False)[column].tolist()
+
+
+def write_records(records, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def stub_answer(user):
+    """A deterministic Details-style answer for the stub server."""
+    text = user.lower()
+    topics = (("internet", "Internet"), ("wifi", "Internet"), ("tv", "TV"), ("channel", "TV"),
+              ("phone", "Phone"), ("call", "Phone"), ("bill", "Billing"), ("price", "Billing"),
+              ("charge", "Billing"), ("money", "Billing"))
+    topic = next((name for word, name in topics if word in text), "Customer Service")
+    anger = min(100, 50 + 10 * user.count("!") + 20 * sum(c.isupper() for c in user) // max(1, len(user)))
+    return json.dumps({"Topic": topic, "Problem": " ".join(user.split()[:3]).strip(".!?,"),
+                       "Customer_Dissatisfaction_Index": anger})
+
+
+def serve_stub(port=0, latency=0.05, host="127.0.0.1", failures=0):
+    """
+    Start an OpenAI-compatible /chat/completions stub on a daemon thread, answering with
+    stub_answer after `latency` seconds. The first `failures` requests get HTTP 429 instead,
+    to exercise retries. Returns the server (server.server_port, server.requests counting
+    every request, shutdown()).
+    """
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            user = request["messages"][-1]["content"]
+            time.sleep(latency)
+            with lock:
+                server.requests += 1
+                rate_limited = server.requests <= failures
+            if rate_limited:
+                self.send_response(429)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({
+                "model": request["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": stub_answer(user)},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(user) // 4, "completion_tokens": 20},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_client(base_url=None, use_openai=False):
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if use_openai:
+        return OpenAIClient(api_key=api_key, base_url=base_url)
+    return HTTPClient(base_url or "https://api.openai.com/v1", api_key)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent, cached extract_details over a CSV column.")
+    parser.add_argument("csv", nargs="?", help="CSV with the complaints, e.g. 'Customer Complaints.csv'")
+    parser.add_argument("--column", default="Complaints")
+    parser.add_argument("--models", nargs="+", help="Model names, e.g. gpt-4 and a fine-tuned model id")
+    parser.add_argument("--output", default="responses.jsonl", help="JSONL with one record per model and row")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="SQLite response cache")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rpm", type=float, help="Requests per minute limit")
+    parser.add_argument("--base-url", help="OpenAI-compatible endpoint, e.g. a local stub at http://127.0.0.1:8000/v1")
+    parser.add_argument("--openai-sdk", action="store_true", help="Send requests with the openai package")
+    parser.add_argument("--serve-stub", type=int, metavar="PORT", help="Only run the local stub server on PORT")
+    parser.add_argument("--stub-latency", type=float, default=0.05)
+    parser.add_argument("--stub-failures", type=int, default=0, help="Answer the stub's first N requests with HTTP 429")
+    args = parser.parse_args(argv)
+    if args.serve_stub is not None:
+        server = serve_stub(args.serve_stub, args.stub_latency, failures=args.stub_failures)
+        print(f"Stub chat completions server on http://127.0.0.1:{server.server_port}/v1")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return 0
+    if not args.csv or not args.models:
+        parser.error("csv and --models are required unless --serve-stub is given")
+    inputs = read_inputs(args.csv, args.column)
+    cache = ResponseCache(args.cache)
+    started = time.perf_counter()
+    records = asyncio.run(run_batch(inputs, args.models, make_client(args.base_url, args.openai_sdk), cache,
+                                    concurrency=args.concurrency, requests_per_minute=args.rpm))
+    seconds = time.perf_counter() - started
+    write_records(records, args.output)
+    cached = sum(r["cached"] for r in records)
+    errors = sum(r["error"] is not None for r in records)
+    print(f"{len(records)} responses ({cached} cached, {errors} errors) in {seconds:.1f}s -> {args.output}")
+    cache.close()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
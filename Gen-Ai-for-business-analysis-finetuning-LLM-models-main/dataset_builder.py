@@ -0,0 +1,280 @@
+"""
+Build chat fine-tuning datasets (JSONL, one {"messages": [...]} example per line) from CSV exports.
+
+Replaces the notebook's per-row save_as_json / save_as_json_new, which reopened the output file
+in append mode for every row, so re-running a cell duplicated the dataset. Here the CSV is read
+in chunks and written through one buffered writer; every run rewrites its output from scratch.
+Examples are deduplicated by content hash, checked against the chat messages schema, counted
+in tokens and split into shards of bounded size, and a manifest records what was kept.
+
+    python dataset_builder.py "Customer Complaints.csv" --task complaints --output training_data
+    python dataset_builder.py seconddataset.csv --task questions --output second_training_data
+"""
+import os
+import sys
+import json
+import glob
+import hashlib
+import argparse
+import pandas as pd
+
+SYSTEM_PROMPT = """
+      Given a customer complaint text, extract and return the following information in json (dict) format:
+      - Topic: The product/department that the customer has a complaint about.
+      - Problem: A two or three-word description of what exactly the problem is.
+      - Customer_Dissatisfaction_Index: is a number between 0 and 100 showing
+             how angry the customer is about the problem.
+  """
+
+DETAIL_FIELDS = ("Topic", "Problem", "Customer_Dissatisfaction_Index")
+
+# (user column, assistant column, whether the assistant answer must be complaint Details JSON).
+# Both notebook datasets were built with the complaint system prompt, so both tasks keep it.
+TASKS = {
+    "complaints": ("Complaints", "Details", True),
+    "questions": ("Questions", "Answers", False),
+}
+
+ROLES = ("system", "user", "assistant")
+MAX_EXAMPLE_TOKENS = 4096  # gpt-3.5-turbo fine-tuning context per example
+DEFAULT_SHARD_BYTES = 100 * 1024 * 1024
+CHUNK_ROWS = 50_000
+MAX_REPORTED_ERRORS = 20
+
+
+def make_example(user, assistant, system=SYSTEM_PROMPT):
+    """One fine-tuning example in the chat messages format."""
+    return {
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+            {"role": "assistant", "content": assistant},
+        ]
+    }
+
+
+def parse_details(text):
+    """The Details JSON of a complaint as a dict, or raise ValueError saying what is wrong."""
+    details = json.loads(text)
+    if not isinstance(details, dict):
+        raise ValueError("Details is not a JSON object")
+    missing = [field for field in DETAIL_FIELDS if field not in details]
+    if missing:
+        raise ValueError(f"Details is missing {missing}")
+    index = details["Customer_Dissatisfaction_Index"]
+    if isinstance(index, bool) or not isinstance(index, (int, float)) or not 0 <= index <= 100:
+        raise ValueError(f"Customer_Dissatisfaction_Index must be a number from 0 to 100, got {index!r}")
+    return details
+
+
+def validate_example(example, details=False):
+    """
+    Problems with an example as a list of messages (empty if it is valid): the chat schema
+    OpenAI fine-tuning expects, and with details=True a well-formed Details answer.
+    """
+    messages = example.get("messages") if isinstance(example, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return ["messages must be a non-empty list"]
+    errors = []
+    for i, message in enumerate(messages):
+        if not isinstance(message, dict) or set(message) - {"role", "content", "name", "weight"}:
+            errors.append(f"message {i} has unexpected keys")
+            continue
+        if message.get("role") not in ROLES:
+            errors.append(f"message {i} has role {message.get('role')!r}")
+        content = message.get("content")
+        if not isinstance(content, str) or not content.strip():
+            errors.append(f"message {i} has empty content")
+    if messages[-1].get("role") != "assistant":
+        errors.append("last message must be from the assistant")
+    if details and not errors:
+        try:
+            parse_details(messages[-1]["content"])
+        except ValueError as ex:  # json.JSONDecodeError is a ValueError
+            errors.append(f"assistant answer: {ex}")
+    return errors
+
+
+def _load_encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(example, encoding=None):
+    """
+    Tokens an example uses, counted like OpenAI's chat format guide: 3 per message, its role
+    and content, plus 3 to prime the reply. Uses tiktoken's cl100k_base when given (see
+    _load_encoding); without it, content is estimated at 4 characters per token.
+    """
+    tokens = 3
+    for message in example["messages"]:
+        tokens += 3
+        for value in (message["role"], message["content"]):
+            tokens += len(encoding.encode(value)) if encoding is not None else -(-len(value) // 4)
+    return tokens
+
+
+def to_line(example):
+    """
+    An example as one UTF-8 JSONL line. make_example fixes the key order,
+    so equal examples always serialize to equal lines.
+    """
+    return (json.dumps(example, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def content_hash(line):
+    """64-bit hash of an example's JSONL line, for deduplication."""
+    return int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), "little")
+
+
+def iter_rows(csv_path, user_column, assistant_column, chunk_rows=CHUNK_ROWS):
+    """Yield (row number, user text, assistant text) from the CSV, reading chunk_rows at a time."""
+    row = 0
+    for chunk in pd.read_csv(csv_path, usecols=[user_column, assistant_column], dtype=str,
+                             keep_default_na=False, chunksize=chunk_rows):
+        for user, assistant in zip(chunk[user_column], chunk[assistant_column]):
+            yield row, user, assistant
+            row += 1
+
+
+class ShardedWriter:
+    """
+    Buffered JSONL writer that starts a new {prefix}-NNNNN.jsonl file once the current one
+    would exceed max_bytes. Shards are written under a temporary name and renamed on close,
+    so an interrupted run never leaves a partial dataset behind under the final names.
+    """
+
+    def __init__(self, prefix, max_bytes=DEFAULT_SHARD_BYTES, buffer_bytes=1024 * 1024):
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.buffer_bytes = buffer_bytes
+        self.shards = []  # [path, examples, bytes]
+        self._file = None
+
+    def write(self, line):
+        """Append one JSONL line (bytes, see to_line)."""
+        if self._file is None or (self.shards[-1][2] and self.shards[-1][2] + len(line) > self.max_bytes):
+            self._open_next()
+        self._file.write(line)
+        self.shards[-1][1] += 1
+        self.shards[-1][2] += len(line)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        path = f"{self.prefix}-{len(self.shards):05d}.jsonl"
+        self.shards.append([path, 0, 0])
+        self._file = open(path + ".tmp", "wb", buffering=self.buffer_bytes)
+
+    def close(self):
+        """Finish the shards and replace any earlier output with the same prefix."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        final = {shard[0] for shard in self.shards}
+        for old in glob.glob(glob.escape(self.prefix) + "-[0-9][0-9][0-9][0-9][0-9].jsonl"):
+            if old not in final:
+                os.remove(old)
+        for path, _, _ in self.shards:
+            os.replace(path + ".tmp", path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path, _, _ in self.shards:
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+
+def build_dataset(csv_path, output_prefix, user_column, assistant_column, system=SYSTEM_PROMPT,
+                  details=False, max_shard_bytes=DEFAULT_SHARD_BYTES, max_tokens=MAX_EXAMPLE_TOKENS,
+                  chunk_rows=CHUNK_ROWS):
+    """
+    Stream csv_path into output_prefix-NNNNN.jsonl shards and write output_prefix.manifest.json.
+
+    Rows are dropped (and counted) when they duplicate an earlier example, fail
+    validate_example, or need more than max_tokens tokens. Memory stays bounded by the CSV
+    chunk, the write buffer and 8 bytes (plus set overhead) per distinct example.
+    Returns the manifest.
+    """
+    encoding = _load_encoding()
+    seen = set()
+    stats = {"rows": 0, "written": 0, "duplicates": 0, "invalid": 0, "too_long": 0}
+    tokens = {"total": 0, "min": None, "max": 0}
+    errors = []
+    writer = ShardedWriter(output_prefix, max_shard_bytes)
+    try:
+        for row, user, assistant in iter_rows(csv_path, user_column, assistant_column, chunk_rows):
+            stats["rows"] += 1
+            example = make_example(user, assistant, system)
+            problems = validate_example(example, details)
+            if problems:
+                stats["invalid"] += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": row, "errors": problems})
+                continue
+            line = to_line(example)
+            digest = content_hash(line)
+            if digest in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(digest)
+            n = count_tokens(example, encoding)
+            if n > max_tokens:
+                stats["too_long"] += 1
+                continue
+            writer.write(line)
+            stats["written"] += 1
+            tokens["total"] += n
+            tokens["min"] = n if tokens["min"] is None else min(tokens["min"], n)
+            tokens["max"] = max(tokens["max"], n)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    tokens["mean"] = tokens["total"] / stats["written"] if stats["written"] else None
+    tokens["counter"] = "tiktoken cl100k_base" if encoding is not None else "estimate (4 characters per token)"
+    manifest = {
+        "source": csv_path,
+        "columns": [user_column, assistant_column],
+        **stats,
+        "tokens": tokens,
+        "shards": [{"path": path, "examples": count, "bytes": size} for path, count, size in writer.shards],
+        "errors": errors,
+    }
+    with open(output_prefix + ".manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a deduplicated, validated, sharded fine-tuning JSONL dataset.")
+    parser.add_argument("csv", help="CSV export, e.g. 'Customer Complaints.csv'")
+    parser.add_argument("--task", choices=sorted(TASKS), default="complaints",
+                        help="Column preset: complaints (Complaints -> Details) or questions (Questions -> Answers)")
+    parser.add_argument("--user-column", help="Override the task's user column")
+    parser.add_argument("--assistant-column", help="Override the task's assistant column")
+    parser.add_argument("--system-prompt-file", help="Use this file's text as the system message")
+    parser.add_argument("--output", default="training_data", help="Output prefix for shards and the manifest")
+    parser.add_argument("--max-shard-mb", type=float, default=DEFAULT_SHARD_BYTES / 1024 / 1024)
+    parser.add_argument("--max-tokens", type=int, default=MAX_EXAMPLE_TOKENS)
+    args = parser.parse_args(argv)
+    user_column, assistant_column, details = TASKS[args.task]
+    system = SYSTEM_PROMPT
+    if args.system_prompt_file:
+        with open(args.system_prompt_file) as f:
+            system = f.read()
+    manifest = build_dataset(args.csv, args.output, args.user_column or user_column,
+                             args.assistant_column or assistant_column, system, details,
+                             int(args.max_shard_mb * 1024 * 1024), args.max_tokens)
+    print(f"Wrote {manifest['written']} of {manifest['rows']} rows to {len(manifest['shards'])} shard(s) "
+          f"({manifest['duplicates']} duplicates, {manifest['invalid']} invalid, {manifest['too_long']} too long)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Score models' extract_details answers against the labeled Details of every complaint.
+
+The notebook compared the fine-tuned model with GPT-4 on two hand-picked complaints. Here each
+model's answer to every row of the CSV is parsed and compared field by field with the Details
+ground truth: exact match per field (Topic and Problem ignoring case and surrounding
+whitespace), Customer_Dissatisfaction_Index error, the JSON parse failure rate and the latency
+percentiles of the calls. Answers come from batch_inference's response cache (or its JSONL
+output), so scoring runs offline and re-scoring never re-queries a model. Rows are scored
+in parallel worker processes.
+
+    python evaluate.py "Customer Complaints.csv" --models gpt-4 ft:gpt-3.5-turbo:... --cache responses.sqlite
+    python evaluate.py "Customer Complaints.csv" --responses responses.jsonl --report evaluation.json
+"""
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from batch_inference import DEFAULT_CACHE, SYSTEM_PROMPT, ResponseCache
+from dataset_builder import parse_details
+
+CHUNK_ROWS = 1000
+INDEX_TOLERANCE = 10
+LATENCY_PERCENTILES = (50, 90, 99)
+COUNTS = ("rows", "missing", "errors", "parse_failures", "scored", "topic_exact", "problem_exact",
+          "index_exact", "index_within_tolerance", "index_scored", "index_abs_error", "index_sq_error")
+
+
+def parse_output(text):
+    """
+    A model answer as a dict, or None if it holds no JSON object. Tolerates a markdown code
+    fence or prose around the object, which chat models often add.
+    """
+    if text is None:
+        return None
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text.strip())
+    try:
+        value = json.loads(text)
+    except ValueError:
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            return None
+        try:
+            value = json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+    return value if isinstance(value, dict) else None
+
+
+def as_index(value):
+    """Customer_Dissatisfaction_Index as a float, accepting numeric strings; None if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def same_text(answer, label):
+    return isinstance(answer, str) and answer.strip().casefold() == str(label).strip().casefold()
+
+
+def score_rows(rows):
+    """
+    Sums of per-row outcomes for one model over rows of (label dict, output text or None,
+    error or None). Runs in worker processes; merge the results with add_counts.
+    """
+    counts = dict.fromkeys(COUNTS, 0)
+    for label, output, error in rows:
+        counts["rows"] += 1
+        if error is not None:
+            counts["errors"] += 1
+            continue
+        if output is None:
+            counts["missing"] += 1
+            continue
+        answer = parse_output(output)
+        if answer is None:
+            counts["parse_failures"] += 1
+            continue
+        counts["scored"] += 1
+        counts["topic_exact"] += same_text(answer.get("Topic"), label["Topic"])
+        counts["problem_exact"] += same_text(answer.get("Problem"), label["Problem"])
+        index = as_index(answer.get("Customer_Dissatisfaction_Index"))
+        if index is not None:
+            error = abs(index - label["Customer_Dissatisfaction_Index"])
+            counts["index_scored"] += 1
+            counts["index_exact"] += error == 0
+            counts["index_within_tolerance"] += error <= INDEX_TOLERANCE
+            counts["index_abs_error"] += error
+            counts["index_sq_error"] += error * error
+    return counts
+
+
+def add_counts(total, counts):
+    for name in COUNTS:
+        total[name] += counts[name]
+    return total
+
+
+def load_labels(csv_path, user_column="Complaints", label_column="Details"):
+    """(complaints, labels) for rows whose Details parse; labels are parse_details dicts."""
+    df = pd.read_csv(csv_path, usecols=[user_column, label_column], dtype=str, keep_default_na=False)
+    complaints, labels, skipped = [], [], 0
+    for complaint, details in zip(df[user_column], df[label_column]):
+        try:
+            labels.append(parse_details(details))
+        except ValueError:
+            skipped += 1
+            continue
+        complaints.append(complaint)
+    return complaints, labels, skipped
+
+
+def answers_from_cache(cache, model, complaints, system=SYSTEM_PROMPT):
+    """[(output, latency_s, error)] per complaint from a ResponseCache; output is None when not cached."""
+    answers = []
+    for complaint in complaints:
+        hit = cache.get(model, system, complaint)
+        answers.append((None, None, None) if hit is None else (hit["output"], hit["latency_s"], None))
+    return answers
+
+
+def answers_from_jsonl(path):
+    """{model: {input: (output, latency_s, error)}} from batch_inference's JSONL output."""
+    answers = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                answers.setdefault(record["model"], {})[record["input"]] = (
+                    record["output"], record["latency_s"], record["error"])
+    return answers
+
+
+def summarize(counts, latencies):
+    """Rates and errors of one model from its summed counts and call latencies (seconds)."""
+    rows, scored, indexed = counts["rows"], counts["scored"], counts["index_scored"]
+    answered = rows - counts["missing"] - counts["errors"]
+    summary = {
+        "rows": rows,
+        "missing": counts["missing"],
+        "errors": counts["errors"],
+        "parse_failure_rate": counts["parse_failures"] / answered if answered else None,
+    }
+    for field in ("topic", "problem", "index"):
+        summary[f"{field}_exact"] = counts[f"{field}_exact"] / scored if scored else None
+    summary["index_mae"] = counts["index_abs_error"] / indexed if indexed else None
+    summary["index_rmse"] = (counts["index_sq_error"] / indexed) ** 0.5 if indexed else None
+    summary[f"index_within_{INDEX_TOLERANCE}"] = counts["index_within_tolerance"] / indexed if indexed else None
+    latencies = np.array([latency for latency in latencies if latency is not None], dtype=float)
+    for p in LATENCY_PERCENTILES:
+        summary[f"latency_p{p}_s"] = float(np.percentile(latencies, p)) if len(latencies) else None
+    summary["latency_mean_s"] = float(latencies.mean()) if len(latencies) else None
+    return summary
+
+
+def evaluate(labels, answers, workers=None, chunk_rows=CHUNK_ROWS):
+    """
+    Score each model's answers against labels. answers maps model -> [(output, latency_s,
+    error)] aligned with labels. Chunks of rows are scored across `workers` processes
+    (None: one per CPU, 1: in this process). Returns {model: summary}.
+    """
+    jobs = []
+    for model, model_answers in answers.items():
+        rows = [(label, output, error) for label, (output, _, error) in zip(labels, model_answers)]
+        jobs += [(model, rows[i:i + chunk_rows]) for i in range(0, len(rows), chunk_rows)]
+    totals = {model: dict.fromkeys(COUNTS, 0) for model in answers}
+    chunks = [rows for _, rows in jobs]
+    if workers == 1 or len(jobs) <= 1:
+        results = list(map(score_rows, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(score_rows, chunks))
+    for (model, _), counts in zip(jobs, results):
+        add_counts(totals[model], counts)
+    return {model: summarize(totals[model], [latency for _, latency, _ in answers[model]]) for model in answers}
+
+
+def format_report(report):
+    columns = ["rows", "missing", "errors", "parse_failure_rate", "topic_exact", "problem_exact", "index_exact", "index_mae",
+               f"index_within_{INDEX_TOLERANCE}"] + [f"latency_p{p}_s" for p in LATENCY_PERCENTILES]
+    table = pd.DataFrame.from_dict(report, orient="index")[columns]
+    return table.to_string(float_format=lambda value: f"{value:.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score recorded model answers against the labeled Details.")
+    parser.add_argument("csv", help="Labeled CSV, e.g. 'Customer Complaints.csv'")
+    parser.add_argument("--column", default="Complaints")
+    parser.add_argument("--label-column", default="Details")
+    parser.add_argument("--models", nargs="+", help="Models to score from the response cache")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="batch_inference's SQLite response cache")
+    parser.add_argument("--responses", help="Score batch_inference's JSONL output instead of the cache")
+    parser.add_argument("--workers", type=int, help="Scoring processes (default: one per CPU)")
+    parser.add_argument("--report", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+    complaints, labels, skipped = load_labels(args.csv, args.column, args.label_column)
+    if args.responses:
+        recorded = answers_from_jsonl(args.responses)
+        models = args.models or list(recorded)
+        answers = {model: [recorded.get(model, {}).get(c, (None, None, None)) for c in complaints] for model in models}
+    else:
+        if not args.models:
+            parser.error("--models is required when scoring from the cache")
+        if not os.path.exists(args.cache):
+            parser.error(f"no response cache at {args.cache}; run batch_inference.py first")
+        cache = ResponseCache(args.cache)
+        answers = {model: answers_from_cache(cache, model, complaints) for model in args.models}
+        cache.close()
+    report = evaluate(labels, answers, args.workers)
+    print(format_report(report))
+    if skipped:
+        print(f"Skipped {skipped} rows with unparseable {args.label_column}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import time
+import pytest
+from batch_inference import HTTPClient, ResponseCache, run_batch, serve_stub, stub_answer
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**options):
+        server = serve_stub(**options)
+        servers.append(server)
+        return server, HTTPClient(f"http://127.0.0.1:{server.server_port}/v1", timeout=5)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_second_run_is_served_from_cache(tmp_path, stub):
+    server, client = stub(latency=0.01)
+    cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+    inputs = ["Internet is down!", "My bill is wrong", "Internet is down!"]
+    first = asyncio.run(run_batch(inputs, ["ft", "gpt-4"], client, cache))
+    assert server.requests == 4  # the repeated input is asked once per model
+    assert [(r["model"], r["row"]) for r in first] == [("ft", 0), ("ft", 1), ("ft", 2),
+                                                     ("gpt-4", 0), ("gpt-4", 1), ("gpt-4", 2)]
+    assert all(r["output"] == stub_answer(r["input"]) and not r["cached"] and r["error"] is None for r in first)
+    assert len(cache) == 4
+    second = asyncio.run(run_batch(inputs, ["ft", "gpt-4"], client, cache))
+    assert server.requests == 4
+    assert all(r["cached"] for r in second)
+    assert [(r["output"], r["latency_s"]) for r in second] == [(r["output"], r["latency_s"]) for r in first]
+    # A different system prompt is a different cache key.
+    asyncio.run(run_batch(inputs[:1], ["ft"], client, cache, system="Answer in French."))
+    assert server.requests == 5
+
+
+def test_rate_limited_requests_are_retried(tmp_path, stub):
+    server, client = stub(latency=0, failures=3)
+    records = asyncio.run(run_batch(["a"], ["m"], client, ResponseCache(str(tmp_path / "r.sqlite")), backoff=0.01))
+    assert server.requests == 4
+    assert records[0]["error"] is None
+    assert json.loads(records[0]["output"])["Topic"] == "Customer Service"
+
+
+def test_requests_fail_after_exhausting_retries(tmp_path, stub):
+    server, client = stub(latency=0, failures=100)
+    cache = ResponseCache(str(tmp_path / "r.sqlite"))
+    started = time.perf_counter()
+    records = asyncio.run(run_batch(["a"], ["m"], client, cache, retries=2, backoff=0.05))
+    assert server.requests == 3
+    assert records[0]["error"] == "HTTP 429" and records[0]["output"] is None
+    # Two jittered backoffs: at least 0.025 + 0.05 seconds.
+    assert time.perf_counter() - started >= 0.075
+    assert len(cache) == 0
+
+
+def test_concurrency_is_not_capped_by_the_default_executor(stub):
+    # The default executor has min(32, cpu + 4) threads: 5 on one CPU, which would
+    # need 8 rounds (4 s) for these requests instead of one.
+    server, client = stub(latency=0.5)
+    inputs = [f"complaint {i}" for i in range(40)]
+    started = time.perf_counter()
+    records = asyncio.run(run_batch(inputs, ["m"], client, concurrency=40))
+    assert time.perf_counter() - started < 2.5
+    # Latency is the request itself, not time spent waiting for a worker thread.
+    assert max(r["latency_s"] for r in records) < 1.5
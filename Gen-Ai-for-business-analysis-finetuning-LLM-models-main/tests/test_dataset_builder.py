@@ -0,0 +1,75 @@
+import json
+import os
+import pandas as pd
+from dataset_builder import ShardedWriter, build_dataset, make_example, to_line, validate_example
+
+DETAILS = '{"Topic": "Internet", "Problem": "Slow speed", "Customer_Dissatisfaction_Index": 80}'
+
+
+def write_csv(path, rows):
+    pd.DataFrame(rows, columns=["Complaints", "Details"]).to_csv(path, index=False)
+    return str(path)
+
+
+def read_shards(manifest):
+    lines = []
+    for shard in manifest["shards"]:
+        with open(shard["path"], encoding="utf-8") as f:
+            lines += [json.loads(line) for line in f]
+    return lines
+
+
+def test_build_dataset_dedups_and_validates(tmp_path):
+    csv = write_csv(tmp_path / "complaints.csv", [
+        ("Internet is slow", DETAILS),
+        ("Internet is slow", DETAILS),  # duplicate
+        ("TV is broken", '{"Topic": "TV", "Problem": "No signal"}'),  # missing index
+        ("Phone bill", '{"Topic": "Billing", "Problem": "Overcharge", "Customer_Dissatisfaction_Index": 150}'),
+        ("Bad JSON", "{not json"),
+        ("", DETAILS),  # empty user message
+        ("Wifi drops", DETAILS),
+    ])
+    manifest = build_dataset(csv, str(tmp_path / "out"), "Complaints", "Details", details=True, chunk_rows=2)
+    assert (manifest["rows"], manifest["written"], manifest["duplicates"], manifest["invalid"]) == (7, 2, 1, 4)
+    assert [e["row"] for e in manifest["errors"]] == [2, 3, 4, 5]
+    examples = read_shards(manifest)
+    assert [e["messages"][1]["content"] for e in examples] == ["Internet is slow", "Wifi drops"]
+    assert all(validate_example(e, details=True) == [] for e in examples)
+    with open(tmp_path / "out.manifest.json") as f:
+        assert json.load(f)["written"] == 2
+
+
+def test_validate_example_reports_schema_problems():
+    assert validate_example({"messages": []}) == ["messages must be a non-empty list"]
+    example = make_example("hi", "there")
+    example["messages"].append({"role": "user", "content": " "})
+    assert validate_example(example) == ["message 3 has empty content", "last message must be from the assistant"]
+
+
+def test_shards_roll_over_and_reruns_replace_output(tmp_path):
+    rows = [(f"complaint number {i:02d}", DETAILS) for i in range(20)]
+    csv = write_csv(tmp_path / "complaints.csv", rows)
+    prefix = str(tmp_path / "out")
+    line_bytes = len(to_line(make_example(rows[0][0], DETAILS)))
+    manifest = build_dataset(csv, prefix, "Complaints", "Details", details=True, max_shard_bytes=5 * line_bytes)
+    assert len(manifest["shards"]) == 4
+    assert all(shard["examples"] == 5 and shard["bytes"] <= 5 * line_bytes for shard in manifest["shards"])
+    assert len(read_shards(manifest)) == 20
+    # A smaller re-run replaces every earlier shard instead of leaving stale ones behind.
+    csv = write_csv(tmp_path / "complaints.csv", rows[:3])
+    manifest = build_dataset(csv, prefix, "Complaints", "Details", details=True, max_shard_bytes=5 * line_bytes)
+    assert sorted(os.listdir(tmp_path)) == ["complaints.csv", "out-00000.jsonl", "out.manifest.json"]
+    assert len(read_shards(manifest)) == 3
+
+
+def test_aborted_writer_leaves_earlier_output(tmp_path):
+    prefix = str(tmp_path / "out")
+    writer = ShardedWriter(prefix)
+    writer.write(b"first\n")
+    writer.close()
+    writer = ShardedWriter(prefix)
+    writer.write(b"second\n")
+    writer.abort()
+    assert sorted(os.listdir(tmp_path)) == ["out-00000.jsonl"]
+    with open(prefix + "-00000.jsonl", "rb") as f:
+        assert f.read() == b"first\n"
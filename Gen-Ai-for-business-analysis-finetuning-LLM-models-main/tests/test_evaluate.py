@@ -0,0 +1,58 @@
+import asyncio
+import json
+import pytest
+from batch_inference import HTTPClient, ResponseCache, run_batch, serve_stub
+from evaluate import answers_from_cache, evaluate, load_labels, parse_output
+
+CSV = "Customer Complaints.csv"
+
+
+@pytest.mark.parametrize("text", [
+    '{"Topic": "TV", "Customer_Dissatisfaction_Index": 70}',
+    '```json\n{"Topic": "TV", "Customer_Dissatisfaction_Index": 70}\n```',
+    '```\n{"Topic": "TV", "Customer_Dissatisfaction_Index": 70}\n```',
+    'Here is the extracted information:\n{"Topic": "TV", "Customer_Dissatisfaction_Index": 70}\nLet me know!',
+])
+def test_parse_output_accepts_fenced_and_wrapped_answers(text):
+    assert parse_output(text) == {"Topic": "TV", "Customer_Dissatisfaction_Index": 70}
+
+
+@pytest.mark.parametrize("text", [None, "", "Topic: TV", "[1, 2]", "{broken", "```json\n[]\n```"])
+def test_parse_output_rejects_non_objects(text):
+    assert parse_output(text) is None
+
+
+def test_evaluate_scores_fields():
+    labels = [{"Topic": "TV", "Problem": "No signal", "Customer_Dissatisfaction_Index": 80}] * 4
+    answers = {"m": [
+        ('{"Topic": " tv ", "Problem": "No signal", "Customer_Dissatisfaction_Index": "80"}', 1.0, None),
+        ('{"Topic": "Internet", "Problem": "Slow", "Customer_Dissatisfaction_Index": 60}', 3.0, None),
+        ("not json", 2.0, None),
+        (None, None, "HTTP 429"),
+    ]}
+    report = evaluate(labels, answers, workers=1)["m"]
+    assert (report["rows"], report["errors"], report["missing"]) == (4, 1, 0)
+    assert report["parse_failure_rate"] == pytest.approx(1 / 3)
+    assert report["topic_exact"] == report["problem_exact"] == report["index_exact"] == 0.5
+    assert report["index_mae"] == 10 and report["index_within_10"] == 0.5
+    assert report["latency_p50_s"] == 2.0
+
+
+def test_parallel_scoring_matches_serial(tmp_path):
+    complaints, labels, skipped = load_labels(CSV)
+    assert skipped == 0 and len(labels) == len(complaints)
+    server = serve_stub(latency=0)
+    try:
+        client = HTTPClient(f"http://127.0.0.1:{server.server_port}/v1", timeout=5)
+        cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+        asyncio.run(run_batch(complaints, ["ft", "gpt-4"], client, cache, concurrency=16))
+    finally:
+        server.shutdown()
+        server.server_close()
+    # Scoring runs offline from the cache; "missing" was never asked.
+    answers = {model: answers_from_cache(cache, model, complaints) for model in ("ft", "gpt-4", "missing")}
+    serial = evaluate(labels, answers, workers=1)
+    parallel = evaluate(labels, answers, workers=2, chunk_rows=10)
+    assert json.dumps(parallel, sort_keys=True) == json.dumps(serial, sort_keys=True)
+    assert serial["ft"]["rows"] == len(labels) and serial["ft"]["parse_failure_rate"] == 0
+    assert serial["missing"]["missing"] == len(labels)